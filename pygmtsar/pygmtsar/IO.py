@@ -14,6 +14,8 @@ class IO(datagrid):
 
     # processing directory
     basedir = '.'
+    # opt-in decoded SLC cache stack name, see open_data()
+    slc_cache = None
 
     def _glob_re(self, pathname):
         import os
@@ -200,6 +202,13 @@ class IO(datagrid):
         filename = os.path.join(self.basedir, f'{prefix}{name}.grd')
         return filename
 
+    def get_zarr_filename(self, name):
+        """
+        Get the filename of the single Zarr store used by the 'zarr' stack backend.
+        """
+        import os
+        return os.path.join(self.basedir, f'{name}.zarr')
+
     def get_filenames(self, pairs, name, add_subswath=False):
         """
         Get the filenames of the data grids. The filenames are determined by the subswath, pairs, and name parameters.
@@ -284,12 +293,48 @@ class IO(datagrid):
 
     # 2.5e-07 is Sentinel-1 scale factor
     # use original PRM files to get binary subswath file locations
-    def open_data(self, dates=None, scale=2.5e-07, debug=False):
+    def open_data(self, dates=None, scale=2.5e-07, debug=False, cache=None):
+        """
+        Open the merged and cropped SLC stack.
+
+        Parameters
+        ----------
+        dates : list, optional
+            The dates to open. Default is all the stack dates.
+        scale : float, optional
+            The data scale factor to return complex64 grids. When None, int16 real and imaginary parts are returned.
+            Default is 2.5e-07 (Sentinel-1).
+        debug : bool, optional
+            Print debug information. Default is False.
+        cache : str or bool, optional
+            The decoded SLC cache stack name, True for 'slc' or False to read the SLC files.
+            Default is the class attribute slc_cache.
+
+        Returns
+        -------
+        xarray.DataArray or xarray.Dataset
+            The complex64 SLC stack or int16 real and imaginary parts stack.
+
+        Notes
+        -----
+        The cache saves the merged, cropped and chunk-aligned int16 real and imaginary parts per date once
+        and the later calls read them instead of the SLC files decoding. The cache is invalidated when
+        the PRM or SLC files are newer or the cropped extent is changed. The storage can be tuned by
+        the stack name storage profile, for example, stack.netcdf_profiles['slc'] = 'shuffle_zlib'.
+        """
         import xarray as xr
         import pandas as pd
         import numpy as np
-        from scipy import constants
+        import dask.array as da
         import os
+        from .PRM import PRM
+
+        if cache is None:
+            cache = self.slc_cache
+        if cache is True:
+            cache = 'slc'
+        if cache:
+            return self._open_data_cache(cache, dates, scale, debug)
 
         if debug:
             print ('DEBUG: open_data: apply scale:', scale)
@@ -304,71 +349,170 @@ class IO(datagrid):
             subswaths = ''.join(map(str, subswaths))
 
         if len(subswaths) == 1:
-            # stack single subswath
-            stack = []
-            shape = None
-            for date in dates:
-                prm = self.PRM(date, subswath=int(subswaths))
-                # disable scaling
-                slc = prm.read_SLC_int(scale=scale, shape=shape)
-                stack.append(slc.assign_coords(date=date))
-                if shape is None:
-                    shape = (slc.y.size, slc.x.size)
-                del slc, prm
+            # stack single subswath using the first date grid dimensions
+            prm = self.PRM(dates[0], subswath=int(subswaths))
+            ylim, xlim = prm.get('num_valid_az', 'num_rng_bins')
+            offsets = {'bottoms': [0], 'lefts': [0], 'rights': [xlim], 'ylims': [ylim], 'xlims': [xlim],
+                       'extent': [ylim, xlim]}
+            del prm
         else:
-            
             #offsets = {'bottoms': bottoms, 'lefts': lefts, 'rights': rights, 'bottom': minh, 'extent': [maxy, maxx], 'ylims': ylims, 'xlims': xlims}
             offsets = self.prm_offsets(debug=debug)
-            maxy, maxx = offsets['extent']
-            minh = offsets['bottom']
-    
-            # merge subswaths
-            stack = []
-            for date in dates:
-                slcs = []
-                prms = []
-                
-                for subswath, bottom, left, right, ylim, xlim in zip(subswaths, 
-                        offsets['bottoms'], offsets['lefts'], offsets['rights'], offsets['ylims'], offsets['xlims']):
-                    #print (date, subswath)
-                    prm = self.PRM(date, subswath=int(subswath))
-                    # disable scaling
-                    slc = prm.read_SLC_int(scale=scale, shape=(ylim, xlim))
-                    slc = slc.isel(x=slice(left, right)).assign_coords(y=slc.y + bottom)
-                    slcs.append(slc)
-                    prms.append(prm)
-        
-                # check and merge SLCs, use zero fill for np.int16 datatype
-                slc = xr.concat(slcs, dim='x', fill_value=0).assign_coords(x=0.5 + np.arange(maxx))
-
-                if debug:
-                    print ('assert slc.y.size == maxy', slc.y.size, maxy)
-                assert slc.y.size == maxy, 'Incorrect output grid azimuth dimension size'
-                if debug:
-                    print ('assert slc.x.size == maxx', slc.x.size, maxx)
-                assert slc.x.size == maxx, 'Incorrect output grid range dimension sizes'
-                del slcs
-    
-                stack.append(slc.assign_coords(date=date))
-                del slc
+        maxy, maxx = offsets['extent']
+
+        # subswath valid areas in the merged grid, the rows are shifted by the bottoms
+        # and the columns are placed sequentially after cutting by the lefts and rights
+        bottoms = np.asarray(offsets['bottoms'])
+        lefts = np.asarray(offsets['lefts'])
+        widths = np.asarray(offsets['rights']) - lefts
+        starts = np.concatenate([[0], np.cumsum(widths)[:-1]])
+        ylims = np.asarray(offsets['ylims'])
+        xlims = np.minimum(offsets['rights'], offsets['xlims'])
+        covered = np.zeros(maxy, dtype=bool)
+        for bottom, ylim in zip(bottoms, ylims):
+            covered[max(bottom, 0):bottom + ylim] = True
+        if debug:
+            print ('assert covered.sum() == maxy', covered.sum(), maxy)
+        assert covered.sum() == maxy and bottoms.min() == 0, 'Incorrect output grid azimuth dimension size'
+        if debug:
+            print ('assert widths.sum() == maxx', widths.sum(), maxx)
+        assert widths.sum() == maxx, 'Incorrect output grid range dimension sizes'
 
         # DEM extent in radar coordinates, merged reference PRM required
         #print ('minx, miny, maxx, maxy', minx, miny, maxx, maxy)
         extent_ra = np.round(self.get_extent_ra().bounds).astype(int)
         # minx, miny, maxx, maxy = extent_ra
-        ds = xr.concat(stack, dim='date').assign(date=pd.to_datetime(dates))\
-            .sel(y=slice(extent_ra[1], extent_ra[3]), x=slice(extent_ra[0], extent_ra[2])) \
-            .chunk({'y': self.chunksize, 'x': self.chunksize})
+        ys = 0.5 + np.arange(maxy)
+        xs = 0.5 + np.arange(maxx)
+        # the output cropped grid window in the merged grid like to coordinate slicing
+        ymin, ymax = np.searchsorted(ys, extent_ra[1], 'left'), np.searchsorted(ys, extent_ra[3], 'right')
+        xmin, xmax = np.searchsorted(xs, extent_ra[0], 'left'), np.searchsorted(xs, extent_ra[2], 'right')
+        shape = (ymax - ymin, xmax - xmin)
+        chunks = da.core.normalize_chunks(self.chunksize, shape=shape, dtype=np.complex64)
+        if scale is not None:
+            dtype = np.complex64
+        else:
+            # there is no complex int16 datatype, so use the leading dimension for real and imag parts
+            dtype = np.int16
+            chunks = ((2,),) + chunks
+
+        def read_block(slcs, block_info=None):
+            (y0, y1), (x0, x1) = block_info[None]['array-location'][-2:]
+            y0, y1, x0, x1 = y0 + ymin, y1 + ymin, x0 + xmin, x1 + xmin
+            if scale is not None:
+                # zero values and the areas outside of the subswaths are NODATA
+                block = np.full((y1 - y0, x1 - x0), np.nan, dtype=np.complex64)
+            else:
+                block = np.zeros((2, y1 - y0, x1 - x0), dtype=np.int16)
+            for (slc_filename, ydim, xdim), bottom, left, start, ylim, xlim \
+                    in zip(slcs, bottoms, lefts, starts, ylims, xlims):
+                # the subswath rows and columns inside of the block and the file
+                ys0, ys1 = max(y0, bottom), min(y1, bottom + min(ylim, ydim))
+                xs0, xs1 = max(x0, start), min(x1, start + min(xlim, xdim) - left)
+                if ys1 <= ys0 or xs1 <= xs0:
+                    continue
+                slc = np.memmap(slc_filename, dtype=np.dtype([('re', np.int16), ('im', np.int16)]), mode='r', shape=(ydim, xdim))
+                window = np.asarray(slc[ys0 - bottom:ys1 - bottom, xs0 - start + left:xs1 - start + left])
+                if scale is not None:
+                    block[ys0 - y0:ys1 - y0, xs0 - x0:xs1 - x0] = \
+                        PRM.SLC_block_complex(window['re'], window['im'], np.float32(scale), window.shape)
+                else:
+                    block[0, ys0 - y0:ys1 - y0, xs0 - x0:xs1 - x0] = window['re']
+                    block[1, ys0 - y0:ys1 - y0, xs0 - x0:xs1 - x0] = window['im']
+                del window, slc
+            return block
+
+        # every output chunk reads the covering subswath windows directly
+        stack = []
+        for date in dates:
+            slcs = []
+            for subswath in subswaths:
+                prm = self.PRM(date, subswath=int(subswath))
+                # num_patches multiplier is omitted
+                slc_filename, xdim, ydim = prm.get('SLC_file', 'num_rng_bins', 'num_valid_az')
+                slcs.append((os.path.join(os.path.dirname(prm.filename), slc_filename), ydim, xdim))
+                del prm
+            stack.append(da.map_blocks(read_block, slcs, dtype=dtype, chunks=chunks))
+            del slcs
+        stack = da.stack(stack)
+
+        coords = {'date': pd.to_datetime(dates), 'y': ys[ymin:ymax], 'x': xs[xmin:xmax]}
+        if scale is not None:
+            ds = xr.DataArray(stack, coords=coords).rename('data')
+        else:
+            ds = xr.merge([xr.DataArray(stack[:, 0], coords=coords).rename('re'),
+                           xr.DataArray(stack[:, 1], coords=coords).rename('im')])
         del stack
 
+        # there is no complex int16 datatype, so return two variables for real and imag parts when scale is None
+        # complex values are already scaled and zeros (NODATA) are masked by the SLC reader
+        return ds
+
+    def _open_data_cache(self, name, dates=None, scale=2.5e-07, debug=False):
+        """
+        Open the SLC stack using the decoded SLC cache stack, see open_data().
+        """
+        import xarray as xr
+        import pandas as pd
+        import numpy as np
+        import dask.array as da
+        import os
+        from .PRM import PRM
+
+        if dates is None:
+            dates = np.unique(self.df.index.values)
+        dates = np.asarray(dates)
+
+        subswaths = self.get_subswaths()
+        if not isinstance(subswaths, (str, int)):
+            subswaths = ''.join(map(str, subswaths))
+
+        # lazy SLC stack, the files are decoded only for the missed dates
+        data = self.open_data(dates, scale=None, debug=debug, cache=False)
+        timestamps = pd.to_datetime(dates)
+
+        # the cache is always stored per date as NetCDF files, the Zarr store would be opened instead of them
+        # and it can be the user product so it is never removed here
+        assert not os.path.exists(self.get_zarr_filename(name)), \
+            f'ERROR: Zarr store {self.get_zarr_filename(name)} exists, use another SLC cache name or remove the store'
+
+        def is_valid(date):
+            filename = self.get_filenames([date], name)[0]
+            if not os.path.exists(filename):
+                return False
+            mtime = os.stat(filename).st_mtime_ns
+            for subswath in subswaths:
+                prm = self.PRM(date, subswath=int(subswath))
+                slc_filename = os.path.join(os.path.dirname(prm.filename), prm.get('SLC_file'))
+                if max(os.stat(prm.filename).st_mtime_ns, os.stat(slc_filename).st_mtime_ns) > mtime:
+                    return False
+            return True
+
+        valid = np.asarray([is_valid(date) for date in dates], dtype=bool)
+        if valid.any():
+            # the cached grids need to match the current cropped extent
+            cached = self.open_stack(name, dates[valid])
+            if not (np.array_equal(cached.y.values, data.y.values) and np.array_equal(cached.x.values, data.x.values)):
+                valid[:] = False
+            del cached
+        if debug:
+            print ('DEBUG: open_data: cached dates', valid.sum(), 'of', valid.size)
+        if not valid.all():
+            self.save_stack(data.sel(date=timestamps[~valid]), name, caption='Caching SLC', backend='netcdf')
+        del data
+
+        data = self.open_stack(name, dates).sel(date=timestamps)
         if scale is None:
-            # there is no complex int16 datatype, so return two variables for real and imag parts
-            return ds
-        # scale and return as complex values
-        ds_complex = (ds.re.astype(np.float32) + 1j*ds.im.astype(np.float32))
-        del ds
-        # zero in np.int16 type means NODATA
-        return ds_complex.where(ds_complex != 0).rename('data')
+            return data
+
+        def decode(re, im):
+            out = np.empty(re.shape, dtype=np.complex64)
+            for ind in range(re.shape[0]):
+                out[ind] = PRM.SLC_block_complex(re[ind], im[ind], np.float32(scale), re.shape[1:])
+            return out
+
+        slc = da.map_blocks(decode, data.re.data, data.im.data, dtype=np.complex64)
+        return xr.DataArray(slc, coords=data.re.coords).rename('data')
 
 #     def open_geotif(self, dates=None, subswath=None, intensity=False, chunksize=None):
 #         """
@@ -575,8 +719,12 @@ class IO(datagrid):
                 data = data.rename(name)
             data = data.to_dataset().assign_attrs({'dataarray': data.name})
 
+        # per-product storage profiles use the variable names or the file name
+        profiles = {varname: varname if varname in self.netcdf_profiles else name for varname in data.data_vars}
+        data = data.assign({varname: self.netcdf_quantize(data[varname], profiles[varname]) for varname in data.data_vars})
         is_dask = isinstance(data[list(data.data_vars)[0]].data, dask.array.Array)
-        encoding = {varname: self._compression(data[varname].shape, chunksize=chunksize) for varname in data.data_vars}
+        encoding = {varname: self._compression(data[varname].shape, chunksize=chunksize, profile=profiles[varname])
+                    for varname in data.data_vars}
         #print ('save_cube encoding', encoding)
         #print ('is_dask', is_dask, 'encoding', encoding)
 
@@ -622,12 +770,18 @@ class IO(datagrid):
         stack.open_stack('phase15m')
         stack.open_stack('intf90m',[['2018-02-21','2018-03-11']])
         stack.open_stack('intf90m', stack.get_pairs([['2018-02-21','2018-03-11']]))
+
+        The single Zarr store written by the 'zarr' stack backend is used when it exists.
         """
         import xarray as xr
         import pandas as pd
         import numpy as np
         import glob
-    
+        import os
+
+        if os.path.exists(self.get_zarr_filename(name)):
+            return self._open_stack_zarr(name, stack)
+
         if stack is None:
             # look for all stack files
             #filenames = self.get_filenames(['*'], name)[0]
@@ -642,13 +796,16 @@ class IO(datagrid):
             filenames = self.get_filenames(stack, name)
         #print ('filenames', filenames)
 
-        data = xr.open_mfdataset(
-            filenames,
-            engine=self.netcdf_engine,
-            parallel=True,
-            concat_dim='stackvar',
-            combine='nested'
-        )
+        # use the sidecar index written by save_stack() to prevent opening all the files
+        data = self._open_stack_index(name, filenames)
+        if data is None:
+            data = xr.open_mfdataset(
+                filenames,
+                engine=self.netcdf_engine,
+                parallel=True,
+                concat_dim='stackvar',
+                combine='nested'
+            )
         
         if 'stack' in data.dims:
             if 'y' in data.coords and 'x' in data.coords:
@@ -693,7 +850,7 @@ class IO(datagrid):
             if dim in data.coords:
                 if data[dim].shape == () or 'stack' in data.dims:
                     if data[dim].shape == ():
-                        data = data.assign_coords(pair=('stackvar', [data[dim].values]))
+                        data = data.assign_coords({dim: ('stackvar', [data[dim].values])})
                     data = data.rename({'stackvar': dim}).set_index({dim: dim})
                 else:
                     data = data.swap_dims({'stackvar': dim})
@@ -776,24 +933,54 @@ class IO(datagrid):
 #             del delayeds, result
 #             import gc; gc.collect()
 
-    # use save_mfdataset
-    def save_stack(self, data, name, caption='Saving 2D Stack', queue=None, timeout=None):
+    def save_stack(self, data, name, caption='Saving 2D Stack', queue=None, timeout=None, backend=None):
+        """
+        Save a lazy or materialized 3D stack as a NetCDF file per date or pair.
+
+        The stack items are submitted to the Dask cluster one by one and the written items are released
+        immediately. The number of in-flight items is limited by the queue size and their total size by
+        netcdf_inflight_bytes per worker, which keeps the workers memory bounded without cluster restarts.
+        The writing metrics are available as save_stack_metrics attribute after the call.
+
+        Parameters
+        ----------
+        data : xarray.Dataset or xarray.DataArray
+            The stack to save.
+        name : str
+            The stack name.
+        caption : str, optional
+            The progress bar caption. Default is 'Saving 2D Stack'.
+        queue : int, optional
+            The maximum number of in-flight stack items. Default is None to use netcdf_queue.
+        timeout : float, optional
+            Not used, the cluster restarts are not required anymore. Kept for compatibility.
+        backend : str, optional
+            The storage backend 'netcdf' or 'zarr'. Default is None to use stack_backend.
+
+        Returns
+        -------
+        None
+        """
         import numpy as np
         import xarray as xr
         import pandas as pd
         import dask
         import os
-        from dask.distributed import get_client
+        import time
+        from tqdm.auto import tqdm
+        from dask.distributed import get_client, wait
         import warnings
+
+        if backend is None:
+            backend = self.stack_backend
+        if backend == 'zarr':
+            return self._save_stack_zarr(data, name, caption, queue)
+        assert backend == 'netcdf', f"ERROR: unknown stack backend '{backend}'. Use 'netcdf' or 'zarr'."
+
         # suppress Dask warning "RuntimeWarning: invalid value encountered in divide"
         warnings.filterwarnings('ignore')
         warnings.filterwarnings('ignore', module='dask')
         warnings.filterwarnings('ignore', module='dask.core')
-        # Filter out Dask "Restarting worker" warnings
-        warnings.filterwarnings("ignore", module="distributed.nanny")
-        import logging
-        # Suppress Dask "Restarting worker" warnings
-        logging.getLogger('distributed.nanny').setLevel(logging.ERROR)
         # disable "distributed.utils_perf - WARNING - full garbage collections ..."
         try:
             from dask.distributed import utils_perf
@@ -838,47 +1025,75 @@ class IO(datagrid):
     
         if isinstance(data, xr.DataArray):
             data = data.to_dataset().assign_attrs({'dataarray': data.name})
-        encoding = {varname: self._compression(data[varname].shape[1:]) for varname in data.data_vars}
+        # per-product storage profiles use the variable names or the stack name
+        profiles = {varname: varname if varname in self.netcdf_profiles else name for varname in data.data_vars}
+        data = data.assign({varname: self.netcdf_quantize(data[varname], profiles[varname]) for varname in data.data_vars})
+        encoding = {varname: self._compression(data[varname].shape[1:], profile=profiles[varname]) for varname in data.data_vars}
         #print ('save_stack encoding', encoding)
     
-        # Applying iterative processing to prevent Dask scheduler deadlocks.
-        counter = 0
-        digits = len(str(stacksize))
-        # Splitting all the pairs into chunks, each containing approximately queue pairs.
-        n_chunks = stacksize // queue if stacksize > queue else 1
-        for chunk in np.array_split(range(stacksize), n_chunks):
-            dss = [data.isel({stackvar: ind}) for ind in chunk]
-            if stackvar == 'date':
-                stackvals = [ds[stackvar].dt.date.values for ds in dss]
-            else:
-                stackvals = [ds[stackvar].item().split(' ') for ds in dss]
-            # save to NetCDF file
-            filenames = self.get_filenames(stackvals, name)
-            #[os.remove(filename) for filename in filenames if os.path.exists(filename)]
-            delayeds = xr.save_mfdataset(dss,
-                                         filenames,
-                                         encoding=encoding,
-                                         engine=self.netcdf_engine,
-                                         compute=not is_dask)
-            # process lazy chunk
-            if is_dask:
-                if n_chunks > 1:
-                    chunk_caption = f'{caption}: {(counter+1):0{digits}}...{(counter+len(chunk)):0{digits}} from {stacksize}'
-                else:
-                    chunk_caption = caption
-                tqdm_dask(result := dask.persist(delayeds), desc=chunk_caption)
-                del delayeds, result
-                # cleanup - sometimes writing NetCDF handlers are not closed immediately and block reading access
-                import gc; gc.collect()
-                # cleanup - release all workers memory, call garbage collector before to prevent heartbeat errors
-                if timeout is not None:
-                    client.restart(timeout=timeout, wait_for_workers=True)
-#                 # more granular control
-#                 n_workers = len(client.nthreads())
-#                 client.restart(wait_for_workers=False)
-#                 client.wait_for_workers(n_workers, timeout=timeout)
-            # update chunks counter
-            counter += len(chunk)
+        filenames = []
+        if not is_dask:
+            # materialized data is written sequentially
+            for ind in range(stacksize):
+                ds = data.isel({stackvar: ind})
+                stackval = ds[stackvar].dt.date.values if stackvar == 'date' else ds[stackvar].item().split(' ')
+                filename = self.get_filenames([stackval], name)[0]
+                ds.to_netcdf(filename, encoding=encoding, engine=self.netcdf_engine)
+                filenames.append(filename)
+                del ds
+            self._save_stack_index(data, name, stackvar, filenames)
+            return
+
+        # stream the stack items to storage and keep the in-flight writes bounded by queue size and bytes
+        n_workers = max(len(client.nthreads()), 1)
+        max_bytes = self.netcdf_inflight_bytes * n_workers
+        metrics = {'items': 0, 'bytes': 0, 'seconds': 0.0, 'throughput_mbps': 0.0, 'max_worker_memory': 0}
+        inflight = {}
+        inflight_bytes = 0
+        start = time.perf_counter()
+
+        def release(futures):
+            nonlocal inflight_bytes
+            for future in futures:
+                nbytes = inflight.pop(future)
+                # raise the writing errors
+                future.result()
+                inflight_bytes -= nbytes
+                metrics['items'] += 1
+                metrics['bytes'] += nbytes
+                progress_bar.update(1)
+                del future
+            # worker memory is reported by the scheduler heartbeats
+            memory = [worker.get('metrics', {}).get('memory', 0) for worker in client.scheduler_info()['workers'].values()]
+            metrics['max_worker_memory'] = max([metrics['max_worker_memory'], *memory])
+            metrics['seconds'] = time.perf_counter() - start
+            metrics['throughput_mbps'] = metrics['bytes'] / 2**20 / max(metrics['seconds'], 1e-6)
+            progress_bar.set_postfix({'MB/s': round(metrics['throughput_mbps'], 1)})
+
+        with tqdm(desc=caption, total=stacksize) as progress_bar:
+            for ind in range(stacksize):
+                ds = data.isel({stackvar: ind})
+                stackval = ds[stackvar].dt.date.values if stackvar == 'date' else ds[stackvar].item().split(' ')
+                filename = self.get_filenames([stackval], name)[0]
+                filenames.append(filename)
+                nbytes = ds.nbytes
+                # wait for the completed writes when the next one does not fit
+                while len(inflight) > 0 and (len(inflight) >= queue or inflight_bytes + nbytes > max_bytes):
+                    done, _ = wait(list(inflight.keys()), return_when='FIRST_COMPLETED')
+                    release(done)
+                    del done
+                delayed = ds.to_netcdf(filename, encoding=encoding, engine=self.netcdf_engine, compute=False)
+                inflight[client.compute(delayed)] = nbytes
+                inflight_bytes += nbytes
+                del ds, delayed
+            while len(inflight) > 0:
+                done, _ = wait(list(inflight.keys()), return_when='FIRST_COMPLETED')
+                release(done)
+                del done
+        self.save_stack_metrics = metrics
+        # cleanup - sometimes writing NetCDF handlers are not closed immediately and block reading access
+        import gc; gc.collect()
+        self._save_stack_index(data, name, stackvar, filenames)
 
 #     # alternative realization
 #     def save_stack(self, data, name, caption='Saving 2D Stack', queue=50):
@@ -973,11 +1188,313 @@ class IO(datagrid):
 #         # cleanup - sometimes writing NetCDF handlers are not closed immediately and block reading access
 #         import gc; gc.collect()
 
+    def get_stack_index_filename(self, name):
+        """
+        Get the filename of the sidecar stack index written by save_stack().
+        """
+        import os
+        return os.path.join(self.basedir, f'{name}.index.json')
+
+    def _save_stack_index(self, data, name, stackvar, filenames):
+        """
+        Write the sidecar stack index with the files, stack coordinates, variables and attributes.
+
+        The index allows open_stack() to build the lazy stack without opening every file.
+        The stored items of the existing index are preserved when the stack structure is the same.
+        """
+        import numpy as np
+        import json
+        import os
+
+        def to_json(value):
+            if isinstance(value, np.ndarray):
+                return value.tolist()
+            if isinstance(value, np.datetime64):
+                return str(np.datetime_as_string(value, unit='ns'))
+            if isinstance(value, np.generic):
+                return value.item()
+            return str(value)
+
+        # only 2D grids stacks with regular coordinates restored from the attributes are supported
+        variables = {varname: {'dims': list(data[varname].dims[1:]),
+                               'shape': list(data[varname].shape[1:]),
+                               'dtype': str(data[varname].dtype),
+                               'attrs': data[varname].attrs} for varname in data.data_vars}
+        coords = [coord for coord in data.coords if data[coord].dims == (stackvar,)]
+        if any([dim not in ['y', 'x', 'lat', 'lon'] for var in variables.values() for dim in var['dims']]) \
+                or any([coord not in coords for coord in data.coords]):
+            self.delete_stack_index(name)
+            return
+        index = {'stackvar': stackvar,
+                 'attrs': data.attrs,
+                 'variables': variables,
+                 'coords': {coord: str(data[coord].dtype) for coord in coords}}
+        index = json.loads(json.dumps(index, default=to_json))
+
+        items = {}
+        filename = self.get_stack_index_filename(name)
+        if os.path.exists(filename):
+            with open(filename) as f:
+                stored = json.load(f)
+            if stored.get('items') is not None and {key: stored.get(key) for key in index} == index:
+                items = stored['items']
+        for (ind, path) in enumerate(filenames):
+            stat = os.stat(path)
+            items[os.path.basename(path)] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                                             'coords': {coord: to_json(data[coord].values[ind]) for coord in coords}}
+        index['items'] = items
+        with open(filename, 'w') as f:
+            json.dump(index, f)
+
+    def _open_stack_index(self, name, filenames):
+        """
+        Build the lazy stack like xarray.open_mfdataset() output using the sidecar stack index.
+
+        The files are opened only when the data is computed. Return None when the index is missing
+        or does not match the files.
+        """
+        import xarray as xr
+        import numpy as np
+        import pandas as pd
+        import dask
+        import json
+        import os
+
+        filename = self.get_stack_index_filename(name)
+        if not os.path.exists(filename) or len(filenames) == 0:
+            return None
+        with open(filename) as f:
+            index = json.load(f)
+
+        items = []
+        for path in filenames:
+            item = index['items'].get(os.path.basename(path))
+            if item is None or not os.path.exists(path):
+                return None
+            stat = os.stat(path)
+            if stat.st_size != item['size'] or stat.st_mtime_ns != item['mtime']:
+                return None
+            items.append(item)
+
+        def load_block(path, varname, dtype, engine):
+            with xr.open_dataset(path, engine=engine) as ds:
+                return ds[varname].values.astype(dtype, copy=False)
+
+        data_vars = {}
+        for (varname, var) in index['variables'].items():
+            blocks = [dask.array.from_delayed(dask.delayed(load_block)(path, varname, var['dtype'], self.netcdf_engine),
+                                              shape=tuple(var['shape']), dtype=var['dtype']) for path in filenames]
+            data_vars[varname] = xr.DataArray(dask.array.stack(blocks), dims=('stackvar', *var['dims']), attrs=var['attrs'])
+            del blocks
+
+        coords = {}
+        for (coord, dtype) in index['coords'].items():
+            values = [item['coords'][coord] for item in items]
+            if np.dtype(dtype).kind == 'M':
+                values = pd.to_datetime(values).values
+            else:
+                # NetCDF strings are decoded as objects
+                values = np.asarray(values, dtype=object if np.dtype(dtype).kind in 'OSU' else dtype)
+            # the same values are not concatenated by xarray.open_mfdataset()
+            coords[coord] = values[0, ...] if np.all(values == values[0]) else ('stackvar', values)
+        return xr.Dataset(data_vars, coords=coords, attrs=index['attrs'])
+
+    def delete_stack_index(self, name):
+        import os
+
+        filename = self.get_stack_index_filename(name)
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    def _zarr_compression(self, profile=None):
+        """
+        Return the Zarr compressor encoding for the storage profile, see netcdf_profile().
+
+        The profile compression is applied by Blosc compressor using 'zlib' algorithm for 'zlib' and 'lz4' for 'lzf'
+        which is not available for Zarr. The profile 'chunksize' and 'layout' options are not used for Zarr store.
+        """
+        import zarr
+
+        opts = self.netcdf_profile(profile)
+        if opts['algorithm'] is None or (opts['algorithm'] != 'lzf' and opts['complevel'] < 0):
+            compressor = None
+        elif int(zarr.__version__.split('.')[0]) >= 3:
+            from zarr.codecs import BloscCodec
+            compressor = BloscCodec(cname='lz4' if opts['algorithm'] == 'lzf' else opts['algorithm'],
+                                    clevel=5 if opts['algorithm'] == 'lzf' else opts['complevel'],
+                                    shuffle='shuffle' if opts['shuffle'] else 'noshuffle')
+        else:
+            from numcodecs import Blosc
+            compressor = Blosc(cname='lz4' if opts['algorithm'] == 'lzf' else opts['algorithm'],
+                               clevel=5 if opts['algorithm'] == 'lzf' else opts['complevel'],
+                               shuffle=Blosc.SHUFFLE if opts['shuffle'] else Blosc.NOSHUFFLE)
+        if int(zarr.__version__.split('.')[0]) >= 3:
+            return {'compressors': None if compressor is None else (compressor,)}
+        return {'compressor': compressor}
+
+    def _save_stack_zarr(self, data, name, caption='Saving 2D Stack', queue=None):
+        """
+        Save a lazy or not lazy 3D stack to a single chunked Zarr store.
+
+        The store is chunked by zarr_chunksize_stack along the stack (date or pair) dimension and by netcdf_chunksize
+        along the grid dimensions. The dates or pairs missed in the existing store are appended and the stored ones
+        are rewritten in place. Dask chunks are aligned to the store chunks, so the workers write the chunks
+        concurrently without locking and without restarting the workers between the write operations.
+        The storage profiles quantization and compression are applied like to NetCDF files (see _zarr_compression).
+        """
+        import numpy as np
+        import xarray as xr
+        import pandas as pd
+        import dask
+        import os
+        import warnings
+        # suppress Dask warning "RuntimeWarning: invalid value encountered in divide"
+        warnings.filterwarnings('ignore')
+        warnings.filterwarnings('ignore', module='dask')
+        warnings.filterwarnings('ignore', module='dask.core')
+
+        if isinstance(data, xr.Dataset):
+            stackvar = data[list(data.data_vars)[0]].dims[0]
+            is_dask = isinstance(data[list(data.data_vars)[0]].data, dask.array.Array)
+        elif isinstance(data, xr.DataArray):
+            stackvar = data.dims[0]
+            is_dask = isinstance(data.data, dask.array.Array)
+        else:
+            raise Exception('Argument grid is not xr.Dataset or xr.DataArray object')
+        stacksize = data[stackvar].size
+
+        if queue is None:
+            queue = self.netcdf_queue
+        if queue is None:
+            # process all the stack items in a single operation
+            queue = stacksize
+        stackchunk = self.zarr_chunksize_stack
+        # write complete store chunks for every queue
+        queue = max(stackchunk, queue // stackchunk * stackchunk)
+
+        if 'stack' in data.dims and isinstance(data.coords['stack'].to_index(), pd.MultiIndex):
+            # replace multiindex by sequential numbers 0,1,...
+            data = data.reset_index('stack')
+            chunksize = self.netcdf_chunksize1d
+            dask_chunksize = max(chunksize, self.chunksize1d // chunksize * chunksize)
+        else:
+            chunksize = self.netcdf_chunksize
+            dask_chunksize = max(chunksize, self.chunksize // chunksize * chunksize)
+
+        if isinstance(data, xr.DataArray):
+            data = data.to_dataset().assign_attrs({'dataarray': data.name})
+        # per-product storage profiles use the variable names or the stack name
+        profiles = {varname: varname if varname in self.netcdf_profiles else name for varname in data.data_vars}
+        data = data.assign({varname: self.netcdf_quantize(data[varname], profiles[varname]) for varname in data.data_vars})
+        encoding = {varname: {'chunks': (stackchunk, *[min(chunksize, size) for size in data[varname].shape[1:]]),
+                              **self._zarr_compression(profiles[varname])}
+                    for varname in data.data_vars}
+
+        filename = self.get_zarr_filename(name)
+        if os.path.exists(filename):
+            stored = xr.open_zarr(filename)[stackvar].values
+        else:
+            stored = np.asarray([])
+        exists = np.isin(data[stackvar].values, stored)
+
+        # rewrite the stored stack items in place
+        for ind in np.where(exists)[0]:
+            ds = data.isel({stackvar: [ind]})
+            idx = int(np.where(stored == ds[stackvar].values[0])[0][0])
+            # only the variables defined on the stack dimension are allowed for region writing
+            ds = ds.drop_vars([varname for varname in ds.variables if stackvar not in ds[varname].dims])
+            if is_dask:
+                ds = ds.chunk({dim: 1 if dim == stackvar else dask_chunksize for dim in ds.dims})
+            # every store chunk is partially rewritten by a single dask chunk only
+            delayed = ds.to_zarr(filename, region={stackvar: slice(idx, idx + 1)}, safe_chunks=False, compute=not is_dask)
+            if is_dask:
+                tqdm_dask(result := dask.persist(delayed), desc=f'{caption}: {ds[stackvar].values[0]}')
+                del result
+            del delayed, ds
+
+        # append the new stack items
+        size = stored.size
+        counter = 0
+        inds = np.where(~exists)[0]
+        digits = len(str(inds.size))
+        for chunk in [inds[i:i + queue] for i in range(0, inds.size, queue)]:
+            ds = data.isel({stackvar: chunk})
+            if is_dask:
+                # align dask chunks to the store chunks starting from the partially filled last one
+                head = min((stackchunk - size % stackchunk) % stackchunk, len(chunk))
+                tail = len(chunk) - head
+                chunks = ([head] if head else []) + [stackchunk] * (tail // stackchunk) + ([tail % stackchunk] if tail % stackchunk else [])
+                ds = ds.chunk({dim: tuple(chunks) if dim == stackvar else dask_chunksize for dim in ds.dims})
+            if size == 0:
+                delayed = ds.to_zarr(filename, mode='w', encoding=encoding, compute=not is_dask)
+            else:
+                delayed = ds.to_zarr(filename, append_dim=stackvar, compute=not is_dask)
+            if is_dask:
+                if inds.size > queue:
+                    chunk_caption = f'{caption}: {(counter+1):0{digits}}...{(counter+len(chunk)):0{digits}} from {inds.size}'
+                else:
+                    chunk_caption = caption
+                tqdm_dask(result := dask.persist(delayed), desc=chunk_caption)
+                del result
+            del delayed, ds
+            size += len(chunk)
+            counter += len(chunk)
+
+    def _open_stack_zarr(self, name, stack=None):
+        """
+        Open a 3D stack from a single chunked Zarr store. See open_stack() for the arguments.
+        """
+        import xarray as xr
+        import pandas as pd
+        import numpy as np
+
+        data = xr.open_zarr(self.get_zarr_filename(name))
+        stackvar = data[list(data.data_vars)[0]].dims[0]
+
+        if stack is None:
+            pass
+        elif isinstance(stack, (list, tuple, np.ndarray)) and len(np.asarray(stack).shape) == 1:
+            # dates
+            data = data.sel({stackvar: pd.to_datetime(sorted(stack))})
+        else:
+            # pairs
+            data = data.sel({stackvar: self.get_pairs(stack)['pair'].values})
+
+        if 'stack' in data.dims:
+            if 'y' in data.coords and 'x' in data.coords:
+                multi_index_names = ['y', 'x']
+            elif 'lat' in data.coords and 'lon' in data.coords:
+                multi_index_names = ['lat', 'lon']
+            multi_index = pd.MultiIndex.from_arrays([data[multi_index_names[0]].values, data[multi_index_names[1]].values],
+                                                    names=multi_index_names)
+            data = data.drop_vars(multi_index_names).assign_coords(stack=multi_index).chunk({'stack': self.chunksize1d})
+        else:
+            data = data.chunk({dim: self.chunksize for dim in data.dims if dim != stackvar})
+
+        # revert dataarray converted to dataset
+        data_vars = list(data.data_vars)
+        if len(data_vars) == 1 and 'dataarray' in data.attrs:
+            assert data.attrs['dataarray'] == data_vars[0]
+            data = data[data_vars[0]]
+
+        # convert string (or already timestamp) dates to dates
+        for dim in ['date', 'ref', 'rep']:
+            if dim in data.dims:
+                data[dim] = pd.to_datetime(data[dim])
+
+        return data
+
     def delete_stack(self, name):
         import os
+        import shutil
 
         filenames = self._glob_re(name + '_[0-9]{8}(_[0-9]{8})*.grd')
         #print ('filenames', filenames)
         for filename in filenames:
             if os.path.exists(filename):
                 os.remove(filename)
+        # single Zarr store
+        filename = self.get_zarr_filename(name)
+        if os.path.exists(filename):
+            shutil.rmtree(filename)
+        self.delete_stack_index(name)
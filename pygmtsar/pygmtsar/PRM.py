@@ -9,6 +9,10 @@
 # ----------------------------------------------------------------------------
 from .datagrid import datagrid
 from .PRM_gmtsar import PRM_gmtsar
+# required for function decorators
+from numba import jit
+# import directive is not compatible to numba
+import numpy as np
 
 class PRM(datagrid, PRM_gmtsar):
     
@@ -215,9 +219,7 @@ class PRM(datagrid, PRM_gmtsar):
         PRM
             A PRM object.
         """
-        from io import StringIO
-        prm = StringIO('\n'.join(prm_list))
-        return PRM._from_io(prm)
+        return PRM(PRM._parse(prm_list))
 
     @staticmethod
     def from_str(prm_string):
@@ -234,15 +236,13 @@ class PRM(datagrid, PRM_gmtsar):
         PRM
             A PRM object.
         """
-        from io import StringIO
         if isinstance(prm_string, bytes):
             # for cases like
             #return PRM.from_str(os.read(pipe2[0],int(10e6))
             prm_string = prm_string.decode('utf-8')
         # for cases like
         # return PRM.from_str(os.read(pipe2[0],int(10e6).decode('utf8'))
-        prm = StringIO(prm_string)
-        return PRM._from_io(prm)
+        return PRM(PRM._parse(prm_string.splitlines()))
 
     @staticmethod
     def from_file(prm_filename):
@@ -271,20 +271,54 @@ class PRM(datagrid, PRM_gmtsar):
 
         Parameters
         ----------
-        prm : IO stream
-            The IO stream.
+        prm : IO stream or str
+            The IO stream or the filename.
 
         Returns
         -------
         PRM
             A PRM object.
         """
-        import pandas as pd
+        if isinstance(prm, str):
+            with open(prm, 'r') as f:
+                return PRM(PRM._parse(f))
+        return PRM(PRM._parse(prm))
+
+    @staticmethod
+    def _parse(lines):
+        """
+        Parse 'name = value' lines to an ordered dictionary.
 
-        df = pd.read_csv(prm, sep='\s+=\s+', header=None, names=['name', 'value'], engine='python').set_index('name')
-        df['value'] = df['value'].map(PRM.to_numeric_or_original)
+        The parser follows pandas.read_csv(sep='\\s+=\\s+', header=None) rules used before: blank lines are skipped,
+        the lines without separator have NaN value and numeric values are converted to floats.
+        The duplicated names keep the last value placed at the last position, so the parameters appended
+        by GMTSAR tools like to SAT_baseline output replace the previous ones.
+
+        Parameters
+        ----------
+        lines : iterable
+            The PRM lines.
 
-        return PRM(df)
+        Returns
+        -------
+        dict
+            The parameter names and values.
+        """
+        import re
+
+        separator = re.compile(r'\s+=\s+')
+        params = {}
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if line.strip() == '':
+                continue
+            items = separator.split(line, maxsplit=1)
+            name = items[0]
+            value = PRM.to_numeric_or_original(items[1]) if len(items) > 1 else np.nan
+            # the last duplicate wins and defines the position
+            params.pop(name, None)
+            params[name] = value
+        return params
 
     def __init__(self, prm=None):
         """
@@ -292,8 +326,8 @@ class PRM(datagrid, PRM_gmtsar):
 
         Parameters
         ----------
-        prm : PRM or pd.DataFrame, optional
-            The PRM object or DataFrame to initialize from. Default is None.
+        prm : PRM, dict or pd.DataFrame, optional
+            The PRM object, dictionary or DataFrame to initialize from. Default is None.
 
         Returns
         -------
@@ -301,21 +335,46 @@ class PRM(datagrid, PRM_gmtsar):
         """
         import pandas as pd
 
-        # Initialize an empty DataFrame if prm is None
+        # Initialize an empty dictionary if prm is None
         if prm is None:
-            _prm = pd.DataFrame(columns=['name', 'value'])
+            params = {}
         elif isinstance(prm, pd.DataFrame):
-            _prm = prm.reset_index()
+            params = dict(zip(prm.index, prm['value']))
+        elif isinstance(prm, dict):
+            params = prm
         else:
-            _prm = prm.df.reset_index()
+            params = prm.params
 
         # Convert values to numeric where possible, keep original value otherwise
-        _prm['value'] = _prm['value'].map(PRM.to_numeric_or_original)
-
-        # Set the DataFrame for the PRM object
-        self.df = _prm[['name', 'value']].drop_duplicates(keep='last').set_index('name')
+        self.params = {name: PRM.to_numeric_or_original(value) for (name, value) in params.items()}
         self.filename = None
 
+    @property
+    def df(self):
+        """
+        The read-only DataFrame representation of the PRM object for compatibility.
+
+        The DataFrame is a new copy of the parameters on every access, so the in-place modifications
+        like to prm.df.loc[name] = value are not applied to the PRM object. Use set() method instead.
+        """
+        import pandas as pd
+        return pd.DataFrame({'value': list(self.params.values())},
+                            index=pd.Index(list(self.params.keys()), name='name'), dtype=object)
+
+    def copy(self):
+        """
+        Return an independent copy of the PRM object.
+
+        Returns
+        -------
+        PRM
+            The copied PRM object with the same filename.
+        """
+        prm = PRM.__new__(PRM)
+        prm.params = self.params.copy()
+        prm.filename = self.filename
+        return prm
+
     def __eq__(self, other):
         """
         Compare two PRM objects for equality.
@@ -330,7 +389,7 @@ class PRM(datagrid, PRM_gmtsar):
         bool
             True if the PRM objects are equal, False otherwise.
         """
-        return isinstance(self, PRM) and self.df == other.df
+        return isinstance(other, PRM) and self.params == other.params
 
     def __str__(self):
         """
@@ -355,9 +414,9 @@ class PRM(datagrid, PRM_gmtsar):
             are included in the string.
         """
         if self.filename:
-            return 'Object %s (%s) %d items\n%r' % (self.__class__.__name__, self.filename, len(self.df), self.df)
+            return 'Object %s (%s) %d items\n%r' % (self.__class__.__name__, self.filename, len(self.params), self.df)
         else:
-            return 'Object %s %d items\n%r' % (self.__class__.__name__, len(self.df), self.df)
+            return 'Object %s %d items\n%r' % (self.__class__.__name__, len(self.params), self.df)
 
     # use 'g' format for Python and numpy float values
     def set(self, prm=None, **kwargs):
@@ -379,12 +438,10 @@ class PRM(datagrid, PRM_gmtsar):
         import numpy as np
 
         if isinstance(prm, PRM):
-            for (key, value) in prm.df.itertuples():
-                self.df.loc[key] = value
+            self.params.update(prm.params)
         elif prm is not None:
             raise Exception('Arguments is not a PRM object')
-        for key, value in kwargs.items():
-            self.df.loc[key] = value
+        self.params.update(kwargs)
         return self
 
     def to_dataframe(self):
@@ -464,8 +521,21 @@ class PRM(datagrid, PRM_gmtsar):
         str
             The PRM string.
         """
-        return self.df.reset_index().astype(str).apply(lambda row: (' = ').join(row), axis=1)\
-            .to_csv(output, header=None, index=None)
+        lines = []
+        for (name, value) in self.params.items():
+            line = f'{name} = {value}'
+            # quote the lines like pandas.to_csv() does
+            if ',' in line or '"' in line or '\n' in line or '\r' in line:
+                line = '"' + line.replace('"', '""') + '"'
+            lines.append(line + '\n')
+        prm_string = ''.join(lines)
+        if output is None:
+            return prm_string
+        if isinstance(output, str):
+            with open(output, 'w') as f:
+                f.write(prm_string)
+        else:
+            output.write(prm_string)
 
     def sel(self, *args):
         """
@@ -481,7 +551,7 @@ class PRM(datagrid, PRM_gmtsar):
         PRM
             The new PRM object with selected attributes.
         """
-        return PRM(self.df.loc[[*args]])
+        return PRM({key: self.params[key] for key in args})
 
     def __add__(self, other):
         """
@@ -544,8 +614,7 @@ class PRM(datagrid, PRM_gmtsar):
             The values of the specified attributes. If only one attribute is requested, 
             return its value directly. If multiple attributes are requested, return a list of values.
         """
-        vals = [self.df.loc[[key]].iloc[0].values[0] for key in args]
-        out = [int(v) if k in self.int_types else v for (k, v) in zip(args,vals)]
+        out = [int(self.params[k]) if k in self.int_types else self.params[k] for k in args]
         if len(out) == 1:
             return out[0]
         return out
@@ -759,8 +828,94 @@ class PRM(datagrid, PRM_gmtsar):
 #                 buffer.tofile(f)
 #                 del buffer, re, im, slc_block
 
-    # note: only one dimension chunked due to sequential file reading 
-    def read_SLC_int(self, scale=2.5e-07, shape=None):
+    @staticmethod
+    @jit(nopython=True, nogil=True)
+    def SLC_block_complex(re, im, scale, shape):
+        """
+        Decode interleaved int16 SLC window into complex64 grid in a single pass.
+
+        Zero values are NODATA and the grid cells outside of the window are NODATA too.
+        """
+        # import directive is not compatible to numba
+        #import numpy as np
+        out = np.full(shape, np.nan, dtype=np.complex64)
+        for i in range(re.shape[0]):
+            for j in range(re.shape[1]):
+                if re[i, j] != 0 or im[i, j] != 0:
+                    out[i, j] = complex(scale * re[i, j], scale * im[i, j])
+        return out
+
+    def _SLC_blocks(self, func, dtype, shape=None, chunksize=None):
+        """
+        Build lazy 2D grid from SLC file memory-mapped as (re, im) int16 records.
+
+        The file is read by arbitrary 2D windows defined by chunksize and func(re, im, shape) converts the window
+        (as zero-copy strided views of the real and imaginary parts) to the output block of the specified shape.
+        """
+        import dask.array as da
+        import os
+
+        prm = PRM.from_file(self.filename)
+        # num_patches multiplier is omitted
+        slc_filename, xdim, ydim = prm.get('SLC_file', 'num_rng_bins', 'num_valid_az')
+        dirname = os.path.dirname(self.filename)
+        slc_filename = os.path.join(dirname, slc_filename)
+
+        if shape is None:
+            shape = (ydim, xdim)
+        if chunksize is None:
+            chunksize = self.chunksize
+
+        def read_SLC_block(block_info=None):
+            (y0, y1), (x0, x1) = block_info[None]['array-location']
+            # [real_0, imag_0, real_1, imag_1, real_2, imag_2, ...]
+            # data file can include additional data outside of the specified dimensions
+            slc = np.memmap(slc_filename, dtype=np.dtype([('re', np.int16), ('im', np.int16)]), mode='r', shape=(ydim, xdim))
+            # the window part inside of the file, the rest is padding to the specified reference frame
+            window = np.asarray(slc[y0:max(min(y1, ydim), y0), x0:max(min(x1, xdim), x0)])
+            block = func(window['re'], window['im'], (y1 - y0, x1 - x0))
+            del window, slc
+            return block
+
+        return da.map_blocks(read_SLC_block, dtype=dtype,
+                             chunks=da.core.normalize_chunks(chunksize, shape=shape, dtype=dtype))
+
+    def read_SLC(self, scale=2.5e-07, shape=None, chunksize=None):
+        """
+        Read SLC (Single Look Complex) data as complex64 grid.
+
+        The int16 interleaved SLC file is memory-mapped and every 2D chunk window is decoded and scaled
+        into complex values by a single numba kernel. Zero values are converted to NODATA (NaN).
+
+        Parameters
+        ----------
+        scale : float, optional
+            The data scale factor. Default is 2.5e-07 (Sentinel-1).
+        shape : tuple, optional
+            The output grid shape to pad or crop the SLC to the reference frame. Default is None.
+        chunksize : int or tuple, optional
+            The 2D chunk window size. Default is the class attribute chunksize.
+
+        Returns
+        -------
+        xarray.DataArray
+            2D complex64 array named 'data'.
+
+        Example
+        -------
+        >>> prm = PRM.from_file(filename)
+        >>> slc = prm.read_SLC()
+        """
+        import xarray as xr
+
+        def decode(re, im, block_shape):
+            return PRM.SLC_block_complex(re, im, np.float32(scale), block_shape)
+
+        data = self._SLC_blocks(decode, np.complex64, shape, chunksize)
+        coords = {'y': np.arange(data.shape[0]) + 0.5, 'x': np.arange(data.shape[1]) + 0.5}
+        return xr.DataArray(data, coords=coords).rename('data')
+
+    def read_SLC_int(self, scale=2.5e-07, shape=None, chunksize=None):
         """
         Read SLC (Single Look Complex) data and compute the power of the signal.
         The method reads binary SLC data file, which contains alternating sequences of real and imaginary parts.
@@ -776,6 +931,7 @@ class PRM(datagrid, PRM_gmtsar):
         This function uses a data factor (DFACT = 2.5e-07) from the GMTSAR code.
         The GMTSAR note indicates that the square of the intensity is used to match gips ihconv.
         The returned intensity data is flipped up-down ("shift data up if necessary") following the GMTSAR convention.
+        The file is memory-mapped and read by 2D chunk windows, see also read_SLC() for complex output.
 
         Raises
         ------
@@ -789,106 +945,21 @@ class PRM(datagrid, PRM_gmtsar):
         >>> amp = prm.read_SLC_int()
         """
         import xarray as xr
-        import numpy as np
-        import dask
-        import dask.array as da
-        import os
-        import warnings
 
-        @dask.delayed
-        def read_SLC_block(slc_filename, start, stop):
-            # Read a chunk of the SLC file
-            # [real_0, imag_0, real_1, imag_1, real_2, imag_2, ...]
-            #print ('    offset, shape', start*2, 2*(stop-start))
-            # offset is measured in bytes
-            return np.memmap(slc_filename, dtype=np.int16, mode='r', offset=start*4, shape=(2*(stop-start),))
+        # pad to the specified reference frame using zeros
+        def read_part(part):
+            def read(re, im, block_shape):
+                out = np.zeros(block_shape, dtype=np.int16)
+                out[:re.shape[0], :re.shape[1]] = re if part == 're' else im
+                return out
+            return read
 
-        prm = PRM.from_file(self.filename)
-        # num_patches multiplier is omitted
-        #slc_filename, xdim, ydim = prm.get('SLC_file', 'num_rng_bins', 'num_valid_az')
-        slc_filename, xdim, ydim, rshift, ashift = prm.get('SLC_file', 'num_rng_bins', 'num_valid_az', 'rshift', 'ashift')
-                
-        dirname = os.path.dirname(self.filename)
-        slc_filename = os.path.join(dirname, slc_filename)
-        #print (slc_filename, ydim, xdim)
-
-        blocksize = self.netcdf_chunksize * xdim
-        blocks = int(np.ceil(ydim * xdim / blocksize))
-        #print ('chunks', chunks, 'chunksize', chunksize)
-        # Create a lazy Dask array that reads chunks of the SLC file
-        res = []
-        ims = []
-        for i in range(blocks):
-            start = i * blocksize
-            stop = min((i+1) * blocksize, ydim * xdim)
-            #assert 0, f'SLC: start={start}, stop={stop}'
-            #print ('start, stop, shape', start, stop, (stop-start))
-            # use proper output data type for complex data and intensity
-            block = da.from_delayed(read_SLC_block(slc_filename, start, stop),
-                shape=(2*(stop-start),), dtype=np.int16)
-            res.append(block[::2])
-            ims.append(block[1::2])
-            del block
-        # Concatenate the chunks together
-        # Data file can include additional data outside of the specified dimensions
-        re = da.concatenate(res).reshape((-1, xdim))[:ydim,:]
-        im = da.concatenate(ims).reshape((-1, xdim))[:ydim,:]
-        del res, ims
-        
-        assert re.shape == (ydim, xdim), f'Originated re shape ({ydim},{xdim}), but got {re.shape}'
-        assert im.shape == (ydim, xdim), f'Originated im width ({ydim},{xdim}), but got {im.shape}'
-
-        # # perform aligning on-the-fly using shifting and padding
-        # rshift_pad = None
-        # if abs(rshift) > 0:
-        #     rshift_pad = da.zeros((ydim, abs(rshift)), dtype=np.int16)
-        #     if rshift > 0:
-        #         re = da.concatenate([re[:, rshift:], rshift_pad], axis=1)
-        #         im = da.concatenate([im[:, rshift:], rshift_pad], axis=1)
-        #     elif rshift < 0:
-        #         re = da.concatenate([rshift_pad, re[:, :rshift]], axis=1)
-        #         im = da.concatenate([rshift_pad, im[:, :rshift]], axis=1)
-        
-        # ashift_pad = None
-        # if abs(ashift) > 0:
-        #     ashift_pad = da.zeros((abs(ashift), xdim), dtype=np.int16)
-        #     if ashift > 0:
-        #         re = da.concatenate([re[ashift:, :], ashift_pad], axis=0)
-        #         im = da.concatenate([im[ashift:, :], ashift_pad], axis=0)
-        #     elif ashift < 0:
-        #         re = da.concatenate([ashift_pad, re[:ashift, :]], axis=0)
-        #         im = da.concatenate([ashift_pad, im[:ashift, :]], axis=0)
-
-        # assert re.shape == (ydim, xdim), f'Expected re shape ({ydim},{xdim}), but got {re.shape} with padding {ashift_pad.shape} for ashift={ashift}, rshift={rshift}'
-        # assert im.shape == (ydim, xdim), f'Expected im width ({ydim},{xdim}), but got {im.shape} with padding {ashift_pad.shape} for ashift={ashift}, rshift={rshift}'
-        # del rshift_pad, ashift_pad
-        
-        # pad to the specified reference frame
-        if shape is not None:
-            if shape[1] > xdim:
-                rpad = da.zeros((ydim, shape[1] - xdim), dtype=np.int16)
-                re = da.concatenate([re, rpad], axis=1)
-                im = da.concatenate([im, rpad], axis=1)
-            elif shape[1] < xdim:
-                re = re[:,:shape[1]]
-                im = im[:,:shape[1]]
-            if shape[0] > ydim:
-                apad = da.zeros((shape[0] - ydim, shape[1]), dtype=np.int16)
-                re = da.concatenate([re, apad], axis=0)
-                im = da.concatenate([im, apad], axis=0)
-            elif shape[0] < ydim:
-                re = re[:shape[0]]
-                im = im[:shape[0]]
-
-        coords = {'y': np.arange(ydim if shape is None else shape[0]) + 0.5, 'x': np.arange(xdim if shape is None else shape[1]) + 0.5}
-
-        #coords = {'y': np.arange(ydim) + 0.5, 'x': np.arange(xdim) + 0.5}
-        # perform aligning on-the-fly using coordinates
-        #coords = {'y': np.arange(ydim) + ashift + 0.5, 'x': np.arange(xdim) + rshift + 0.5}
+        re = self._SLC_blocks(read_part('re'), np.int16, shape, chunksize)
+        im = self._SLC_blocks(read_part('im'), np.int16, shape, chunksize)
+
+        coords = {'y': np.arange(re.shape[0]) + 0.5, 'x': np.arange(re.shape[1]) + 0.5}
         re = xr.DataArray(re, coords=coords).rename('re')
         im = xr.DataArray(im, coords=coords).rename('im')
-        #if intensity:
-        #    return ((scale or 1)*re.astype(np.float32))**2 + ((scale or 1)*im.astype(np.float32))**2
         if scale is not None:
             return scale * (xr.merge([re, im]).astype(np.float32))
         return xr.merge([re, im])
@@ -923,9 +994,13 @@ class PRM(datagrid, PRM_gmtsar):
         - 'time' (datetime): Combined datetime.
         """
         import pandas as pd
+        import os
         from datetime import datetime, timedelta
     
         led_file = self.get('led_file')
+        # LED file path is relative to the PRM file directory
+        if self.filename is not None:
+            led_file = os.path.join(os.path.dirname(self.filename), led_file)
         with open(led_file, 'r') as file:
             first_line = file.readline()
         columns = ['nd', 'iy', 'id', 'isec', 'idsec']
@@ -959,50 +1034,157 @@ class PRM(datagrid, PRM_gmtsar):
         re = 1 / np.sqrt(arg)
         return r - re, re
 
-    # baseline can be scalar or vector
+    def get_orbit(self, times, orbit=None):
+        """
+        Interpolate the satellite positions from the LED file state vectors like to GMTSAR hermite_c().
+
+        Parameters
+        ----------
+        times : float or array_like
+            The times in seconds from the year start as the LED file 'clock' column.
+        orbit : pandas.DataFrame, optional
+            The orbit returned by read_LED() method to reuse. Default is None to read the LED file.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (N, 3) array of the satellite X, Y, Z coordinates.
+        """
+        import numpy as np
+
+        if orbit is None:
+            orbit = self.read_LED()
+        clock = orbit['clock'].values
+        pos = orbit[['px', 'py', 'pz']].values
+        vel = orbit[['vx', 'vy', 'vz']].values
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+
+        # 6 state vectors around the interpolation time
+        nval = 6
+        i0 = np.clip(np.searchsorted(clock, times) - nval // 2, 0, clock.size - nval)
+        idx = i0[:,None] + np.arange(nval)
+        tc = clock[idx]
+        # Lagrange and Hermite basis functions for all the points at once
+        diag = np.eye(nval, dtype=bool)
+        dc = np.where(diag, 1.0, tc[:,:,None] - tc[:,None,:])
+        hj = np.prod(np.where(diag, 1.0, (times[:,None,None] - tc[:,None,:]) / dc), axis=2)
+        sj = np.sum(np.where(diag, 0.0, 1.0 / dc), axis=2)
+        dt = times[:,None] - tc
+        f0 = (1.0 - 2.0 * dt * sj) * hj**2
+        f1 = dt * hj**2
+        return np.einsum('nk,nkd->nd', f0, pos[idx]) + np.einsum('nk,nkd->nd', f1, vel[idx])
+
+    # baseline can be a vector or (N, 3) array, other can be PRM or list of PRMs for the same count of baselines
     def get_baseline_projections(self, other, baseline, alpha):
         import scipy
         import numpy as np
-    
+
+        others = other if isinstance(other, (list, tuple)) else [other]
+        near_range = np.asarray([prm.get('near_range') for prm in others]).reshape(np.shape(alpha))
+        num_rng_bins = np.asarray([prm.get('num_rng_bins') for prm in others]).reshape(np.shape(alpha))
+
         dr = 0.5 * scipy.constants.speed_of_light / self.get('rng_samp_rate')
         ra = self.get('earth_radius')
         rc = ra + self.get('SC_height')
     
-        far_range = other.get('near_range') + dr * other.get('num_rng_bins')
+        far_range = near_range + dr * num_rng_bins
         # calculate the look angle 1/2 way between the near and far range
-        arg1 = (other.get('near_range')**2 + rc**2 - ra**2) / (2 * other.get('near_range') * rc)
+        arg1 = (near_range**2 + rc**2 - ra**2) / (2 * near_range * rc)
         arg2 = (far_range**2 + rc**2 - ra**2) / (2 * far_range * rc)
         rlook = np.arccos((arg1 + arg2) / 2.0)
         # add the incidence angle correction to get the incidence angle
-        arg1 = (-other.get('near_range')**2 + rc**2 + ra**2) / (2 * ra * rc)
+        arg1 = (-near_range**2 + rc**2 + ra**2) / (2 * ra * rc)
         arg2 = (-far_range**2 + rc**2 + ra**2) / (2 * ra * rc)
         rlook = rlook + np.arccos((arg1 + arg2) / 2.0)
     
-        bpara = np.linalg.norm(baseline) * np.sin(rlook - np.radians(alpha))
-        bperp = np.linalg.norm(baseline) * np.cos(rlook - np.radians(alpha))
+        bpara = np.linalg.norm(baseline, axis=-1) * np.sin(rlook - np.radians(alpha))
+        bperp = np.linalg.norm(baseline, axis=-1) * np.cos(rlook - np.radians(alpha))
         return bpara, bperp
 
+    # baseline, ref_pos and rep_pos can be vectors or (N, 3) arrays
     def get_components(self, baseline, ref_pos, rep_pos):
         import numpy as np
     
-        x11, y11, _ = ref_pos
-        x21, y21, _ = rep_pos
-        rlnref = np.arctan2(y11, x11)
-        rlnrep = np.arctan2(y21, x21)
+        rlnref = np.arctan2(ref_pos[...,1], ref_pos[...,0])
+        rlnrep = np.arctan2(rep_pos[...,1], rep_pos[...,0])
         sign = 1
         if self.get('orbdir') == 'D':
             sign *= -1
         if self.get('lookdir') == 'L':
             sign *= -1
-        if rlnrep < rlnref:
-            sign *= -1
+        sign = np.where(rlnrep < rlnref, -sign, sign)
     
         #xu, yu, zu = ref_pos/np.linalg.norm(ref_pos)
         #bv = baseline[0] * xu + baseline[1] * yu + baseline[2] * zu
-        bv = np.dot(baseline, ref_pos) / np.linalg.norm(ref_pos)
-        bh = sign * np.sqrt(np.dot(baseline, baseline) - bv ** 2)
+        bv = np.sum(baseline * ref_pos, axis=-1) / np.linalg.norm(ref_pos, axis=-1)
+        # the rounding errors can produce small negative values for zero baseline
+        bh = sign * np.sqrt(np.maximum(np.sum(baseline * baseline, axis=-1) - bv ** 2, 0))
         return bv, bh
 
+    def get_baselines(self, others, debug=False):
+        """
+        Compute the parallel and perpendicular baselines for the repeat scenes in-process.
+
+        This is the replacement for GMTSAR SAT_baseline tool B_parallel and B_perpendicular outputs.
+        The orbits are interpolated from the LED files by get_orbit() method, the closest approach
+        of the repeat orbit to the reference scene start position is found on the half-line time grid
+        and refined by the quadratic fit of the squared distance like to GMTSAR.
+
+        Parameters
+        ----------
+        others : PRM or list of PRM
+            The repeat scene PRM objects with the LED files defined.
+        debug : bool, optional
+            If True, debug information will be printed. Default is False.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (N, 2) or (2,) array of B_parallel and B_perpendicular values in meters.
+
+        Examples
+        --------
+        >>> prm_ref.get_baselines([prm_rep1, prm_rep2])
+        """
+        import numpy as np
+
+        prms = others if isinstance(others, (list, tuple)) else [others]
+        orbit_ref = self.read_LED()
+        # reference scene start position
+        pos_ref = self.get_orbit(self.get_seconds()[0], orbit_ref)[0]
+
+        # closest approach search for every repeat orbit
+        ns2 = int(self.get('nrows') * 0.5)
+        ntt = 100
+        ddt = 0.01 / ntt
+        tts = (np.arange(ntt) - ntt / 2 + 0.5) * ddt
+        pos_rep = np.empty((len(prms), 3))
+        for idx, prm in enumerate(prms):
+            orbit = prm.read_LED()
+            times = prm.get_seconds()[0] + 0.5 / self.get('PRF') * np.arange(-ns2, ns2)
+            dists = np.linalg.norm(prm.get_orbit(times, orbit) - pos_ref, axis=1)
+            ts = times[np.argmin(dists)]
+            # polynomial refinement of the closest approach time
+            dists = np.sum((prm.get_orbit(ts + tts, orbit) - pos_ref)**2, axis=1)
+            p = np.polyfit(tts, dists, 2)
+            ts = ts - p[1] / (2.0 * p[0])
+            pos_rep[idx] = prm.get_orbit(ts, orbit)[0]
+            if debug:
+                print ('DEBUG: get_baselines', prm.get('led_file'), 'closest approach time', ts)
+
+        # baseline components and the projections for all the scenes at once
+        baseline = pos_rep - pos_ref
+        bv, bh = self.get_components(baseline, pos_ref, pos_rep)
+        alpha = np.degrees(np.arctan2(bv, bh))
+        prm_ref = self
+        if not {'SC_height', 'earth_radius'} <= self.params.keys():
+            # use the scene center spacecraft height when calc_dop_orb() is not applied
+            height, re = self.get_height(*self.get_orbit(np.mean(self.get_seconds()), orbit_ref)[0])
+            prm_ref = PRM(dict(self.params)).set(SC_height=height, earth_radius=re)
+        bpara, bperp = prm_ref.get_baseline_projections(prms, baseline, alpha)
+        out = np.column_stack([bpara, bperp])
+        return out[0] if not isinstance(others, (list, tuple)) else out
+
 #     @staticmethod
 #     def goldstein_filter(data, corr, psize):
 #         import xarray as xr
@@ -7,6 +7,10 @@
 # 
 # Licensed under the BSD 3-Clause License (see LICENSE for details)
 # ----------------------------------------------------------------------------
+# required for function decorators
+from numba import jit, prange
+# import directive is not compatible to numba
+import numpy as np
 
 class PRM_gmtsar:
 
@@ -104,7 +108,7 @@ class PRM_gmtsar:
         prm = PRM.from_str(stdout_data)
         # replacement for SAT_baseline $1 $2 | tail -n9
         if tail is not None:
-            prm.df = prm.df.tail(tail)
+            prm.params = dict(list(prm.params.items())[-tail:])
         return prm
 
     """
@@ -117,7 +121,7 @@ class PRM_gmtsar:
     coords = prm.SAT_llt2rat(dem_data[:10], precise=1)
     [format(v, '.6f') for v in coords]
     """
-    def SAT_llt2rat(self, coords=None, fromfile=None, tofile=None, precise=1, binary=False, debug=False):
+    def SAT_llt2rat(self, coords=None, fromfile=None, tofile=None, precise=1, binary=False, engine=None, debug=False):
         """
         Convert latitude, longitude, and elevation (LLT) coordinates to radar (RAT) coordinates.
 
@@ -135,6 +139,9 @@ class PRM_gmtsar:
             The precision level of the conversion. Set to 0 for standard back geocoding or 1 for polynomial refinement (slower). Default is 1.
         binary : bool, optional
             If True, the output coordinates will be saved in binary format. Default is False.
+        engine : str, optional
+            The computation engine: 'numba' for the in-process orbit interpolation and range-Doppler solver
+            or 'gmtsar' for the GMTSAR SAT_llt2rat command line tool. Default is None to use llt2rat_engine attribute.
         debug : bool, optional
             If True, debug information will be printed. Default is False.
 
@@ -142,7 +149,7 @@ class PRM_gmtsar:
         -------
         numpy.ndarray or None
             If 'tofile' is None, returns a numpy array of the converted RAT coordinates with shape (N, 5), where N is the number of coordinates.
-            Each coordinate is in the format [longitude, latitude, elevation, range, azimuth]. If 'tofile' is provided, returns None.
+            Each coordinate is in the format [range, azimuth, elevation, longitude, latitude]. If 'tofile' is provided, returns None.
 
         Notes
         -----
@@ -154,6 +161,14 @@ class PRM_gmtsar:
         import os
         import subprocess
 
+        if engine is None:
+            engine = self.llt2rat_engine
+        if engine == 'numba':
+            return self.SAT_llt2rat_numba(coords=coords, fromfile=fromfile, tofile=tofile,
+                                          precise=precise, binary=binary, debug=debug)
+        elif engine != 'gmtsar':
+            raise ValueError(f"ERROR: unknown engine '{engine}'. Use 'numba' or 'gmtsar'.")
+
         if coords is not None and fromfile is None:
             #lon, lat, elevation = coords
             #data=f'{lon} {lat} {elevation}'
@@ -206,6 +221,237 @@ class PRM_gmtsar:
                 out = np.fromstring(stdout_data, dtype=float, sep=' ')
             return out if out.size==5 else out.reshape(-1,5)
 
+    @staticmethod
+    @jit(nopython=True, nogil=True, parallel=True, cache=True)
+    def SAT_llt2rat_kernel(coords, clock, px, py, pz, vx, vy, vz, ra, rc, earth_radius,
+                           t1, ts, nrec, npad, prf, near_range, dr, rshift, ashift, chirp_ext,
+                           fd1, vel, wavelength, precise):
+        # import directive is not compatible to numba
+        #import numpy as np
+
+        # GMTSAR hermite_c() orbit interpolator uses 6 state vectors
+        nval = 6
+        nmax = clock.size
+        # squared eccentricity for the reference ellipsoid
+        e2 = (ra**2 - rc**2) / ra**2
+        # golden section search constants
+        gr = 0.61803399
+        gc = 1.0 - gr
+        # zero-Doppler time tolerance for the precise solution, seconds
+        tol = 1e-6 / prf
+        # time step to differentiate the interpolated orbit, seconds
+        dt = 1e-2
+
+        def orbit(t):
+            # look for the state vector immediately preceding the interpolation time
+            i0 = np.searchsorted(clock, t) - nval // 2
+            if i0 < 0:
+                i0 = 0
+            if i0 + nval > nmax:
+                i0 = nmax - nval
+            x = y = z = 0.0
+            for i in range(i0, i0 + nval):
+                sj = 0.0
+                hj = 1.0
+                for j in range(i0, i0 + nval):
+                    if j != i:
+                        hj *= (t - clock[j]) / (clock[i] - clock[j])
+                        sj += 1.0 / (clock[i] - clock[j])
+                f0 = (1.0 - 2.0 * (t - clock[i]) * sj) * hj * hj
+                f1 = (t - clock[i]) * hj * hj
+                x += px[i] * f0 + vx[i] * f1
+                y += py[i] * f0 + vy[i] * f1
+                z += pz[i] * f0 + vz[i] * f1
+            return x, y, z
+
+        def distance(t, xt, yt, zt):
+            xs, ys, zs = orbit(t)
+            return np.sqrt((xs - xt)**2 + (ys - yt)**2 + (zs - zt)**2)
+
+        def doppler(t, xt, yt, zt):
+            # projection of the satellite-target vector on the satellite velocity
+            xs, ys, zs = orbit(t)
+            xp, yp, zp = orbit(t + dt)
+            xm, ym, zm = orbit(t - dt)
+            return (xs - xt) * (xp - xm) + (ys - yt) * (yp - ym) + (zs - zt) * (zp - zm)
+
+        out = np.full((coords.shape[0], 5), np.nan)
+        for idx in prange(coords.shape[0]):
+            lon = coords[idx, 0]
+            lat = coords[idx, 1]
+            ele = coords[idx, 2]
+            if np.isnan(lon) or np.isnan(lat) or np.isnan(ele):
+                continue
+            # geodetic to geocentric coordinates (GMTSAR plh2xyz)
+            rlat = np.radians(lat)
+            rlon = np.radians(lon)
+            rn = ra / np.sqrt(1.0 - e2 * np.sin(rlat)**2)
+            xt = (rn + ele) * np.cos(rlat) * np.cos(rlon)
+            yt = (rn + ele) * np.cos(rlat) * np.sin(rlon)
+            zt = ((1.0 - e2) * rn + ele) * np.sin(rlat)
+
+            # minimum range on the orbit sampled every ts seconds with npad samples buffer like to GMTSAR
+            # the integer golden section search produces the same orbit sample as GMTSAR
+            t0 = t1 - ts * npad
+            x0 = 0
+            x3 = nrec + 2 * npad - 1
+            xb = (x3 + 1) // 2
+            if x3 - xb > xb - x0:
+                x1 = xb
+                x2 = int(xb + gc * (x3 - xb))
+            else:
+                x2 = xb
+                x1 = int(xb - gc * (xb - x0))
+            f1 = distance(t0 + ts * x1, xt, yt, zt)
+            f2 = distance(t0 + ts * x2, xt, yt, zt)
+            # the bracket shrinks by the golden ratio, the iterations limit is a safeguard only
+            for _ in range(256):
+                if x3 - x0 <= 4:
+                    break
+                if f2 < f1:
+                    x0 = x1
+                    x1 = x2
+                    x2 = int(gr * x1 + gc * x3)
+                    f1 = f2
+                    f2 = distance(t0 + ts * x2, xt, yt, zt)
+                else:
+                    x3 = x2
+                    x2 = x1
+                    x1 = int(gr * x2 + gc * x0)
+                    f2 = f1
+                    f1 = distance(t0 + ts * x1, xt, yt, zt)
+            if f1 < f2:
+                tm = t0 + ts * x1
+                rng = f1
+            else:
+                tm = t0 + ts * x2
+                rng = f2
+
+            if precise:
+                # refine the zero-Doppler time using the secant method started from the orbit sample
+                ta = tm
+                tb = tm + ts
+                fa = doppler(ta, xt, yt, zt)
+                fb = doppler(tb, xt, yt, zt)
+                for _ in range(64):
+                    if fb == fa:
+                        break
+                    tc = tb - fb * (tb - ta) / (fb - fa)
+                    ta, fa = tb, fb
+                    tb = tc
+                    if tb < clock[0] or tb > clock[nmax - 1]:
+                        break
+                    if abs(tb - ta) < tol:
+                        # use the refined solution only when it is converged
+                        tm = tb
+                        rng = distance(tm, xt, yt, zt)
+                        break
+                    fb = doppler(tb, xt, yt, zt)
+
+            # interpolation point outside of data constraints
+            if tm < clock[0] or tm > clock[nmax - 1]:
+                continue
+
+            # range and azimuth in pixel space
+            rpix = (rng - near_range) / dr - rshift + chirp_ext
+            apix = prf * (tm - t1) - ashift
+            # correct for the Doppler centroid like to GMTSAR when it is not zero
+            if fd1 != 0:
+                rdd = vel**2 / rng
+                daa = -0.5 * wavelength * fd1 / rdd
+                rpix += 0.5 * rdd * daa**2 / dr
+                apix += prf * daa
+            out[idx, 0] = rpix
+            out[idx, 1] = apix
+            # elevation relative to the PRM earth radius
+            out[idx, 2] = np.sqrt(xt**2 + yt**2 + zt**2) - earth_radius
+            out[idx, 3] = lon
+            out[idx, 4] = lat
+        return out
+
+    def SAT_llt2rat_numba(self, coords=None, fromfile=None, tofile=None, precise=1, binary=False, debug=False):
+        """
+        Convert latitude, longitude, and elevation (LLT) coordinates to radar (RAT) coordinates in-process.
+
+        This is the numba-compiled replacement for GMTSAR SAT_llt2rat command line tool. The orbit is interpolated
+        from the LED state vectors by Hermite polynomials and the minimum range orbit sample is found by
+        the same golden section search as GMTSAR uses, without text conversion and external process spawning.
+        The precise solution refines the zero-Doppler time between the orbit samples.
+
+        Parameters
+        ----------
+        coords : array_like or None, optional
+            The LLT coordinates to convert as [longitude, latitude, elevation] for a single point or (N, 3) array.
+        fromfile : str or None, optional
+            The file path to read the LLT coordinates from as space-separated "longitude latitude elevation" records.
+        tofile : str or None, optional
+            The file path to save the converted RAT coordinates to. Default is None.
+        precise : int, optional
+            The precision level of the conversion: 0 for standard back geocoding or 1 for precise solution. Default is 1.
+        binary : bool, optional
+            If True, the output coordinates will be saved in binary float64 format. Default is False.
+        debug : bool, optional
+            If True, debug information will be printed. Default is False.
+
+        Returns
+        -------
+        numpy.ndarray or None
+            The same as SAT_llt2rat() returns: (N, 5) or (5,) array in the format [range, azimuth, elevation, longitude, latitude].
+            The points outside of the orbit time range are NaN-filled.
+
+        Examples
+        --------
+        >>> prm.SAT_llt2rat_numba([-115.588333, 32.758333, -42.441303], precise=1)
+        """
+        from scipy import constants
+
+        if coords is not None and fromfile is None:
+            coords = np.asarray(coords, dtype=np.float64)
+        elif coords is None and fromfile is not None:
+            coords = np.loadtxt(fromfile, dtype=np.float64, ndmin=2)
+        else:
+            raise Exception('Should be defined data source as coordinates triplet (coords) or as file (fromfile)')
+        coords = coords.reshape(-1, 3)
+
+        orbit = self.read_LED()
+        # use relative time for better numerical conditioning
+        clock0 = orbit['clock'].values[0]
+        clock = orbit['clock'].values - clock0
+
+        prf, nrows, num_valid_az, num_patches = self.get('PRF', 'nrows', 'num_valid_az', 'num_patches')
+        t1 = 86400 * self.get('clock_start') + (nrows - num_valid_az) / (2 * prf)
+        t2 = t1 + num_patches * num_valid_az / prf
+        # sample the orbit every 2nd line and add the buffer before and after the scene like to GMTSAR,
+        # the samples count is computed for the absolute time to produce the same orbit samples
+        ts = 2.0 / prf
+        nrec = int((t2 - t1) / ts)
+        npad = 8000
+        t1 -= clock0
+        dr = 0.5 * constants.speed_of_light / self.get('rng_samp_rate')
+        if debug:
+            print ('DEBUG: SAT_llt2rat_numba', 'points', len(coords), 'state vectors', len(clock))
+
+        out = self.SAT_llt2rat_kernel(coords,
+                                      clock, *[orbit[col].values.astype(np.float64) for col in ['px', 'py', 'pz', 'vx', 'vy', 'vz']],
+                                      self.get('equatorial_radius'), self.get('polar_radius'), self.get('earth_radius'),
+                                      t1, ts, nrec, npad, prf, self.get('near_range'), dr,
+                                      self.get('rshift') + self.get('sub_int_r'),
+                                      self.get('ashift') + self.get('sub_int_a'),
+                                      self.get('chirp_ext'),
+                                      self.get('fd1'), self.get('SC_vel'), self.get('radar_wavelength'), int(precise))
+
+        invalid = np.count_nonzero(np.isnan(out[:,0]) & np.all(np.isfinite(coords), axis=1))
+        if invalid:
+            print (f'NOTE: SAT_llt2rat {invalid} points are outside of the orbit time range and NaN-filled')
+
+        if tofile is not None:
+            if binary:
+                out.tofile(tofile)
+            else:
+                np.savetxt(tofile, out, delimiter=' ', fmt='%.6f')
+            return
+        return out[0] if out.size==5 else out
+
     def SAT_look(self, coords=None, fromfile=None, tofile=None, binary=False, debug=False):
         """
         Compute the satellite look vector.
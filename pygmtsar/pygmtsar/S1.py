@@ -26,6 +26,8 @@ class S1(tqdm_joblib):
     # less strict rule allows to find the required orbits
     orbit_offset_start = timedelta(seconds=3600)
     orbit_offset_end = timedelta(seconds=300)
+    # persistent annotation index for scan_slc()
+    scan_index_filename = '.scan_index.sqlite'
 
     """
     find . -type f -name '*.tiff' -exec basename {} .tiff \; \
@@ -175,7 +177,8 @@ class S1(tqdm_joblib):
         return orbits['orbit']
 
     @staticmethod
-    def scan_slc(datadir, orbit=None, mission=None, subswath=None, polarization=None, calibration=False):
+    def scan_slc(datadir, orbit=None, mission=None, subswath=None, polarization=None, calibration=False,
+                 index='auto', n_jobs=-1):
         """
         Scans the specified directory for Sentinel-1 SLC (Single Look Complex) data and filters it based on the provided parameters.
     
@@ -191,6 +194,11 @@ class S1(tqdm_joblib):
             Filter for subswath number. Use a single or sequential numbers 1, 2, 3, 12, 23, 123, or None for no filter. Default is None.
         polarization : str, optional
             Filter for polarization. Use 'VV', 'VH', 'HH', 'HV', or None for no filter. Default is None.
+        index : str, optional
+            The SQLite scan index file to keep the parsed annotations between the calls. Use 'auto' for the index
+            file in the data directory and None to parse all the annotations. Default is 'auto'.
+        n_jobs : int, optional
+            The number of parallel jobs to parse the new or changed annotations. Default is -1.
     
         Returns
         -------
@@ -355,12 +363,14 @@ class S1(tqdm_joblib):
         #print ('geolocs', geolocs)
         #df = gpd.GeoDataFrame(df, geometry=geolocs)
 
-        bursts = [S1.geoloc2bursts(path) for path in metapaths]
-        df = gpd.GeoDataFrame(df, geometry=bursts)
+        # read bursts and orbit directions, parse only new or changed annotations
+        if isinstance(index, str) and index == 'auto':
+            index = os.path.join(datadir, S1.scan_index_filename)
+        scans = S1.scan_annotations(metapaths, index=index, n_jobs=n_jobs)
+        df = gpd.GeoDataFrame(df, geometry=[scan['geometry'] for scan in scans])
 
         # define orbit directions
-        orbits = [S1.read_annotation(path)['product']['generalAnnotation']['productInformation']['pass'][:1] for path in metapaths]
-        df['orbit'] = orbits
+        df['orbit'] = [scan['orbit'] for scan in scans]
         # filter orbits
         if orbit is not None:
             df = df[df.orbit == orbit]
@@ -392,12 +402,95 @@ class S1(tqdm_joblib):
         return df
 
     @staticmethod
-    def geoloc2bursts(metapath):
+    def scan_annotation(metapath):
+        """
+        Parse the XML scene annotation once to define the approximate bursts locations and the orbit direction.
+
+        Parameters
+        ----------
+        metapath : str
+            The filename of the XML scene annotation.
+
+        Returns
+        -------
+        dict
+            The bursts MultiPolygon as 'geometry' and the orbit direction ('A' or 'D') as 'orbit'.
+        """
+        annotation = S1.read_annotation(metapath)
+        orbit = annotation['product']['generalAnnotation']['productInformation']['pass'][:1]
+        return {'geometry': S1.geoloc2bursts(metapath, annotation), 'orbit': orbit}
+
+    @staticmethod
+    def scan_annotations(metapaths, index=None, n_jobs=-1):
+        """
+        Parse the XML scene annotations using the on-disk scan index.
+
+        The index is a SQLite database keyed by the annotation file path, size, and modification time.
+        Only the new or changed annotations are parsed, in parallel, and stored into the index.
+
+        Parameters
+        ----------
+        metapaths : list
+            The filenames of the XML scene annotations.
+        index : str, optional
+            The SQLite scan index filename. Use None to parse all the annotations. Default is None.
+        n_jobs : int, optional
+            The number of parallel jobs. Default is -1.
+
+        Returns
+        -------
+        list
+            The parsed annotations as returned by scan_annotation() in the same order.
+        """
+        import os
+        import sqlite3
+        import joblib
+        import shapely
+        from tqdm.auto import tqdm
+
+        keys = []
+        for path in metapaths:
+            stat = os.stat(path)
+            keys.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+
+        cached = {}
+        if index is not None:
+            try:
+                with sqlite3.connect(index) as con:
+                    con.execute('CREATE TABLE IF NOT EXISTS annotations '
+                                '(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, orbit TEXT, geometry BLOB)')
+                    for (path, size, mtime, orbit, geometry) in con.execute('SELECT * FROM annotations'):
+                        cached[(path, size, mtime)] = {'geometry': shapely.from_wkb(geometry), 'orbit': orbit}
+            except sqlite3.Error as e:
+                print (f'NOTE: scan index {index} is not available, all the annotations are parsed: {e}')
+                index = None
+
+        missed = [key for key in keys if key not in cached]
+        if len(missed):
+            with S1.tqdm_joblib(tqdm(desc='Parsing Sentinel-1 Annotations', total=len(missed))) as progress_bar:
+                scans = joblib.Parallel(n_jobs=n_jobs)(joblib.delayed(S1.scan_annotation)(key[0]) for key in missed)
+            cached.update(zip(missed, scans))
+
+            if index is not None:
+                try:
+                    with sqlite3.connect(index) as con:
+                        con.executemany('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?)',
+                                        [(*key, scan['orbit'], shapely.to_wkb(scan['geometry'])) \
+                                         for (key, scan) in zip(missed, scans)])
+                except sqlite3.Error as e:
+                    print (f'NOTE: scan index {index} is not updated: {e}')
+
+        return [cached[key] for key in keys]
+
+    @staticmethod
+    def geoloc2bursts(metapath, annotation=None):
         """
         Read approximate bursts locations
         """
         from shapely.geometry import LineString, Polygon, MultiPolygon
-        df = S1.get_geoloc(S1.read_annotation(metapath))
+        if annotation is None:
+            annotation = S1.read_annotation(metapath)
+        df = S1.get_geoloc(annotation)
         # this code line works for a single scene
         #lines = df.groupby('line')['geometry'].apply(lambda x: LineString(x.tolist()))
         # more complex code is required for stitched scenes processing with repeating 'line' series
@@ -196,8 +196,8 @@ class Stack_align(Stack_dem):
         prm1 = tmp_prm.calc_dop_orb(earth_radius, inplace=True, debug=debug)
         prm2 = PRM.from_file(rep_prm).calc_dop_orb(earth_radius, inplace=True, debug=debug).update()
         lontie,lattie = prm1.SAT_baseline(prm2, debug=debug).get('lon_tie_point', 'lat_tie_point')
-        tmp_am = prm1.SAT_llt2rat(coords=[lontie, lattie, 0], precise=1, debug=debug)[1]
-        tmp_as = prm2.SAT_llt2rat(coords=[lontie, lattie, 0], precise=1, debug=debug)[1]
+        tmp_am = prm1.SAT_llt2rat(coords=[lontie, lattie, 0], precise=1, engine=self.llt2rat_engine, debug=debug)[1]
+        tmp_as = prm2.SAT_llt2rat(coords=[lontie, lattie, 0], precise=1, engine=self.llt2rat_engine, debug=debug)[1]
         # bursts look equal to rounded result int(np.round(...))
         tmp_da = int(tmp_as - tmp_am)
         #print ('tmp_am', tmp_am, 'tmp_as', tmp_as, 'tmp_da', tmp_da)
@@ -211,9 +211,9 @@ class Stack_align(Stack_dem):
 
         # tmp.PRM defined above from {reference}.PRM
         prm1 = tmp_prm.calc_dop_orb(earth_radius, inplace=True, debug=debug)
-        tmpm_dat = prm1.SAT_llt2rat(coords=topo_llt, precise=1, debug=debug)
+        tmpm_dat = prm1.SAT_llt2rat(coords=topo_llt, precise=1, engine=self.llt2rat_engine, debug=debug)
         prm2 = PRM.from_file(rep_prm).calc_dop_orb(earth_radius, inplace=True, debug=debug)
-        tmp1_dat = prm2.SAT_llt2rat(coords=topo_llt, precise=1, debug=debug)
+        tmp1_dat = prm2.SAT_llt2rat(coords=topo_llt, precise=1, engine=self.llt2rat_engine, debug=debug)
 
         # get r, dr, a, da, SNR table to be used by fitoffset.csh
         offset_dat0 = np.hstack([tmpm_dat, tmp1_dat])
@@ -297,6 +297,8 @@ class Stack_align(Stack_dem):
         This function processes Sentinel-1 data by first generating PRM and LED files if they don't exist,
         then calculating doppler and orbital parameters for each image, and finally computing the baseline
         components. The routine is suited to be used before alignment to detect the best reference scene.
+        The baselines are computed in-process by PRM.get_baselines() or by GMTSAR SAT_baseline tool
+        for baseline_engine='gmtsar'.
 
         """
         import pandas as pd
@@ -325,13 +327,22 @@ class Stack_align(Stack_dem):
         with self.tqdm_joblib(tqdm(desc='PRM generation', total=len(dates))) as progress_bar:
             joblib.Parallel(n_jobs=n_jobs)(joblib.delayed(ondemand)(date, dt) for (date, dt) in dates.items())
 
+        if self.baseline_engine == 'numpy':
+            # all the baselines computed in-process from the LED orbits
+            prm_ref = PRM().from_file(get_filename(self.reference))
+            prms_rep = [PRM().from_file(get_filename(date)) for date in dates]
+            BPL, BPR = prm_ref.get_baselines(prms_rep, debug=debug).T
+            return pd.DataFrame({'date': list(dates), 'parallel': BPL.round(1), 'perpendicular': BPR.round(1)})\
+                .set_index('date')
+
         # calc_dop_orb() required for SAT_baseline
         prm_ref = PRM().from_file(get_filename(self.reference)).calc_dop_orb(inplace=True)
-        data = []
-        for date in dates:
+        def baseline(date):
             prm_rep = PRM().from_file(get_filename(date))
             BPL, BPR = prm_ref.SAT_baseline(prm_rep).get('B_parallel', 'B_perpendicular')
-            data.append({'date':date, 'parallel':BPL.round(1), 'perpendicular':BPR.round(1)})
+            return {'date':date, 'parallel':BPL.round(1), 'perpendicular':BPR.round(1)}
+        # threads are enough to run SAT_baseline processes in parallel
+        data = joblib.Parallel(n_jobs=n_jobs, backend='threading')(joblib.delayed(baseline)(date) for date in dates)
         return pd.DataFrame(data).set_index('date')
 
     # 'threading' for Docker and 'loky' by default
@@ -400,4 +411,6 @@ class Stack_align(Stack_dem):
                                            })
         # update the main object for the merged subswaths
         self.df = gpd.GeoDataFrame(df)
+        # the PRM files are rewritten
+        self.prm_cache_clear()
         
\ No newline at end of file
@@ -251,11 +251,12 @@ class Stack_dem(Stack_reframe):
         geoid = self.get_geoid(ortho)
         if os.path.exists(dem_filename):
             os.remove(dem_filename)
-        encoding = {'dem': self._compression(ortho.shape)}
+        encoding = {'dem': self._compression(ortho.shape, profile='dem')}
         # (ortho + geoid).rename('dem')\
         #     .to_netcdf(dem_filename, encoding=encoding, engine=self.netcdf_engine)
 
-        delayed = (ortho + geoid).rename('dem')\
+        # apply the lossy quantization when it is defined by the storage profile
+        delayed = self.netcdf_quantize((ortho + geoid).rename('dem'), 'dem')\
             .to_netcdf(dem_filename, encoding=encoding, engine=self.netcdf_engine, compute=False)
         tqdm_dask(result := dask.persist(delayed), desc='Save DEM on WGS84 Ellipsoid')
 
@@ -100,7 +100,7 @@ class Stack_geocode(Stack_sbas):
                 z = z_offset
             coords_ll = np.column_stack([coords[:,0], coords[:,1], ele.values + z])
             #print ('coords_ll', coords_ll)
-            coords_ra = prm.SAT_llt2rat(coords_ll).reshape(-1, 5)
+            coords_ra = prm.SAT_llt2rat(coords_ll, engine=self.llt2rat_engine).reshape(-1, 5)
             #print ('coords_ra1', coords_ra)
             #coords_ra = coords_ra[:,:2] if len(coords_ll)>1 else [coords_ra[:2]]
             coords_ra = coords_ra[:,:2]
@@ -149,7 +149,97 @@ class Stack_geocode(Stack_sbas):
     ##########################################################################################
     # ra2ll
     ##########################################################################################
-    def ra2ll(self, data, autoscale=True):
+    def get_ra2ll_index_name(self, data, autoscale=True):
+        """
+        Get the name of the radar to geographic index table for the radar coordinates grid and decimation.
+
+        The name depends on the grid coordinates, autoscale option and the transform file modification time,
+        so the index table is rebuilt after the transform recalculation.
+        """
+        import hashlib
+        import os
+
+        ys = data.y.values
+        xs = data.x.values
+        signature = (ys[0], ys[1] - ys[0], ys.size, xs[0], xs[1] - xs[0], xs.size, bool(autoscale),
+                     os.path.getmtime(self.get_filename('trans')))
+        return 'ra2ll_' + hashlib.md5(repr(signature).encode('utf8')).hexdigest()[:8]
+
+    def compute_ra2ll_index(self, data, autoscale=True):
+        """
+        Build and save the radar to geographic index table for the radar coordinates grid.
+
+        For every output geographic pixel the table holds flat index (y index * x size + x index) of the nearest
+        radar grid pixel, or -1 for the pixels outside of the radar grid. The table is defined by the grid
+        coordinates and decimation only, so it is computed once and reused for all the grids and stacks.
+
+        Parameters
+        ----------
+        data : xarray.DataArray
+            2D or 3D grid in radar coordinates, only the coordinates are used.
+        autoscale : bool, optional
+            Decimate the transform to the grid spacing. Default is True.
+
+        Returns
+        -------
+        xarray.DataArray
+            The index table in geographic coordinates.
+
+        Examples
+        --------
+        stack.compute_ra2ll_index(unwrap)
+        """
+        import xarray as xr
+        import numpy as np
+
+        trans = self.get_trans()
+
+        # analyse grid and transform matrix spacing
+        ys = data.y.values
+        xs = data.x.values
+        grid_dy = ys[1] - ys[0]
+        grid_dx = xs[1] - xs[0]
+        trans_dy = np.diff(trans.y)[0]
+        trans_dx = np.diff(trans.x)[0]
+
+        # define transform spacing in radar coordinates
+        step_y = int(np.round(grid_dy / trans_dy))
+        step_x = int(np.round(grid_dx / trans_dx))
+        assert step_y>=1 and step_x>=1, f'Transforming grid spacing (grid_dy, grid_dx) is smaller \
+                                          than transform matrix spacing (trans_dy, trans_dx), \
+                                          call Stack.geocode() with less coarsing'
+        # decimate the full trans grid to the required spacing
+        if autoscale and (step_y>1 or step_x>1):
+            # define the equally spacing geographic coordinates grid
+            trans = trans.sel(lat=trans.lat[step_y//2::step_y], lon=trans.lon[step_x//2::step_x])
+
+        # nearest grid pixel indices, the ties are resolved to the lower index like to scipy RegularGridInterpolator
+        iy = np.ceil((trans.azi - ys[0]) / grid_dy - 0.5)
+        ix = np.ceil((trans.rng - xs[0]) / grid_dx - 0.5)
+        # the points outside of the grid extent are invalid
+        valid = (trans.azi >= min(ys[0], ys[-1])) & (trans.azi <= max(ys[0], ys[-1])) \
+              & (trans.rng >= min(xs[0], xs[-1])) & (trans.rng <= max(xs[0], xs[-1]))
+        index = xr.where(valid, iy.fillna(0).astype(np.int64) * xs.size + ix.fillna(0).astype(np.int64), -1)
+        index = index.drop_vars([coord for coord in index.coords if coord not in ['lat', 'lon']])
+
+        name = self.get_ra2ll_index_name(data, autoscale)
+        self.save_cube(index.rename('index'), name, caption='Saving Radar to Geographic Index')
+        return self.open_cube(name)
+
+    def get_ra2ll_index(self, data, autoscale=True):
+        """
+        Open the radar to geographic index table for the radar coordinates grid, compute it when missed.
+
+        See compute_ra2ll_index() for the details.
+        """
+        import os
+
+        name = self.get_ra2ll_index_name(data, autoscale)
+        if not os.path.exists(self.get_filename(name)):
+            return self.compute_ra2ll_index(data, autoscale)
+        return self.open_cube(name)
+
+    def ra2ll(self, data, autoscale=True, index=False):
         """
         Perform geocoding from radar to geographic coordinates.
 
@@ -159,6 +249,13 @@ class Stack_geocode(Stack_sbas):
             Grid(s) representing the interferogram(s) in radar coordinates.
         trans : xarray.DataArray
             Geocoding transform matrix in radar coordinates.
+        autoscale : bool, optional
+            Decimate the transform to the grid spacing. Default is True.
+        index : bool, optional
+            Use the on-disk index table (see compute_ra2ll_index()) to gather the grid values for all the stack
+            slices of every block at once. The table is saved in the processing directory for every new grid
+            and reused for the same radar coordinates. When False, interpolate every block and stack slice
+            separately. Default is False.
 
         Returns
         -------
@@ -188,6 +285,9 @@ class Stack_geocode(Stack_sbas):
             print ('NOTE: the input data not in radar coordinates, miss geocoding')
             return data
 
+        if index:
+            return self.ra2ll_index(data, autoscale)
+
         # get complete transform table
         trans = self.get_trans()
 
@@ -319,6 +419,86 @@ class Stack_geocode(Stack_sbas):
                 out[k] = v
         return out.rename(data.name)
 
+    def ra2ll_index(self, data, autoscale=True):
+        """
+        Perform geocoding from radar to geographic coordinates using the precomputed index table.
+
+        The grid values are gathered by the index table for all the stack slices of every output block in a
+        single vectorized operation. See ra2ll() for the arguments.
+        """
+        import dask
+        import xarray as xr
+        import numpy as np
+
+        table = self.get_ra2ll_index(data, autoscale)
+        nx = data.x.size
+        # preserve the input data type, NODATA values require floating point one
+        dtype = np.result_type(data.dtype, np.float32)
+
+        # find stack dim
+        stackvar = data.dims[0] if len(data.dims) == 3 else None
+        if stackvar is None:
+            stackvals_blocks = [None]
+        else:
+            # split the stack the same way as the input grid chunks
+            sizes = data.chunks[0] if data.chunks is not None else (data[stackvar].size,)
+            stackvals_blocks = np.split(data[stackvar].values, np.cumsum(sizes)[:-1])
+
+        @dask.delayed
+        def index_block(table_block, stackvals=None):
+            # use outer variable data
+            shape = table_block.shape if stackvals is None else (len(stackvals), *table_block.shape)
+            grid_ll = np.full(shape, np.nan, dtype=dtype)
+            valid = table_block >= 0
+            if not np.any(valid):
+                return grid_ll
+            iy, ix = np.divmod(table_block[valid], nx)
+            ymin, ymax = iy.min(), iy.max() + 1
+            xmin, xmax = ix.min(), ix.max() + 1
+            # select required grid subset for all the stack slices at once
+            block_grid = data.isel(y=slice(ymin, ymax), x=slice(xmin, xmax))
+            if stackvals is not None:
+                block_grid = block_grid.sel({stackvar: stackvals})
+            values = block_grid.compute(n_workers=1).values
+            del block_grid
+            grid_ll[..., valid] = values[..., iy - ymin, ix - xmin]
+            del values, iy, ix, valid
+            return grid_ll
+
+        # split to equal chunks and rest
+        lats_blocks = np.array_split(np.arange(table.lat.size), np.arange(0, table.lat.size, self.chunksize)[1:])
+        lons_blocks = np.array_split(np.arange(table.lon.size), np.arange(0, table.lon.size, self.chunksize)[1:])
+
+        stack = []
+        for stackvals in stackvals_blocks:
+            blocks_total = []
+            for lats_block in lats_blocks:
+                blocks = []
+                for lons_block in lons_blocks:
+                    table_block = table.data[lats_block[0]:lats_block[-1]+1, lons_block[0]:lons_block[-1]+1]
+                    shape = (lats_block.size, lons_block.size) if stackvals is None else (len(stackvals), lats_block.size, lons_block.size)
+                    block = dask.array.from_delayed(index_block(table_block, stackvals), shape=shape, dtype=dtype)
+                    blocks.append(block)
+                    del block, table_block
+                blocks_total.append(blocks)
+                del blocks
+            stack.append(dask.array.block(blocks_total))
+            del blocks_total
+
+        if stackvar is None:
+            coords = {'lat': table.coords['lat'], 'lon': table.coords['lon']}
+            out = xr.DataArray(stack[0], coords=coords)
+        else:
+            coords = {stackvar: data[stackvar], 'lat': table.coords['lat'], 'lon': table.coords['lon']}
+            out = xr.DataArray(dask.array.concatenate(stack, axis=0), coords=coords)
+        del stack
+
+        # append source grid coordinates excluding removed y, x ones
+        for (k,v) in data.coords.items():
+            if k not in ['y','x']:
+                out[k] = v
+        return out.rename(data.name)
+
     ##########################################################################################
     # ll2ra
     ##########################################################################################
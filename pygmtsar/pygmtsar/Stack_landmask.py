@@ -146,8 +146,8 @@ class Stack_landmask(Stack_multilooking):
 
         if os.path.exists(landmask_filename):
             os.remove(landmask_filename)
-        encoding = {'landmask': self._compression(landmask.shape)}
-        landmask.rename('landmask').load()\
+        encoding = {'landmask': self._compression(landmask.shape, profile='landmask')}
+        self.netcdf_quantize(landmask.rename('landmask'), 'landmask').load()\
             .to_netcdf(landmask_filename, encoding=encoding, engine=self.netcdf_engine)
 
         self.landmask_filename = landmask_filename
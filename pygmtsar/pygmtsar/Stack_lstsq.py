@@ -84,6 +84,134 @@ class Stack_lstsq(Stack_tidal):
         # mask produced cumsum zeroes by NaNs where model[0] is the timeseries values
         return np.where(~np.isnan(model[0]), np.nancumsum(model[0], axis=0), np.nan)
 
+    @staticmethod
+    def lstsq2d(x, w, matrix, cumsum=True, batch=4096):
+        """
+        Compute the least squares solution (or weighted least squares if weights are provided) for a block of pixels.
+
+        This function is the block-level equivalent of lstsq1d() and produces the same results for every pixel,
+        but it solves all the pixels at once instead of calling np.linalg.lstsq() per pixel.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            Input data array with shape (pixels, pairs).
+        w : numpy.ndarray or None
+            Weights array for weighted least squares with shape (pixels, pairs) or (pairs,).
+            If None, non-weighted least squares is used.
+        matrix : numpy.ndarray
+            Input matrix for which the least squares solution is computed.
+        cumsum : bool, optional
+            Return the cumulative sum of the solution like to lstsq1d(). Default is True.
+        batch : int, optional
+            Maximum number of pixels solved together for per-pixel weights. Default is 4096.
+
+        Returns
+        -------
+        numpy.ndarray
+            Least squares solution with shape (pixels, dates).
+
+        Notes
+        -----
+        The pixels are grouped by their valid pairs mask. For non-weighted least squares and for the same weights
+        for all the pixels, every group is solved by a single np.linalg.lstsq() call with multiple right-hand sides.
+        For per-pixel weights, the normal equations are built and solved for all the group pixels together
+        using a batched eigendecomposition, which provides the same minimum-norm solution for rank-deficient matrices.
+        """
+        import numpy as np
+
+        matrix = np.asarray(matrix, dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        assert x.ndim == 2 and x.shape[1] == matrix.shape[0], \
+            f'ERROR: Array x shape should be (pixels, {matrix.shape[0]}) but it is {x.shape}'
+        out = np.full((x.shape[0], matrix.shape[1]), np.nan, dtype=np.float64)
+
+        if w is None:
+            # not weighted least squares calculation
+            w = np.ones(x.shape[1], dtype=np.float64)
+        w = np.asarray(w, dtype=np.float64)
+        if w.ndim == 1:
+            assert w.shape[0] == x.shape[1], f'Arrays x and w need to have equal pairs, x.shape={x.shape}, w.shape={w.shape}'
+            nanmask = np.isnan(x) | np.isnan(w)[None,:]
+        else:
+            assert x.shape == w.shape, f'Arrays x and w need to have equal shape, x.shape={x.shape}, w.shape={w.shape}'
+            nanmask = np.isnan(x) | np.isnan(w)
+        # pixels where all the pairs are NaNs are not processed
+        valid = ~np.all(nanmask, axis=1)
+        if not np.any(valid):
+            return out.astype(np.float32)
+
+        # fill nans as zeroes and set corresponding weight to 0
+        x = np.where(nanmask, 0, x)
+        # prevent weight=1, see lstsq1d()
+        w = (1 - 1e-6)*w
+        # weights W=w/sqrt(1-w^2) follow to lstsq1d() weighted least squares definition
+        if w.ndim == 1:
+            # the same weights for all the pixels, solve every valid pairs mask group by a single call
+            W = np.where(np.isnan(w), 0, w/np.sqrt(1-w**2))
+            patterns, inverse = np.unique(nanmask[valid], axis=0, return_inverse=True)
+            pixels = np.where(valid)[0]
+            for idx, pattern in enumerate(patterns):
+                group = pixels[inverse.reshape(-1)==idx]
+                Wg = np.where(pattern, 0, W)
+                try:
+                    model = np.linalg.lstsq(matrix * Wg[:,np.newaxis], (x[group] * Wg[np.newaxis,:]).T, rcond=None)
+                except Exception as e:
+                    # typically, this error handled:
+                    # LinAlgError: SVD did not converge in Linear Least Squares
+                    continue
+                out[group] = model[0].T
+                del model
+        else:
+            # per-pixel weights, solve the normal equations (A^T W^2 A) m = A^T W^2 x for pixel batches
+            w = np.where(nanmask, 0, w)
+            W2 = w**2/(1-w**2)
+            # precompute outer products of the matrix rows to build all the normal matrices by one product
+            outer = (matrix[:,:,np.newaxis] * matrix[:,np.newaxis,:]).reshape(matrix.shape[0], -1)
+            pixels = np.where(valid)[0]
+            for start in range(0, pixels.size, batch):
+                group = pixels[start:start+batch]
+                N = (W2[group] @ outer).reshape(group.size, matrix.shape[1], matrix.shape[1])
+                rhs = (W2[group] * x[group]) @ matrix
+                try:
+                    out[group] = Stack_lstsq.lstsq_solve2d(N, rhs, max(matrix.shape))
+                except Exception as e:
+                    continue
+                del N, rhs
+
+        if not cumsum:
+            return out.astype(np.float32)
+        # mask produced cumsum zeroes by NaNs where model[0] is the timeseries values
+        return np.where(~np.isnan(out), np.nancumsum(out, axis=1), np.nan).astype(np.float32)
+
+    @staticmethod
+    def lstsq_solve2d(N, rhs, size):
+        """
+        Solve the normal equations N m = rhs for a batch of pixels.
+
+        Parameters
+        ----------
+        N : numpy.ndarray
+            Normal matrices with shape (pixels, dates, dates).
+        rhs : numpy.ndarray
+            Right-hand sides with shape (pixels, dates).
+        size : int
+            The largest least squares matrix dimension to define the numerical rank cutoff.
+
+        Returns
+        -------
+        numpy.ndarray
+            Minimum-norm solutions with shape (pixels, dates).
+        """
+        import numpy as np
+
+        vals, vecs = np.linalg.eigh(N)
+        # use numerical rank cutoff like to the pseudo-inverse to produce minimum-norm solutions
+        cutoff = np.finfo(np.float64).eps * size * np.max(np.abs(vals), axis=1, keepdims=True)
+        inv = np.where(vals > cutoff, 1/np.where(vals > cutoff, vals, 1), 0)
+        coeffs = inv * np.einsum('kde,kd->ke', vecs, rhs)
+        return np.einsum('kde,ke->kd', vecs, coeffs)
+
     def lstsq_matrix(self, pairs):
         """
         Create a matrix for use in the least squares computation based on interferogram date pairs.
@@ -123,7 +251,7 @@ class Stack_lstsq(Stack_tidal):
         import numpy as np
         return np.nan_to_num(self.get_pairs_matrix(pairs)).astype(int)
 
-    def lstsq(self, data, weight=None, matrix='auto', cumsum=True, debug=False):
+    def lstsq(self, data, weight=None, matrix='auto', cumsum=True, batch=False, debug=False):
         """
         Perform least squares (weighted or unweighted) computation on the input phase data in parallel.
 
@@ -133,6 +261,9 @@ class Stack_lstsq(Stack_tidal):
             Input data to compute least squares on.
         weight : str, xarray.DataArray, pd.Series, or np.ndarray, optional
             Weights for the least squares computation.
+        batch : bool, optional
+            Solve all the pixels of every block at once using lstsq2d() instead of per-pixel lstsq1d() calls.
+            Both the ways produce the same results and the per-pixel one is the default. Default is False.
 
         Returns
         -------
@@ -144,6 +275,7 @@ class Stack_lstsq(Stack_tidal):
         stack.lstsq(unwraps_detrend)
         stack.lstsq(unwraps_detrend, corrs)
         stack.lstsq(unwraps_detrend, corrs.mean(['y', 'x']))
+        stack.lstsq(unwraps_detrend, corrs, batch=True)
 
         Notes
         -----
@@ -246,6 +378,14 @@ class Stack_lstsq(Stack_tidal):
                     weight_block = weight.isel(stack=stacks).compute(n_workers=1).values.transpose(1,0)
                 # weight=1 is not allowed for the used weighted least squares calculation function 
                 weight_block = np.where(weight_block>=1, 1, weight_block)
+                if batch:
+                    # solve all the block pixels together and revert the original dimensions order
+                    block = self.lstsq2d(data_block.reshape(-1, data_block.shape[-1]),
+                                         weight_block.reshape(-1, weight_block.shape[-1]),
+                                         matrix, cumsum).reshape(*data_block.shape[:-1], -1)
+                    block = block.transpose(2,0,1) if stacks is None else block.transpose(1,0)
+                    del data_block, weight_block
+                    return block
                 # Vectorize vec_lstsq
                 vec_lstsq = np.vectorize(lambda x, w: self.lstsq1d(x, w, matrix, cumsum), signature='(n),(n)->(m)')
                 # Apply vec_lstsq to data_block and weight_block and revert the original dimensions order
@@ -254,6 +394,11 @@ class Stack_lstsq(Stack_tidal):
                 else:
                     block = vec_lstsq(data_block, weight_block).transpose(1,0)
                 del weight_block, vec_lstsq
+            elif batch:
+                # solve all the block pixels together and revert the original dimensions order
+                block = self.lstsq2d(data_block.reshape(-1, data_block.shape[-1]),
+                                     weight, matrix, cumsum).reshape(*data_block.shape[:-1], -1)
+                block = block.transpose(2,0,1) if stacks is None else block.transpose(1,0)
             else:
                 # Vectorize vec_lstsq
                 vec_lstsq = np.vectorize(lambda x: self.lstsq1d(x, weight, matrix, cumsum), signature='(n)->(m)')
@@ -307,6 +452,230 @@ class Stack_lstsq(Stack_tidal):
 
         return model
 
+    @staticmethod
+    def lstsq_normal_block(x, w, matrix):
+        """
+        Build the weighted least squares normal equations for a block of pixels.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            Input data array with shape (pairs, ...).
+        w : numpy.ndarray or None
+            Weights array with the same shape as x or (pairs,). If None, non-weighted least squares is used.
+        matrix : numpy.ndarray
+            Least squares matrix with shape (pairs, dates).
+
+        Returns
+        -------
+        numpy.ndarray
+            The flattened normal matrices, right-hand sides and valid pairs counts
+            with shape (dates*dates + dates + 1, ...).
+        """
+        import numpy as np
+
+        shape = x.shape[1:]
+        x = x.reshape(x.shape[0], -1).T.astype(np.float64)
+        if w is None:
+            w = np.ones(x.shape[1], dtype=np.float64)
+        w = np.asarray(w, dtype=np.float64)
+        w = w.reshape(w.shape[0], -1).T if w.ndim > 1 else w[None,:]
+        nanmask = np.isnan(x) | np.isnan(w)
+        # weight=1 is not allowed for the used weighted least squares definition, see lstsq() and lstsq2d()
+        w = (1 - 1e-6)*np.where(nanmask, 0, np.where(w>=1, 1, w))
+        W2 = w**2/(1-w**2)
+        x = np.where(nanmask, 0, x)
+        outer = (matrix[:,:,np.newaxis] * matrix[:,np.newaxis,:]).reshape(matrix.shape[0], -1)
+        N = W2 @ outer
+        rhs = (W2 * x) @ matrix
+        count = np.sum(~nanmask, axis=1, keepdims=True)
+        return np.concatenate([N, rhs, count], axis=1).T.reshape(-1, *shape)
+
+    def lstsq_normal(self, data, weight=None, dates=None):
+        """
+        Compute the per-pixel least squares normal equations for incremental SBAS processing.
+
+        The normal equations of the date pairs are additive, so new pairs can be appended by lstsq_normal_update()
+        and the solution recomputed by lstsq_normal_solve() without reprocessing the previous pairs.
+        The result equals to lstsq(data, weight, batch=True) for the same pairs.
+
+        Parameters
+        ----------
+        data : xarray.DataArray
+            Input unwrapped phase stack with 'pair' dimension.
+        weight : xarray.DataArray, pd.Series, np.ndarray or list, optional
+            Weights with the same dimensions as data or per-pair weights. Default is None.
+        dates : list, optional
+            The dates of the solution. Default is None, to use the dates of the data pairs.
+
+        Returns
+        -------
+        xarray.Dataset
+            The normal matrices 'normal', right-hand sides 'rhs' and valid pairs counts 'count'.
+
+        Notes
+        -----
+        The normal matrices require dates*dates float64 values per pixel. For large grids, use
+        decimated or point (1D 'stack') data.
+
+        Examples
+        --------
+        normal = stack.lstsq_normal(unwraps, corrs)
+        normal = stack.lstsq_normal_update(normal, unwraps_new, corrs_new)
+        disp = stack.lstsq_normal_solve(normal)
+        """
+        import xarray as xr
+        import numpy as np
+        import pandas as pd
+        import dask.array as da
+
+        pairs, pair_dates = self.get_pairs(data, dates=True)
+        if dates is None:
+            dates = pair_dates
+        dates = pd.to_datetime(dates).values.astype('datetime64[D]')
+        refs = pairs['ref'].values.astype('datetime64[D]')
+        reps = pairs['rep'].values.astype('datetime64[D]')
+        assert np.all(np.isin(refs, dates)) and np.all(np.isin(reps, dates)), 'ERROR: pairs dates are not in the dates list'
+        # the same matrix as lstsq_matrix() for the defined dates
+        matrix = ((dates[None,:] > refs[:,None]) & (dates[None,:] <= reps[:,None])).astype(np.float64)
+
+        dims = data.dims[1:]
+        chunks = {dim: (self.chunksize1d if dim == 'stack' else self.netcdf_chunksize//2) for dim in dims}
+        data = data.chunk({'pair': -1, **chunks})
+
+        if isinstance(weight, pd.Series):
+            weight = weight.values
+        elif isinstance(weight, xr.DataArray) and weight.ndim == 1:
+            weight = weight.values
+        elif isinstance(weight, list):
+            weight = np.asarray(weight)
+        if isinstance(weight, xr.DataArray):
+            assert weight.shape == data.shape, 'ERROR: data and weight dataarrays should have the same dimensions'
+            weight = weight.chunk(dict(zip(data.dims, data.chunks))).data
+        elif weight is not None:
+            assert weight.shape == (data.pair.size,), 'ERROR: per-pair weight should have the pairs dimension size'
+
+        size = len(dates)
+        block = da.map_blocks(self.lstsq_normal_block, data.data, weight, matrix,
+                              chunks=((size*size + size + 1,), *data.data.chunks[1:]), dtype=np.float64)
+        spatial = block.shape[1:]
+        normal = block[:size*size].reshape(size, size, *spatial)
+        rhs = block[size*size:size*size+size]
+        count = block[-1].astype(np.int32)
+
+        coords = {dim: data[dim] for dim in dims}
+        return xr.Dataset({'normal': xr.DataArray(normal, dims=('date', 'date2', *dims)),
+                           'rhs': xr.DataArray(rhs, dims=('date', *dims)),
+                           'count': xr.DataArray(count, dims=dims)},
+                          coords={'date': pd.to_datetime(dates), 'date2': pd.to_datetime(dates),
+                                  'ref': ('pair', pairs['ref'].values), 'rep': ('pair', pairs['rep'].values),
+                                  **coords})
+
+    def lstsq_normal_update(self, normal, data, weight=None):
+        """
+        Append new pairs to the normal equations computed by lstsq_normal().
+
+        The new pairs can include new dates later than all the previous dates, like a new acquisition
+        paired with the recent ones. The cost depends on the new pairs only.
+
+        Parameters
+        ----------
+        normal : xarray.Dataset
+            The normal equations computed by lstsq_normal() or lstsq_normal_update().
+        data : xarray.DataArray
+            Input unwrapped phase stack for the new pairs.
+        weight : xarray.DataArray, pd.Series, np.ndarray or list, optional
+            Weights for the new pairs. Default is None.
+
+        Returns
+        -------
+        xarray.Dataset
+            The updated normal equations.
+        """
+        import xarray as xr
+        import numpy as np
+        import pandas as pd
+
+        pairs, pair_dates = self.get_pairs(data, dates=True)
+        pairs_old = pd.DataFrame({'ref': normal.ref.values, 'rep': normal.rep.values})
+        keys = set(zip(pairs_old['ref'], pairs_old['rep']))
+        assert not any([key in keys for key in zip(pairs['ref'], pairs['rep'])]), 'ERROR: the pairs are already included'
+
+        dates_old = pd.to_datetime(normal.date.values)
+        dates_new = pd.to_datetime(pair_dates).difference(dates_old)
+        assert len(dates_new) == 0 or dates_new.min() > dates_old.max(), \
+            'ERROR: the new dates should be later than all the previous dates'
+        dates = dates_old.append(dates_new)
+
+        delta = self.lstsq_normal(data, weight, dates=dates)
+        spatial = {dim: delta[dim] for dim in delta['count'].dims}
+        for dim in spatial:
+            assert np.array_equal(normal[dim].values, delta[dim].values), f'ERROR: {dim} coordinates are not the same'
+
+        # the previous pairs do not cover the new dates
+        size = len(dates_new)
+        padded = normal[['normal', 'rhs', 'count']].drop_vars(['date', 'date2'])\
+            .pad({'date': (0, size), 'date2': (0, size)}, constant_values=0)
+        pairs = pd.concat([pairs_old, pairs[['ref', 'rep']]])
+        return xr.Dataset({'normal': padded['normal'] + delta['normal'].data,
+                           'rhs': padded['rhs'] + delta['rhs'].data,
+                           'count': normal['count'] + delta['count'].data},
+                          coords={'date': dates, 'date2': dates,
+                                  'ref': ('pair', pairs['ref'].values), 'rep': ('pair', pairs['rep'].values),
+                                  **spatial})
+
+    def lstsq_normal_solve(self, normal, cumsum=True):
+        """
+        Solve the normal equations computed by lstsq_normal() or lstsq_normal_update().
+
+        Parameters
+        ----------
+        normal : xarray.Dataset
+            The normal equations.
+        cumsum : bool, optional
+            Return the cumulative sum of the solution like to lstsq(). Default is True.
+
+        Returns
+        -------
+        xarray.DataArray
+            The least squares solution as 'displacement' DataArray.
+        """
+        import xarray as xr
+        import numpy as np
+        import dask.array as da
+
+        size = normal.date.size
+        pairs = normal.pair.size
+
+        def solve_block(N, rhs, count):
+            shape = count.shape
+            N = N.reshape(size, size, -1).transpose(2,0,1)
+            rhs = rhs.reshape(size, -1).T
+            out = np.full(rhs.shape, np.nan, dtype=np.float64)
+            # pixels where all the pairs are NaNs are not processed
+            valid = count.reshape(-1) > 0
+            if np.any(valid):
+                try:
+                    out[valid] = Stack_lstsq.lstsq_solve2d(N[valid], rhs[valid], max(pairs, size))
+                except Exception as e:
+                    # typically, this error handled:
+                    # LinAlgError: Eigenvalues did not converge
+                    pass
+            if cumsum:
+                # mask produced cumsum zeroes by NaNs where model[0] is the timeseries values
+                out = np.where(~np.isnan(out), np.nancumsum(out, axis=1), np.nan)
+            return out.T.reshape(size, *shape).astype(np.float32)
+
+        dims = normal['count'].dims
+        index = ''.join(['yxs'[i] for i in range(len(dims))])
+        model = da.blockwise(solve_block, 'd' + index,
+                             normal['normal'].data.rechunk({0: -1, 1: -1}), 'de' + index,
+                             normal['rhs'].data.rechunk({0: -1}), 'd' + index,
+                             normal['count'].data, index,
+                             concatenate=True, dtype=np.float32)
+        coords = {'date': normal.date.values, **{dim: normal[dim] for dim in dims}}
+        return xr.DataArray(model, coords=coords, dims=('date', *dims)).rename('displacement')
+
     def rmse(self, data, solution, weight=None):
         """
         Calculate difference between pairs and dates
@@ -230,6 +230,82 @@ class Stack_multilooking(Stack_phasediff):
 #             return ds.coarsen({'y': coarsen[0], 'x': coarsen[1]}, boundary='trim').mean().chunk(chunksizes)
 #         return ds.chunk(chunksizes)
 
+    @staticmethod
+    def nanconvolve_gaussian_block(data, weight=None, sigmas=None, truncate=4.0):
+        """
+        Gaussian filtering for 2D or 3D real or complex array with NaNs and optional 2D weight.
+
+        The real and imaginary parts and the weights are filtered together in a single separable pass
+        with zero-width kernel along the stack dimension. The results are the same as for
+        utils.nanconvolve2d_gaussian() applied to every 2D slice.
+        """
+        import numpy as np
+        from scipy.ndimage import gaussian_filter
+
+        parts = [data.real, data.imag] if np.issubdtype(data.dtype, np.complexfloating) else [data]
+        dtype = parts[0].dtype
+        planes = []
+        for part in parts:
+            # NaN values and NaN weights are excluded
+            valid = ~np.isnan(part) if weight is None else ~np.isnan(part) & ~np.isnan(weight)
+            planes.append(np.where(valid, part if weight is None else part * weight, 0).astype(dtype))
+            planes.append(np.where(valid, 1 if weight is None else weight, 0).astype(dtype))
+            del valid
+        conv = gaussian_filter(np.stack(planes), sigma=(0,) * (data.ndim - 1) + tuple(sigmas),
+                               mode='reflect', truncate=truncate)
+        del planes
+        # to prevent "RuntimeWarning: invalid value encountered in divide" even when warning filter is defined
+        parts = [np.where(conv[idx+1] == 0, np.nan, conv[idx]/(conv[idx+1] + 1e-17)) for idx in range(0, len(conv), 2)]
+        del conv
+        return parts[0] + 1j*parts[1] if len(parts) == 2 else parts[0]
+
+    @staticmethod
+    def coarsen_block(data, scale):
+        """
+        Decimate the last two dimensions of numpy array the same way as xarray coarsen(boundary='trim').mean().
+        """
+        import numpy as np
+        import warnings
+
+        ny, nx = data.shape[-2] // scale[0], data.shape[-1] // scale[1]
+        data = data[..., :ny*scale[0], :nx*scale[1]]
+        if scale[0] == 1 and scale[1] == 1:
+            return data
+        data = data.reshape(*data.shape[:-2], ny, scale[0], nx, scale[1])
+        with warnings.catch_warnings():
+            # suppress "RuntimeWarning: Mean of empty slice"
+            warnings.simplefilter('ignore')
+            return np.nanmean(data, axis=(-3, -1))
+
+    def multilooking_chunks(self, shape, scale, depth):
+        """
+        Define processing chunks aligned to the decimation and covering the filter halo.
+        """
+        import numpy as np
+
+        chunks = []
+        for (size, k, d) in zip(shape, scale, depth):
+            chunksize = max(int(np.ceil(self.netcdf_chunksize / k)) * k, int(np.ceil(d / k)) * k)
+            sizes = [chunksize] * (size // chunksize) + ([size % chunksize] if size % chunksize else [])
+            # the small tail is merged to the previous block
+            if len(sizes) > 1 and sizes[-1] < d:
+                sizes[-2:] = [sizes[-2] + sizes[-1]]
+            chunks.append(tuple(sizes))
+        return tuple(chunks)
+
+    @staticmethod
+    def overlap_crop(shape, block_info, depth):
+        """
+        Return the block slices to crop the halo which is missed on the grid borders for map_overlap(boundary='none').
+        """
+        location = block_info[0]['chunk-location'][-2:]
+        nums = block_info[0]['num-chunks'][-2:]
+        y0 = depth[0] if location[0] > 0 else 0
+        x0 = depth[1] if location[1] > 0 else 0
+        y1 = shape[-2] - (depth[0] if location[0] < nums[0] - 1 else 0)
+        x1 = shape[-1] - (depth[1] if location[1] < nums[1] - 1 else 0)
+        return (slice(y0, y1), slice(x0, x1))
+
     def multilooking(self, data, weight=None, wavelength=None, coarsen=None, debug=False):
         import xarray as xr
         import numpy as np
@@ -298,13 +374,56 @@ class Stack_multilooking(Stack_phasediff):
             conv = utils.nanconvolve2d_gaussian(slice_data, weight, sigmas)
             return xr.DataArray(conv, dims=slice_data.dims, name=slice_data.name)
 
+        # process all the stack slices of every chunk together and decimate them in the same task
+        def process_stack(dataarray):
+            # the same as for utils.nanconvolve2d_gaussian()
+            truncate = 4.0
+            depth = [int(np.ceil(sigma * truncate)) for sigma in sigmas]
+            scale = coarsen if coarsen else (1, 1)
+            # processing blocks aligned to the decimation
+            chunks = self.multilooking_chunks(dataarray.shape[1:], scale, depth)
+            stack = dask.array.asarray(dataarray.data).rechunk({1: chunks[0], 2: chunks[1]})
+            dtype = stack.dtype
+
+            def block_func(block, block_weight=None, block_info=None):
+                crop = self.overlap_crop(block.shape, block_info, depth)
+                conv = self.nanconvolve_gaussian_block(block, block_weight[0] if block_weight is not None else None,
+                                                       sigmas, truncate)
+                return self.coarsen_block(conv[(slice(None), *crop)], scale).astype(dtype)
+
+            args = [stack]
+            if weight is not None:
+                args.append(dask.array.asarray(weight.data)[None,].rechunk({1: chunks[0], 2: chunks[1]}))
+            block = dask.array.map_overlap(block_func,
+                                           *args,
+                                           depth={0: 0, 1: depth[0], 2: depth[1]},
+                                           boundary='none',
+                                           trim=False,
+                                           align_arrays=False,
+                                           chunks=(stack.chunks[0],
+                                                   tuple(size // scale[0] for size in chunks[0]),
+                                                   tuple(size // scale[1] for size in chunks[1])),
+                                           dtype=dtype,
+                                           meta=np.array((), dtype=dtype))
+            del args, stack
+            # the coordinates are the same as for xarray coarsen(boundary='trim').mean()
+            coords = {stackvar: dataarray[stackvar],
+                      'y': dataarray.y.coarsen(y=scale[0], boundary='trim').mean().values,
+                      'x': dataarray.x.coarsen(x=scale[1], boundary='trim').mean().values}
+            out = xr.DataArray(block, coords=coords, name=dataarray.name)
+            del block
+            # append stack coordinates excluding grid ones
+            return out.assign_coords({k: v for (k, v) in dataarray.coords.items()
+                                      if k not in coords and not ('y' in v.dims or 'x' in v.dims)})
+
         # process stack of dataarray slices
         def process_slice_var(dataarray):    
             if stackvar:
-                stack = [process_slice(dataarray[ind]) for ind in range(len(dataarray[stackvar]))]
-                return xr.concat(stack, dim=stackvar).assign_coords(dataarray.coords)
-            else:
-                return process_slice(dataarray).assign_coords(dataarray.coords)
+                return process_stack(dataarray)
+            conv = process_slice(dataarray).assign_coords(dataarray.coords)
+            if coarsen:
+                return conv.coarsen({'y': coarsen[0], 'x': coarsen[1]}, boundary='trim').mean()
+            return conv
 
         if isinstance(data, xr.Dataset):
             ds = xr.Dataset({varname: process_slice_var(data[varname]) for varname in data.data_vars})
@@ -313,7 +432,140 @@ class Stack_multilooking(Stack_phasediff):
     
         # Set chunk size
         chunksizes = {'y': self.chunksize, 'x': self.chunksize}
-        if coarsen:
-            return ds.coarsen({'y': coarsen[0], 'x': coarsen[1]}, boundary='trim').mean().chunk(chunksizes)
-    
         return ds.chunk(chunksizes)
+
+    def multilooking_phasediff(self, pairs, data, topo='auto', phase=None, weight=None, wavelength=None, coarsen=None,
+                               method='nearest', joblib_backend=None, debug=False):
+        """
+        Compute multilooking phase difference and correlation in a single pass.
+
+        The SLC blocks with the filter halo are read once and the topography corrected phase difference,
+        the dates intensities, Gaussian filtering, decimation and correlation are calculated together in a single
+        kernel per block, so the full resolution phase difference and intensity grids are never materialized.
+        The results are the same as for phasediff(), multilooking() and correlation() methods chain.
+
+        Parameters
+        ----------
+        pairs : list, numpy.ndarray or pandas.DataFrame
+            The interferogram date pairs.
+        data : xarray.DataArray
+            The SLC stack as returned by open_data().
+        topo, phase, method, joblib_backend
+            See phasediff() method.
+        weight : xarray.DataArray, optional
+            2D weight for the phase difference multilooking.
+        wavelength, coarsen
+            See multilooking() method.
+        debug : bool, optional
+            Print debug information.
+
+        Returns
+        -------
+        tuple of xarray.DataArray
+            The multilooking complex phase difference and correlation.
+
+        Examples
+        --------
+        phasediff_look, corr_look = stack.multilooking_phasediff(pairs, stack.open_data(), wavelength=200, coarsen=(1,4))
+        """
+        import xarray as xr
+        import numpy as np
+        import pandas as pd
+        import dask
+
+        # GMTSAR constant 5.3 defines half-gain at filter_wavelength
+        cutoff = 5.3
+        # the same as for utils.nanconvolve2d_gaussian()
+        truncate = 4.0
+
+        if debug:
+            print ('DEBUG: multilooking_phasediff')
+
+        # Expand simplified definition of coarsen
+        coarsen = (coarsen, coarsen) if coarsen is not None and not isinstance(coarsen, (list, tuple, np.ndarray)) else coarsen
+        assert wavelength is not None or coarsen is not None, 'ERROR: wavelength or coarsen should be defined'
+
+        # calculate sigmas based on wavelength or coarsen
+        if wavelength is not None:
+            dy, dx = self.get_spacing(data)
+            sigmas = [wavelength / cutoff / dy, wavelength / cutoff / dx]
+        else:
+            sigmas = [coarsen[0] / cutoff, coarsen[1] / cutoff]
+        if debug:
+            print(f'DEBUG: multilooking sigmas ({sigmas[0]:.2f}, {sigmas[1]:.2f}), wavelength {wavelength}, coarsen {coarsen}')
+        depth = [int(np.ceil(sigma * truncate)) for sigma in sigmas]
+        scale = coarsen if coarsen is not None else (1, 1)
+
+        if weight is not None:
+            # for InSAR processing expect 2D weights
+            assert isinstance(weight, xr.DataArray) and len(weight.dims)==2, \
+                'ERROR: multilooking weight should be 2D DataArray'
+            assert data.shape[1:] == weight.shape, f'ERROR: multilooking data slice and weight variables have different shape \
+                ({data.shape[1:]} vs {weight.shape})'
+
+        # convert pairs (list, array, dataframe) to 2D numpy array
+        pairs, dates = self.get_pairs(pairs, dates=True)
+        pairs = pairs[['ref', 'rep']].astype(str).values
+        index = data.get_index('date')
+        refs = np.asarray([index.get_loc(date) for date in pairs[:,0]], dtype=np.int64)
+        reps = np.asarray([index.get_loc(date) for date in pairs[:,1]], dtype=np.int64)
+        ndates = len(data.date)
+        npairs = len(pairs)
+
+        # topographic and optional user-defined phase
+        correction = self.phasediff_correction(pairs, data, topo=topo, phase=phase, method=method,
+                                               joblib_backend=joblib_backend, debug=debug)
+
+        # processing blocks aligned to the decimation and covering the filter halo
+        chunks = self.multilooking_chunks(data.shape[1:], scale, depth)
+        # all the inputs are stacked together to read the halo only once for every block
+        layers = [data.data, correction.data.astype(np.complex64)]
+        if weight is not None:
+            layers.append(weight.data.astype(np.complex64)[None,])
+        stack = dask.array.concatenate(layers, axis=0).rechunk((-1, *chunks))
+        del layers, correction
+
+        def phasediff_block(block, block_info=None):
+            import warnings
+            warnings.filterwarnings('ignore')
+            # crop the halo which is missed on the grid borders
+            crop = (slice(None), *self.overlap_crop(block.shape, block_info, depth))
+
+            block_weight = block[ndates + npairs].real if weight is not None else None
+            # intensities filtering for all the dates
+            intensity = np.square(np.abs(block[:ndates]))
+            intensity = self.coarsen_block(self.nanconvolve_gaussian_block(intensity, None, sigmas, truncate)[crop], scale)
+            # phase differences filtering for all the pairs
+            phasediff = (block[refs] * block[ndates:ndates + npairs] * np.conj(block[reps])).astype(np.complex64)
+            phasediff = self.coarsen_block(self.nanconvolve_gaussian_block(phasediff, block_weight, sigmas, truncate)[crop], scale)
+            # calculate correlation
+            corr = self.correlation_kernel(phasediff.astype(np.complex64), intensity.astype(np.float32), refs, reps)
+            del intensity
+            return np.concatenate([phasediff, corr]).astype(np.complex64)
+
+        # output chunks are decimated and the trimmed tail is removed
+        chunks_y = [size // scale[0] for size in chunks[0]]
+        chunks_x = [size // scale[1] for size in chunks[1]]
+        block = dask.array.map_overlap(phasediff_block,
+                                       stack,
+                                       depth={0: 0, 1: depth[0], 2: depth[1]},
+                                       boundary='none',
+                                       trim=False,
+                                       chunks=((2 * npairs,), tuple(chunks_y), tuple(chunks_x)),
+                                       dtype=np.complex64,
+                                       meta=np.array((), dtype=np.complex64))
+        del stack
+
+        # the coordinates are the same as for xarray coarsen(boundary='trim').mean()
+        coords = {'pair': [' '.join(pair) for pair in pairs],
+                  'y': data.y.coarsen(y=scale[0], boundary='trim').mean().values,
+                  'x': data.x.coarsen(x=scale[1], boundary='trim').mean().values}
+        phasediff = xr.DataArray(block[:npairs], coords=coords).rename('phase')
+        corr = xr.DataArray(block[npairs:].real, coords=coords).rename('correlation')
+        del block
+
+        coord_ref = xr.DataArray(pd.to_datetime(pairs[:,0]), coords={'pair': coords['pair']})
+        coord_rep = xr.DataArray(pd.to_datetime(pairs[:,1]), coords={'pair': coords['pair']})
+        # Set chunk size
+        chunksizes = {'y': self.chunksize, 'x': self.chunksize}
+        return tuple(grid.assign_coords(ref=coord_ref, rep=coord_rep).chunk(chunksizes) for grid in (phasediff, corr))
@@ -11,12 +11,23 @@ from .Stack_topo import Stack_topo
 from .tqdm_dask import tqdm_dask
 from .PRM import PRM
 from .utils import utils
+# required for function decorators
+from numba import jit, prange
+# import directive is not compatible to numba
+import numpy as np
 
 class Stack_phasediff(Stack_topo):
 
     def compute_interferogram(self, pairs, name, resolution=None, weight=None, topo=None, phase=None, method=None,
                               wavelength=None, psize=None, coarsen=None, stack=None, queue=None, timeout=None,
-                              skip_exist=False, joblib_backend=None, debug=False):
+                              skip_exist=False, fused=False, joblib_backend=None, debug=False):
+        """
+        Compute and save interferograms and correlations for the pairs.
+
+        Use fused=True to calculate the phase difference, multilooking and correlation in a single pass
+        on the SLC blocks (see multilooking_phasediff() method) to prevent full resolution intermediate grids
+        materialization. This mode requires wavelength or coarsen argument.
+        """
         import xarray as xr
         import numpy as np
         import dask
@@ -67,20 +78,29 @@ class Stack_phasediff(Stack_topo):
             data = self.open_data(dates, debug=debug)
             if weight is not None:
                 data = data.reindex_like(weight, fill_value=np.nan)
-            intensity = np.square(np.abs(data))
-            # Gaussian filtering 200m cut-off wavelength with optional range multilooking on Sentinel-1 amplitudes
-            intensity_look = self.multilooking(intensity, wavelength=wavelength, coarsen=coarsen, debug=debug)
-            del intensity
-            # calculate phase difference with topography correction
-            phasediff = self.phasediff(chunk, data, topo=topo, phase=phase, method=method, joblib_backend=joblib_backend, debug=debug)
-            del data
-            # Gaussian filtering 200m cut-off wavelength with optional range multilooking
-            phasediff_look = self.multilooking(phasediff, weight=weight,
-                                               wavelength=wavelength, coarsen=coarsen, debug=debug)
-            del phasediff
-            # correlation with optional range decimation
-            corr_look = self.correlation(phasediff_look, intensity_look, debug=debug)
-            del intensity_look
+            if fused and (wavelength is not None or coarsen is not None):
+                # phase difference with topography correction, Gaussian filtering with optional range multilooking
+                # and correlation calculated together on SLC blocks
+                phasediff_look, corr_look = self.multilooking_phasediff(chunk, data, topo=topo, phase=phase,
+                                                                        weight=weight, wavelength=wavelength,
+                                                                        coarsen=coarsen, method=method,
+                                                                        joblib_backend=joblib_backend, debug=debug)
+                del data
+            else:
+                intensity = np.square(np.abs(data))
+                # Gaussian filtering 200m cut-off wavelength with optional range multilooking on Sentinel-1 amplitudes
+                intensity_look = self.multilooking(intensity, wavelength=wavelength, coarsen=coarsen, debug=debug)
+                del intensity
+                # calculate phase difference with topography correction
+                phasediff = self.phasediff(chunk, data, topo=topo, phase=phase, method=method, joblib_backend=joblib_backend, debug=debug)
+                del data
+                # Gaussian filtering 200m cut-off wavelength with optional range multilooking
+                phasediff_look = self.multilooking(phasediff, weight=weight,
+                                                   wavelength=wavelength, coarsen=coarsen, debug=debug)
+                del phasediff
+                # correlation with optional range decimation
+                corr_look = self.correlation(phasediff_look, intensity_look, debug=debug)
+                del intensity_look
             if psize is not None:
                 # Goldstein filter in psize pixel patch size on square grid cells produced using 1:4 range multilooking
                 phasediff_look_goldstein = self.goldstein(phasediff_look, corr_look, psize, debug=debug)
@@ -127,20 +147,20 @@ class Stack_phasediff(Stack_topo):
     def compute_interferogram_singlelook(self, pairs, name, weight=None, topo='auto', phase=None,
                                          wavelength=None, method='nearest', psize=None,
                                          stack=None, queue=16, timeout=None,
-                                         skip_exist=False, joblib_backend=None, debug=False):
+                                         skip_exist=False, fused=False, joblib_backend=None, debug=False):
         self.compute_interferogram(pairs, name, weight=weight, topo=topo, phase=phase, method=method, wavelength=wavelength,
                                    psize=psize, stack=stack, queue=queue, timeout=timeout,
-                                   skip_exist=skip_exist, joblib_backend=joblib_backend, debug=debug)
+                                   skip_exist=skip_exist, fused=fused, joblib_backend=joblib_backend, debug=debug)
 
     # Goldstein filter requires square grid cells means 1:4 range multilooking.
     # For multilooking interferogram we can use square grid always using coarsen = (1,4)
     def compute_interferogram_multilook(self, pairs, name, resolution=None, weight=None, topo='auto', phase=None,
                                         wavelength=None, method='nearest', psize=None, coarsen=(1,4),
                                         stack=None, queue=16, timeout=None,
-                                        skip_exist=False, joblib_backend=None, debug=False):
+                                        skip_exist=False, fused=False, joblib_backend=None, debug=False):
         self.compute_interferogram(pairs, name, resolution=resolution, weight=weight, topo=topo, phase=phase, method=method,
                                    wavelength=wavelength, psize=psize, coarsen=coarsen, stack=stack, queue=queue, timeout=timeout,
-                                   skip_exist=skip_exist, joblib_backend=joblib_backend, debug=debug)
+                                   skip_exist=skip_exist, fused=fused, joblib_backend=joblib_backend, debug=debug)
 
     @staticmethod
     def interferogram(phase, debug=False):
@@ -165,6 +185,38 @@ class Stack_phasediff(Stack_topo):
 #         # amp1 and amp2 chunks are high for SLC, amp has normal chunks for NetCDF
 #         return xr.where(i >= thresh, corr, np.nan).chunk(a.chunksizes).rename('phase')
 
+    @staticmethod
+    @jit(nopython=True, nogil=True, parallel=True)
+    def correlation_kernel(phase, intensity, refs, reps):
+        """
+        Calculate correlation for 3D block of complex phase differences (one layer for every pair)
+        and 3D block of intensities (one layer for every date) using the pairs dates indices.
+        """
+        npairs, ny, nx = phase.shape
+        out = np.empty((npairs, ny, nx), dtype=np.float32)
+        for idx in prange(npairs * ny):
+            pair = idx // ny
+            y = idx % ny
+            ref = refs[pair]
+            rep = reps[pair]
+            for x in range(nx):
+                amp = np.abs(phase[pair, y, x])
+                den = intensity[ref, y, x] * intensity[rep, y, x]
+                # complex division by zero is not allowed by numba, use the numpy division results
+                if den > 0:
+                    corr = np.float32(amp / np.sqrt(den))
+                elif den == 0 and amp > 0:
+                    corr = np.float32(np.inf)
+                else:
+                    corr = np.float32(np.nan)
+                # NaN values are preserved
+                if corr < 0:
+                    corr = np.float32(0)
+                elif corr > 1:
+                    corr = np.float32(1)
+                out[pair, y, x] = corr
+        return out
+
     def correlation(self, phase, intensity, debug=False):
         """
         Example:
@@ -175,6 +227,7 @@ class Stack_phasediff(Stack_topo):
         Note:
         Multiple interferograms require the same data grids, allowing us to speed up the calculation
         by saving filtered data to a disk file.
+        All the pairs are processed together in a single blockwise operation using the pairs dates indices.
         """
         import pandas as pd
         import dask
@@ -191,19 +244,30 @@ class Stack_phasediff(Stack_topo):
         # check correctness for user-defined data arguments
         assert np.issubdtype(phase.dtype, np.complexfloating), 'ERROR: Phase should be complex-valued data.'
         assert not np.issubdtype(intensity.dtype, np.complexfloating), 'ERROR: Intensity cannot be complex-valued data.'
-
-        stack = []
-        for stack_idx, pair in enumerate(pairs):
-            date1, date2 = pair
-            # calculate correlation
-            corr = np.abs(phase.sel(pair=' '.join(pair)) / np.sqrt(intensity.sel(date=date1) * intensity.sel(date=date2)))
-            corr = xr.where(corr < 0, 0, corr)
-            corr = xr.where(corr > 1, 1, corr)
-            # add to stack
-            stack.append(corr)
-            del corr
-
-        return xr.concat(stack, dim='pair').rename('correlation')
+        assert phase.shape[1:] == intensity.shape[1:], f'ERROR: phase and intensity variables have different shape \
+                                                       ({phase.shape[1:]} vs {intensity.shape[1:]})'
+
+        # dates indices for all the pairs
+        index = intensity.get_index('date')
+        refs = np.asarray([index.get_loc(date) for date in pairs[:,0]], dtype=np.int64)
+        reps = np.asarray([index.get_loc(date) for date in pairs[:,1]], dtype=np.int64)
+
+        phase_data = dask.array.asarray(phase.data)
+        # all the dates are required for every block
+        intensity_data = dask.array.asarray(intensity.data).astype(np.float32)\
+            .rechunk((-1, phase_data.chunks[1], phase_data.chunks[2]))
+        corr = dask.array.blockwise(
+            self.correlation_kernel,
+            'kyx',
+            phase_data.astype(np.complex64), 'kyx',
+            intensity_data, 'dyx',
+            dask.array.from_array(refs, chunks=(phase_data.chunks[0],)), 'k',
+            dask.array.from_array(reps, chunks=(phase_data.chunks[0],)), 'k',
+            concatenate=True,
+            dtype=np.float32
+        )
+        del phase_data, intensity_data
+        return xr.DataArray(corr, coords=phase.coords).rename('correlation')
 
 #     def phasediff(self, pairs, data='auto', topo='auto', method='cubic', debug=False):
 #         import pandas as pd
@@ -451,16 +515,23 @@ class Stack_phasediff(Stack_topo):
 # 
 #         return xr.concat(stack, dim='pair').assign_coords(ref=coord_ref, rep=coord_rep, pair=coord_pair).rename('phasediff')
 
-    def phasediff(self, pairs, data='auto', topo='auto', phase=None, method='nearest', joblib_backend=None, debug=False):
-        #import dask
+    def phasediff_correction(self, pairs, data='auto', topo='auto', phase=None, method='nearest', joblib_backend=None, debug=False):
+        """
+        Calculate the complex phase difference correction for the pairs: the topographic phase and optional
+        user-defined phase.
+
+        Parameters are the same as for phasediff() method.
+
+        Returns
+        -------
+        xarray.DataArray
+            The complex correction multiplier for every pair.
+        """
         import dask.array as da
         import xarray as xr
         import numpy as np
         import pandas as pd
 
-        if debug:
-            print ('DEBUG: phasediff')
-        
         if joblib_backend is None and debug:
             joblib_backend = 'sequential'
 
@@ -491,15 +562,46 @@ class Stack_phasediff(Stack_topo):
         if phase is not None:
             phase_real = xr.concat([utils.interp2d_like(phase2d, data, method=method,
                                     kwargs={'fill_value': 'extrapolate'}) for phase2d in phase], dim='pair')
+            out = phase_topo * np.exp(-1j * phase_real)
         else:
-            phase_real = 0
-            #phase_real = len(pairs)*[0]
+            out = phase_topo
+        del phase_topo
+
+        if not isinstance(topo, xr.DataArray):
+            # append coordinates which usually added from topo phase dataarray
+            coord_pair = [' '.join(pair) for pair in pairs]
+            coord_ref = xr.DataArray(pd.to_datetime(pairs[:,0]), coords={'pair': coord_pair})
+            coord_rep = xr.DataArray(pd.to_datetime(pairs[:,1]), coords={'pair': coord_pair})
+            return out.assign_coords(ref=coord_ref, rep=coord_rep, pair=coord_pair)
+        return out
+
+    def phasediff(self, pairs, data='auto', topo='auto', phase=None, method='nearest', joblib_backend=None, debug=False):
+        #import dask
+        import dask.array as da
+        import xarray as xr
+        import numpy as np
+        import pandas as pd
+
+        if debug:
+            print ('DEBUG: phasediff')
+
+        # convert pairs (list, array, dataframe) to 2D numpy array
+        pairs, dates = self.get_pairs(pairs, dates=True)
+        pairs = pairs[['ref', 'rep']].astype(str).values
+
+        if isinstance(data, str) and data == 'auto':
+            # open datafiles required for all the pairs
+            data = self.open_data(dates)
+
+        # topographic and optional user-defined phase
+        correction = self.phasediff_correction(pairs, data, topo=topo, phase=phase, method=method,
+                                               joblib_backend=joblib_backend, debug=debug)
 
         # calculate phase difference
         data1 = data.sel(date=pairs[:,0]).drop_vars('date').rename({'date': 'pair'})
         data2 = data.sel(date=pairs[:,1]).drop_vars('date').rename({'date': 'pair'})
-        out = (data1 * phase_topo * np.exp(-1j * phase_real) * da.conj(data2)).astype(np.complex64).rename('phase')
-        del phase_topo, phase_real, data1, data2
+        out = (data1 * correction * da.conj(data2)).astype(np.complex64).rename('phase')
+        del correction, data1, data2
 
         # # calculate phase difference
         # phase_dask = da.stack([(data.sel(date=pair[0]).drop_vars('date') \
@@ -507,13 +609,6 @@ class Stack_phasediff(Stack_topo):
         #          * da.conj(data.sel(date=pair[1]).drop_vars('date'))) for idx, pair in enumerate(pairs)], axis=0)
         # out = xr.DataArray(phase_dask, coords=phase_topo.coords)
         # del phase_topo, phase_real, phase_dask
-
-        if not isinstance(topo, xr.DataArray):
-            # append coordinates which usually added from topo phase dataarray
-            coord_pair = [' '.join(pair) for pair in pairs]
-            coord_ref = xr.DataArray(pd.to_datetime(pairs[:,0]), coords={'pair': coord_pair})
-            coord_rep = xr.DataArray(pd.to_datetime(pairs[:,1]), coords={'pair': coord_pair})
-            return out.assign_coords(ref=coord_ref, rep=coord_rep, pair=coord_pair)
         return out
 
     def goldstein(self, phase, corr, psize=32, debug=False):
@@ -536,13 +631,6 @@ class Stack_phasediff(Stack_topo):
         if not isinstance(psize, (list, tuple)):
             psize = (psize, psize)
 
-        def apply_pspec(data, alpha):
-            # NaN is allowed value
-            assert not(alpha < 0), f'Invalid parameter value {alpha} < 0'
-            wgt = np.power(np.abs(data)**2, alpha / 2)
-            data = wgt * data
-            return data
-
         def make_wgt(psize):
             nyp, nxp = psize
             # Create arrays of horizontal and vertical weights
@@ -555,45 +643,44 @@ class Stack_phasediff(Stack_topo):
                             [np.flip(quadrant, axis=0), np.flip(np.flip(quadrant, axis=0), axis=1)]])
             return wgt
 
-        def patch_goldstein_filter(data, corr, wgt, psize):
-            """
-            Apply the Goldstein adaptive filter to the given data.
-
-            Args:
-                data: 2D numpy array of complex values representing the data to be filtered.
-                corr: 2D numpy array of correlation values. Must have the same shape as `data`.
-
-            Returns:
-                2D numpy array of filtered data.
-            """
-            # Calculate alpha
-            alpha = 1 - (wgt * corr).sum() / wgt.sum()
-            data = np.fft.fft2(data, s=psize)
-            data = apply_pspec(data, alpha)
-            data = np.fft.ifft2(data, s=psize)
-            return wgt * data
-
         def apply_goldstein_filter(data, corr, psize, wgt_matrix):
+            # process 2D grid as a single-pair stack
+            if data.ndim == 2:
+                return apply_goldstein_filter(data[None,], corr[None,], psize, wgt_matrix)[0]
             # Create an empty array for the output
             out = np.zeros(data.shape, dtype=np.complex64)
-            # ignore processing for empty chunks 
-            if np.all(np.isnan(data)):
+            nyp, nxp = psize
+            # the patches grid is the same as for the windows iteration
+            # range(0, data.shape[0] - nyp, nyp // 2) and range(0, data.shape[1] - nxp, nxp // 2)
+            ys = np.arange(0, data.shape[1] - nyp, nyp // 2)
+            xs = np.arange(0, data.shape[2] - nxp, nxp // 2)
+            if ys.size == 0 or xs.size == 0:
                 return out
-            # Create the weight matrix
-            #wgt_matrix = make_wgt(psize)
-            # Iterate over windows of the data
-            for i in range(0, data.shape[0] - psize[0], psize[0] // 2):
-                for j in range(0, data.shape[1] - psize[1], psize[1] // 2):
-                    # Create proocessing windows
-                    data_window = data[i:i+psize[0], j:j+psize[1]]
-                    corr_window = corr[i:i+psize[0], j:j+psize[1]]
-                    wgt_window = wgt_matrix[:data_window.shape[0],:data_window.shape[1]]
-                    # Apply the filter to the window
-                    filtered_window = patch_goldstein_filter(data_window, corr_window, wgt_window, psize)
-                    # Add the result to the output array
-                    slice_i = slice(i, min(i + psize[0], out.shape[0]))
-                    slice_j = slice(j, min(j + psize[1], out.shape[1]))
-                    out[slice_i, slice_j] += filtered_window[:slice_i.stop - slice_i.start, :slice_j.stop - slice_j.start]
+            # flat output indices to overlap-add all the patches at once
+            iy = ys[:, None] + np.arange(nyp)[None, :]
+            ix = xs[:, None] + np.arange(nxp)[None, :]
+            index = (iy[:, None, :, None] * data.shape[2] + ix[None, :, None, :]).ravel()
+            size = data.shape[1] * data.shape[2]
+            for k in range(data.shape[0]):
+                # ignore processing for empty grids
+                if np.all(np.isnan(data[k])):
+                    continue
+                # strided views for all the overlapping patches in (patch_y, patch_x, nyp, nxp) order
+                data_patches = np.lib.stride_tricks.sliding_window_view(data[k], psize)[ys][:, xs]
+                corr_patches = np.lib.stride_tricks.sliding_window_view(corr[k], psize)[ys][:, xs]
+                # Calculate alpha for every patch
+                alpha = 1 - np.einsum('ijyx,yx->ij', corr_patches, wgt_matrix) / wgt_matrix.sum()
+                # NaN is allowed value
+                assert not np.any(alpha < 0), f'Invalid parameter value {np.nanmin(alpha)} < 0'
+                # apply |S|^alpha weighting to all the patches spectra using batched FFT
+                spec = np.fft.fft2(data_patches, axes=(-2, -1))
+                spec *= np.power(np.abs(spec)**2, alpha[:, :, None, None] / 2)
+                patches = (wgt_matrix * np.fft.ifft2(spec, axes=(-2, -1))).ravel()
+                del data_patches, corr_patches, alpha, spec
+                # Add the result to the output array
+                out[k] = (np.bincount(index, weights=patches.real, minlength=size)
+                          + 1j * np.bincount(index, weights=patches.imag, minlength=size)).reshape(data.shape[1:])
+                del patches
             return out
 
         assert phase.shape == corr.shape, f'ERROR: phase and correlation variables have different shape \
@@ -604,32 +691,24 @@ class Stack_phasediff(Stack_topo):
 #             print (f'NOTE: grid cells are not close to square as expected: {spacing}')
 #         
         if len(phase.dims) == 2:
-            stackvar = None
-        else:
-            stackvar = phase.dims[0]
-    
-        stack =[]
-        for ind in range(len(phase) if stackvar is not None else 1):
-            # Apply function with overlap; psize//2 overlap is not enough (some empty lines produced)
-            # use complex data and real correlation
-            # fill NaN values in correlation by zeroes to prevent empty output blocks
-            block = dask.array.map_overlap(apply_goldstein_filter,
-                                           (phase[ind] if stackvar is not None else phase).fillna(0).data,
-                                           (corr[ind]  if stackvar is not None else corr ).fillna(0).data,
-                                           depth=(psize[0] // 2 + 2, psize[1] // 2 + 2),
-                                           dtype=np.complex64, 
-                                           meta=np.array(()),
-                                           psize=psize,
-                                           wgt_matrix = make_wgt(psize))
-            # Calculate the phase
-            stack.append(block)
-            del block
-
-        if stackvar is not None:
-            ds = xr.DataArray(dask.array.stack(stack), coords=phase.coords)
+            depth = (psize[0] // 2 + 2, psize[1] // 2 + 2)
         else:
-            ds = xr.DataArray(stack[0], coords=phase.coords)
-        del stack
+            # process all the pairs of every chunk together
+            depth = (0, psize[0] // 2 + 2, psize[1] // 2 + 2)
+
+        # Apply function with overlap; psize//2 overlap is not enough (some empty lines produced)
+        # use complex data and real correlation
+        # fill NaN values in correlation by zeroes to prevent empty output blocks
+        block = dask.array.map_overlap(apply_goldstein_filter,
+                                       phase.fillna(0).data,
+                                       corr.fillna(0).data,
+                                       depth=depth,
+                                       dtype=np.complex64, 
+                                       meta=np.array(()),
+                                       psize=psize,
+                                       wgt_matrix = make_wgt(psize))
+        ds = xr.DataArray(block, coords=phase.coords)
+        del block
         # replace zeros produces in NODATA areas
         return ds.where(ds).rename('phase')
 
@@ -12,6 +12,43 @@ from .PRM import PRM
 
 class Stack_prm(Stack_base):
 
+    # parsed PRM objects and offsets keyed by the file modification times
+    prm_cache = None
+
+    def prm_cache_clear(self):
+        """
+        Drop the cached PRM objects and subswath offsets.
+
+        Call it after the PRM files are rewritten, like compute_align() and compute_reframe() do.
+        """
+        self.prm_cache = {}
+
+    def prm_cache_get(self, key, mtimes, func):
+        """
+        Return the cached value for the key when the file modification times are not changed.
+
+        Parameters
+        ----------
+        key : tuple
+            The cache key.
+        mtimes : tuple
+            The modification times of the source files.
+        func : callable
+            The function to compute the value on a cache miss.
+
+        Returns
+        -------
+        object
+            The cached or computed value.
+        """
+        if self.prm_cache is None:
+            self.prm_cache = {}
+        cached = self.prm_cache.get(key)
+        if cached is None or cached[0] != mtimes:
+            cached = (mtimes, func())
+            self.prm_cache[key] = cached
+        return cached[1]
+
     def PRM(self, date=None, subswath=None):
         """
         Open a PRM (Parameter) file.
@@ -41,25 +78,46 @@ class Stack_prm(Stack_base):
 
         prefix = self.get_subswath_prefix(subswath, date)
         filename = os.path.join(self.basedir, f'{prefix}.PRM')
-        return PRM.from_file(filename)
-        
+        # the prefix defines the date and subswath, the file can be rewritten
+        mtime = os.stat(filename).st_mtime_ns
+        # return a copy because PRM objects are mutable
+        return self.prm_cache_get(('PRM', prefix), mtime, lambda: PRM.from_file(filename)).copy()
+
     def PRM_merged(self, date=None, offsets='auto'):
-    
+        import os
+
         if isinstance(offsets, str) and offsets == 'auto':
             offsets = self.prm_offsets()
             
         maxy, maxx = offsets['extent']
         minh = offsets['bottom']
-        return self.PRM(date=date).fix_merged(maxy, maxx, minh)
+
+        prefix = self.get_subswath_prefix(self.get_subswath(), date)
+        mtime = os.stat(os.path.join(self.basedir, f'{prefix}.PRM')).st_mtime_ns
+        return self.prm_cache_get(('PRM_merged', prefix, maxy, maxx, minh), mtime,
+                                  lambda: self.PRM(date=date).fix_merged(maxy, maxx, minh)).copy()
 
     def prm_offsets(self, debug=False):
-        import xarray as xr
-        import numpy as np
-        from scipy import constants
+        import os
+        import copy
 
         subswaths = self.get_subswaths()
         if not isinstance(subswaths, (str, int)):
             subswaths = ''.join(map(str, subswaths))
+        subswaths = str(subswaths)
+
+        # the offsets depend on the reference subswath PRM files only
+        mtimes = tuple(os.stat(os.path.join(self.basedir, f'{self.get_subswath_prefix(subswath)}.PRM')).st_mtime_ns
+                       for subswath in subswaths)
+        if debug:
+            return self._prm_offsets(subswaths, debug=debug)
+        # return a copy because the offsets include mutable lists
+        return copy.deepcopy(self.prm_cache_get(('prm_offsets', subswaths), mtimes,
+                                                lambda: self._prm_offsets(subswaths)))
+
+    def _prm_offsets(self, subswaths, debug=False):
+        import numpy as np
+        from scipy import constants
 
         if len(subswaths) == 1:
             prm = self.PRM(subswath=int(subswaths))
@@ -24,9 +24,94 @@ class Stack_ps(Stack_stl):
     #ps_decimator = stack.pixel_decimator(resolution=60, grid=adi, debug=True)
     #adi_dec = adi.coarsen({'y': 4, 'x': 16}, boundary='trim').min()
     #adi_dec
+    @staticmethod
+    def ps_moments(data):
+        """
+        Compute the per-pixel count, mean and sum of squared deviations along 'date' dimension in a single pass.
+
+        Every date chunk is read once and merged into the running moments using Welford/Chan updates.
+
+        Parameters
+        ----------
+        data : xarray.DataArray
+            The input 3D stack.
+
+        Returns
+        -------
+        tuple
+            The moments (count, mean, m2) as lazy 2D arrays.
+        """
+        import numpy as np
+
+        chunks = data.chunks[data.get_axis_num('date')] if data.chunks is not None else (data.date.size,)
+        moments = None
+        start = 0
+        for size in chunks:
+            block = data.isel(date=slice(start, start + size))
+            start += size
+            count = block.count('date')
+            mean = block.mean('date')
+            m2 = np.square(block - mean).sum('date')
+            moments = (count, mean, m2) if moments is None else Stack_ps.ps_moments_merge(moments, (count, mean, m2))
+            del block, count, mean, m2
+        return moments
+
+    @staticmethod
+    def ps_moments_merge(moments1, moments2):
+        """
+        Merge two sets of (count, mean, m2) moments using Chan's parallel algorithm.
+
+        Parameters
+        ----------
+        moments1, moments2 : tuple
+            The moments computed by ps_moments().
+
+        Returns
+        -------
+        tuple
+            The merged moments (count, mean, m2).
+        """
+        count1, mean1, m21 = moments1
+        count2, mean2, m22 = moments2
+        count = count1 + count2
+        # empty pixels have NaN mean and zero weight
+        mean1 = mean1.fillna(0)
+        mean2 = mean2.fillna(0)
+        mean = (count1 * mean1 + count2 * mean2) / count
+        m2 = m21.fillna(0) + m22.fillna(0) + (mean2 - mean1)**2 * count1 * count2 / count
+        return (count, mean, m2)
+
     # define PS candidates using Amplitude Dispersion Index (ADI)
-    def compute_ps(self, geometry=None, dates=None, data='auto', name='ps', interactive=False):
+    def compute_ps(self, geometry=None, dates=None, data='auto', name='ps', update=False, interactive=False):
+        """
+        Compute the stability measures for persistent scatterers (PS) candidates selection.
+
+        The normalized intensities are accumulated in a single pass over the dates and the running moments
+        are saved together with the results, so the new dates can be added later using update=True.
+
+        Parameters
+        ----------
+        geometry : geopandas.GeoDataFrame or xarray.DataArray, optional
+            The area to process. Default is None.
+        dates : list, optional
+            The dates to process. For update=True, the dates which are not processed yet are used by default.
+        data : xarray.DataArray or str, optional
+            The SLC intensities. Default is 'auto' to open SLC data.
+        name : str, optional
+            The output NetCDF name. Default is 'ps'.
+        update : bool, optional
+            Append the dates to the saved moments instead of recomputing all the dates. Default is False.
+        interactive : bool, optional
+            Return the result instead of saving it. Default is False.
+
+        Returns
+        -------
+        xarray.Dataset or None
+            The 'average', 'deviation' and Amplitude Dispersion Index 'adi' grids, per-date 'stack_average'
+            and the moments 'moment_count', 'moment_mean', 'moment_m2' for interactive=True.
+        """
         import xarray as xr
+        import pandas as pd
         import numpy as np
         import dask
         import os
@@ -36,6 +121,16 @@ class Stack_ps(Stack_stl):
         warnings.filterwarnings('ignore', module='dask')
         warnings.filterwarnings('ignore', module='dask.core')
 
+        previous = None
+        if update:
+            # the saved moments are small 2D grids, load them to rewrite the file
+            previous = self.open_cube(name).compute()
+            assert 'moment_count' in previous, 'ERROR: the saved PS measures have no moments, use update=False'
+            if dates is None and isinstance(data, str) and data == 'auto':
+                processed = pd.to_datetime(previous.date.values)
+                dates = [date for date in self.df.index.unique() if pd.to_datetime(date) not in processed]
+                assert len(dates) > 0, 'ERROR: no new dates found to update the PS measures'
+
         if isinstance(data, str) and data == 'auto':
             # open SLC data as real intensities
             data = np.square(np.abs(self.open_data(dates=dates)))
@@ -46,15 +141,33 @@ class Stack_ps(Stack_stl):
             if isinstance(geometry, xr.DataArray):
                 data = data.where(geometry).where(np.isfinite(geometry))
 
-        # normalize image amplitudes (intensities)
-        tqdm_dask(mean := dask.persist(data.mean(dim=['y','x'])), desc='Intensity Normalization')
+        # normalize image amplitudes (intensities) and accumulate the moments of unit-normalized intensities
+        # in the same computation, so the per-date chunks are shared and every SLC chunk is read once
+        stack_average = data.mean(dim=['y','x'])
+        moments = self.ps_moments(data / stack_average)
+        tqdm_dask(result := dask.persist(stack_average, *moments), desc='Intensity Normalization and Moments')
         # dask.persist returns tuple
-        norm = mean[0].mean(dim='date') / mean[0]
-        # compute average and std.dev.
-        stats = (norm * data).pipe(lambda x: (x.mean(dim='date'), x.std(dim='date')))
-        del data, norm
-        ds = xr.merge([stats[0].rename('average'), stats[1].rename('deviation'), mean[0].rename('stack_average')])
-        del stats, mean
+        stack_average, moments = result[0], result[1:]
+        del result, data
+        if previous is not None:
+            for dim in ['y', 'x']:
+                assert np.array_equal(previous[dim].values, moments[0][dim].values), \
+                    f'ERROR: {dim} coordinates are not the same as the saved PS measures'
+            assert not np.any(np.isin(previous.date.values, stack_average.date.values)), \
+                'ERROR: the dates are already included into the saved PS measures'
+            moments = self.ps_moments_merge((previous.moment_count, previous.moment_mean, previous.moment_m2), moments)
+            stack_average = xr.concat([previous.stack_average, stack_average], dim='date')
+        count, mean, m2 = moments
+        del moments
+        # the normalization scale is defined by all the dates
+        scale = stack_average.mean(dim='date')
+        average = scale * mean
+        deviation = scale * np.sqrt(m2 / count)
+        ds = xr.merge([average.rename('average'), deviation.rename('deviation'),
+                       (deviation / average).rename('adi'), stack_average.rename('stack_average'),
+                       count.astype(np.int32).rename('moment_count'),
+                       mean.rename('moment_mean'), m2.rename('moment_m2')])
+        del count, mean, m2, average, deviation, stack_average, previous
         if interactive:
             return ds
         self.save_cube(ds, name, 'Compute Stability Measures')
@@ -88,14 +88,14 @@ class Stack_reframe(Stack_reframe_gmtsar):
         prm = PRM.from_file(old_filename+'.PRM')
         if debug:
             print ('DEBUG: ','geometry', geometry)
-        tmpazi_a = prm.SAT_llt2rat([geometry.coords[0][0],  geometry.coords[0][1],  0], precise=1, debug=debug)[1]
-        tmpazi_b = prm.SAT_llt2rat([geometry.coords[-1][0], geometry.coords[-1][1], 0], precise=1, debug=debug)[1]
+        tmpazi_a = prm.SAT_llt2rat([geometry.coords[0][0],  geometry.coords[0][1],  0], precise=1, engine=self.llt2rat_engine, debug=debug)[1]
+        tmpazi_b = prm.SAT_llt2rat([geometry.coords[-1][0], geometry.coords[-1][1], 0], precise=1, engine=self.llt2rat_engine, debug=debug)[1]
         tmpazi = min(tmpazi_a, tmpazi_b)
         if debug:
             print ('DEBUG: ','tmpazi', tmpazi)
         prm.shift_atime(tmpazi, inplace=True).update()
-        azi_a = prm.SAT_llt2rat([geometry.coords[0][0], geometry.coords[0][1], 0], precise=1, debug=debug)[1] + tmpazi
-        azi_b = prm.SAT_llt2rat([geometry.coords[-1][0], geometry.coords[-1][1], 0], precise=1, debug=debug)[1] + tmpazi
+        azi_a = prm.SAT_llt2rat([geometry.coords[0][0], geometry.coords[0][1], 0], precise=1, engine=self.llt2rat_engine, debug=debug)[1] + tmpazi
+        azi_b = prm.SAT_llt2rat([geometry.coords[-1][0], geometry.coords[-1][1], 0], precise=1, engine=self.llt2rat_engine, debug=debug)[1] + tmpazi
         # reorder boundaries for orbit
         azi1 = min(azi_a, azi_b)
         azi2 = max(azi_a, azi_b)
@@ -345,3 +345,5 @@ class Stack_reframe(Stack_reframe_gmtsar):
             counter += len(chunk)
 
         self.df = pd.concat(records)
+        # the PRM files are rewritten
+        self.prm_cache_clear()
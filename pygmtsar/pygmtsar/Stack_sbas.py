@@ -48,7 +48,7 @@ class Stack_sbas(Stack_detrend):
 
         return df
 
-    def sbas_pairs(self, days=None, meters=None, invert=False, dates=None):
+    def sbas_pairs(self, days=None, meters=None, invert=False, dates=None, n_jobs=-1):
         """
         Generates a sorted list of baseline pairs based on specified temporal and spatial criteria.
     
@@ -64,6 +64,8 @@ class Stack_sbas(Stack_detrend):
             Maximum spatial separation between image pairs in meters (default is None).
         invert : bool, optional
             If True, invert the order of reference and repeat images (default is False).
+        n_jobs : int, optional
+            Number of parallel SAT_baseline calls for baseline_engine='gmtsar' (default is -1, which means using all available cores).
     
         Returns
         -------
@@ -88,14 +90,22 @@ class Stack_sbas(Stack_detrend):
             baseline components for each image.
             """
             import pandas as pd
-            import numpy as np
-    
+            import joblib
+
             prm_ref = self.PRM_merged()
-            data = []
-            for date in dates:
+            if self.baseline_engine == 'numpy':
+                # all the baselines computed in-process from the LED orbits
+                BPL, BPR = prm_ref.get_baselines([self.PRM_merged(date) for date in dates]).T
+                df = pd.DataFrame({'date': list(dates), 'BPL': BPL, 'BPR': BPR}).set_index('date')
+                df.index = pd.DatetimeIndex(df.index)
+                return df
+
+            def baseline(date):
                 prm_rep = self.PRM_merged(date)
                 BPL, BPR = prm_ref.SAT_baseline(prm_rep).get('B_parallel', 'B_perpendicular')
-                data.append({'date':date, 'BPL':BPL, 'BPR':BPR})
+                return {'date':date, 'BPL':BPL, 'BPR':BPR}
+            # threads are enough to run SAT_baseline processes in parallel
+            data = joblib.Parallel(n_jobs=n_jobs, backend='threading')(joblib.delayed(baseline)(date) for date in dates)
             df = pd.DataFrame(data).set_index('date')
             df.index = pd.DatetimeIndex(df.index)
             return df
@@ -104,33 +114,53 @@ class Stack_sbas(Stack_detrend):
             dates = self.df.index
     
         tbl = baseline_table(dates)
-        data = []
-        for line1 in tbl.itertuples():
-            counter = 0
-            for line2 in tbl.itertuples():
-                #print (line1, line2)
-                if not (line1.Index < line2.Index and (line2.Index - line1.Index).days < days + 1):
-                    continue
-                if meters is not None and not (abs(line1.BPR - line2.BPR)< meters + 1):
-                    continue
-    
-                counter += 1
-                if not invert:
-                    data.append({'ref':line1.Index, 'rep': line2.Index,
-                                 'ref_baseline': np.round(line1.BPR, 2),
-                                 'rep_baseline': np.round(line2.BPR, 2)})
-                else:
-                    data.append({'ref':line2.Index, 'rep': line1.Index,
-                                 'ref_baseline': np.round(line2.BPR, 2),
-                                 'rep_baseline': np.round(line1.BPR, 2)})
-    
-        assert len(data) > 0, 'ERROR: No baseline pairs exist for the specified parameters'
-        df = pd.DataFrame(data).sort_values(['ref', 'rep'])
+        # broadcast time and baseline difference matrices for all the date pairs
+        times = tbl.index.values
+        bprs = tbl.BPR.values
+        durations = (times[None,:] - times[:,None]) // np.timedelta64(1, 'D')
+        mask = (times[:,None] < times[None,:]) & (durations < days + 1)
+        if meters is not None:
+            mask &= np.abs(bprs[:,None] - bprs[None,:]) < meters + 1
+        # the same pairs order as the nested loops
+        idx1, idx2 = np.nonzero(mask)
+        if invert:
+            idx1, idx2 = idx2, idx1
+
+        assert len(idx1) > 0, 'ERROR: No baseline pairs exist for the specified parameters'
+        df = pd.DataFrame({'ref': tbl.index[idx1], 'rep': tbl.index[idx2],
+                           'ref_baseline': np.round(bprs[idx1], 2),
+                           'rep_baseline': np.round(bprs[idx2], 2)}).sort_values(['ref', 'rep'])
         return df.assign(pair=[f'{ref} {rep}' for ref, rep in zip(df['ref'].dt.date, df['rep'].dt.date)],
                          baseline=df.rep_baseline - df.ref_baseline,
                          duration=(df['rep'] - df['ref']).dt.days,
                          rel=np.datetime64('nat'))
 
+    def sbas_pairs_new(self, pairs, days=None, meters=None, invert=False, dates=None, n_jobs=-1):
+        """
+        Generates the baseline pairs which are not included into the existing pairs list.
+
+        This function is intended for incremental processing when a new scene is added to the stack:
+        only the new pairs need to be processed and appended to the normal equations by Stack.lstsq_normal_update().
+
+        Parameters
+        ----------
+        pairs : pandas.DataFrame or xarray object
+            The existing pairs.
+        days, meters, invert, dates, n_jobs
+            See sbas_pairs().
+
+        Returns
+        -------
+        pandas.DataFrame
+            A DataFrame containing the new baseline pairs in the sbas_pairs() format.
+        """
+        pairs = self.get_pairs(pairs)
+        keys = set(zip(pairs['ref'], pairs['rep']))
+        df = self.sbas_pairs(days=days, meters=meters, invert=invert, dates=dates, n_jobs=n_jobs)
+        df = df[[key not in keys for key in zip(df['ref'], df['rep'])]]
+        assert len(df) > 0, 'ERROR: No new baseline pairs exist for the specified parameters'
+        return df
+
     def sbas_pairs_extend(self, pairs):
         import pandas as pd
         import numpy as np
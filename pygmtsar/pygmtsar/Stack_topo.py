@@ -89,36 +89,17 @@ class Stack_topo(Stack_trans_inv):
         if grid is not None:
             topo = utils.interp2d_like(topo, grid, method=method)
 
-        # calculate the combined earth curvature and topography correction
-        def calc_drho(rho, topo, earth_radius, height, b, alpha, Bx):
-            sina = np.sin(alpha)
-            cosa = np.cos(alpha)
-            c = earth_radius + height
-            # compute the look angle using equation (C26) in Appendix C
-            # GMTSAR uses long double here
-            #ret = earth_radius + topo.astype(np.longdouble)
-            ret = earth_radius + topo
-            cost = ((rho**2 + c**2 - ret**2) / (2. * rho * c))
-            #if (cost >= 1.)
-            #    die("calc_drho", "cost >= 0");
-            sint = np.sqrt(1. - cost**2)
-            # Compute the offset effect from non-parallel orbit
-            term1 = rho**2 + b**2 - 2 * rho * b * (sint * cosa - cost * sina) - Bx**2
-            drho = -rho + np.sqrt(term1)
-            del term1, sint, cost, ret, c, cosa, sina
-            return drho
-            
-        #def block_phase(prm1, prm2, ylim, xlim):
-        def block_phase_dask(block_topo, y_chunk, x_chunk, prm1, prm2):
+        # the combined earth curvature and topography correction is calculated for every date relative to
+        # the reference scene geometry as the slant range from the date orbit r = rho + drho(reference, date)
+        # and the pair correction is the ranges difference with the pair along-track offset Bx:
+        # drho(ref, rep) = -r(ref) + sqrt(r(rep)**2 - (Bx(rep) - Bx(ref))**2)
+        # this way, the baselines and the per-pixel range geometry are computed O(dates) times instead of O(pairs)
+
+        # calculate the reference scene range geometry for the block (slant range, look angle cosine and sine)
+        def block_geometry_dask(block_topo, y_chunk, x_chunk, prm1):
             from scipy import constants
-            #assert 0, f'block_topo.shape: {block_topo.shape}, {block_topo}'
-            # for 3d processing
-            #block_topo = block_topo[0]
-            #prm1 = prm1[0]
-            #prm2 = prm2[0]
-            
+
             # get full dimensions
-            xdim = prm1.get('num_rng_bins')
             ydim = prm1.get('num_patches') * prm1.get('num_valid_az')
 
             # get heights
@@ -126,17 +107,35 @@ class Stack_topo(Stack_trans_inv):
             ht0 = prm1.get('SC_height_start')
             htf = prm1.get('SC_height_end')
 
+            drange = constants.speed_of_light / (2 * prm1.get('rng_samp_rate'))
+            near_range = (prm1.get('near_range') + \
+                x_chunk.reshape(1,-1) * (1 + prm1.get('stretch_r')) * drange) + \
+                y_chunk.reshape(-1,1) * prm1.get('a_stretch_r') * drange
+
+            # calculate the change in height along the frame, the time span is reduced
+            frac = y_chunk / (ydim - 1)
+            height = ht0 + (-3 * ht0 + 4 * htc - htf) * frac + (2 * ht0 - 4 * htc + 2 * htf) * frac**2
+
+            earth_radius = prm1.get('earth_radius')
+            c = earth_radius + height.reshape(-1, 1)
+            # compute the look angle using equation (C26) in Appendix C
+            # GMTSAR uses long double here
+            #ret = earth_radius + topo.astype(np.longdouble)
+            ret = earth_radius + block_topo
+            cost = ((near_range**2 + c**2 - ret**2) / (2. * near_range * c))
+            #if (cost >= 1.)
+            #    die("calc_drho", "cost >= 0");
+            sint = np.sqrt(1. - cost**2)
+            del c, ret, height, frac
+            return np.stack([near_range, cost, sint])
+
+        # calculate the date baseline model coefficients for normalized time along the frame
+        def baseline_coeffs(prm2):
             # compute the time span and the time spacing
             tspan = 86400 * abs(prm2.get('SC_clock_stop') - prm2.get('SC_clock_start'))
             assert (tspan >= 0.01) and (prm2.get('PRF') >= 0.01), \
                 f"ERROR in sc_clock_start={prm2.get('SC_clock_start')}, sc_clock_stop={prm2.get('SC_clock_stop')}, or PRF={prm2.get('PRF')}"
 
-            # setup the default parameters
-            drange = constants.speed_of_light / (2 * prm2.get('rng_samp_rate'))
-            alpha = prm2.get('alpha_start') * np.pi / 180
-            # a constant that converts drho into a phase shift
-            cnst = -4 * np.pi / prm2.get('radar_wavelength')
-
             # calculate initial baselines
             Bh0 = prm2.get('baseline_start') * np.cos(prm2.get('alpha_start') * np.pi / 180)
             Bv0 = prm2.get('baseline_start') * np.sin(prm2.get('alpha_start') * np.pi / 180)
@@ -146,92 +145,110 @@ class Stack_topo(Stack_trans_inv):
             Bxf = prm2.get('B_offset_end')
 
             # first case is quadratic baseline model, second case is default linear model
+            # the time span is reduced for normalized time
             if prm2.get('baseline_center') != 0 or prm2.get('alpha_center') != 0 or prm2.get('B_offset_center') != 0:
                 Bhc = prm2.get('baseline_center') * np.cos(prm2.get('alpha_center') * np.pi / 180)
                 Bvc = prm2.get('baseline_center') * np.sin(prm2.get('alpha_center') * np.pi / 180)
                 Bxc = prm2.get('B_offset_center')
 
-                dBh = (-3 * Bh0 + 4 * Bhc - Bhf) / tspan
-                dBv = (-3 * Bv0 + 4 * Bvc - Bvf) / tspan
-                ddBh = (2 * Bh0 - 4 * Bhc + 2 * Bhf) / (tspan * tspan)
-                ddBv = (2 * Bv0 - 4 * Bvc + 2 * Bvf) / (tspan * tspan)
+                dBh = (-3 * Bh0 + 4 * Bhc - Bhf)
+                dBv = (-3 * Bv0 + 4 * Bvc - Bvf)
+                ddBh = (2 * Bh0 - 4 * Bhc + 2 * Bhf)
+                ddBv = (2 * Bv0 - 4 * Bvc + 2 * Bvf)
 
-                dBx = (-3 * Bx0 + 4 * Bxc - Bxf) / tspan
-                ddBx = (2 * Bx0 - 4 * Bxc + 2 * Bxf) / (tspan * tspan)
+                dBx = (-3 * Bx0 + 4 * Bxc - Bxf)
+                ddBx = (2 * Bx0 - 4 * Bxc + 2 * Bxf)
             else:
-                dBh = (Bhf - Bh0) / tspan
-                dBv = (Bvf - Bv0) / tspan
-                dBx = (Bxf - Bx0) / tspan
+                dBh = (Bhf - Bh0)
+                dBv = (Bvf - Bv0)
+                dBx = (Bxf - Bx0)
                 ddBh = ddBv = ddBx = 0
+            return np.array([[Bh0, dBh, ddBh], [Bv0, dBv, ddBv], [Bx0, dBx, ddBx]])
 
-            # calculate height increment
-            dht = (-3 * ht0 + 4 * htc - htf) / tspan
-            ddht = (2 * ht0 - 4 * htc + 2 * htf) / (tspan * tspan)
-
-            near_range = (prm1.get('near_range') + \
-                x_chunk.reshape(1,-1) * (1 + prm1.get('stretch_r')) * drange) + \
-                y_chunk.reshape(-1,1) * prm1.get('a_stretch_r') * drange
+        def block_range_dask(block_geometry, y_chunk, ydim, coeffs):
+            rho, cost, sint = block_geometry
 
-            # calculate the change in baseline and height along the frame
-            time = y_chunk * tspan / (ydim - 1)        
-            Bh = Bh0 + dBh * time + ddBh * time**2
-            Bv = Bv0 + dBv * time + ddBv * time**2
-            Bx = Bx0 + dBx * time + ddBx * time**2
+            # calculate the change in baseline along the frame
+            frac = y_chunk / (ydim - 1)
+            Bh, Bv = [(c0 + c1 * frac + c2 * frac**2).reshape(-1, 1) for (c0, c1, c2) in coeffs[:2]]
             B = np.sqrt(Bh * Bh + Bv * Bv)
             alpha = np.arctan2(Bv, Bh)
-            height = ht0 + dht * time + ddht * time**2
 
-            # calculate the combined earth curvature and topography correction
-            drho = calc_drho(near_range, block_topo, prm1.get('earth_radius'),
-                             height.reshape(-1, 1), B.reshape(-1, 1), alpha.reshape(-1, 1), Bx.reshape(-1, 1))
+            # the slant range from the date orbit, the along-track offset is applied for the pair
+            term1 = rho**2 + B**2 - 2 * rho * B * (sint * np.cos(alpha) - cost * np.sin(alpha))
+            del B, alpha, Bv, Bh, frac
+            return np.sqrt(term1)
 
-            phase_shift = np.exp(1j * (cnst * drho))
-            del near_range, drho, height, B, alpha, Bx, Bv, Bh, time
+        def block_phase_dask(block_range_ref, block_range_rep, y_chunk, ydim, coeffs, cnst):
+            # calculate the change in the pair along-track offset along the frame
+            frac = y_chunk / (ydim - 1)
+            c0, c1, c2 = coeffs
+            Bx = (c0 + c1 * frac + c2 * frac**2).reshape(-1, 1)
+
+            # Compute the offset effect from non-parallel orbit
+            drho = -block_range_ref + np.sqrt(block_range_rep**2 - Bx**2)
+            del Bx, frac
 
-            # for 3d processing
-            #return np.expand_dims(phase_shift.astype(np.complex64), 0)
+            phase_shift = np.exp(1j * (cnst * drho))
+            del drho
             return phase_shift.astype(np.complex64)
 
         # immediately prepare PRM
         # here is some delay on the function call but the actual processing is faster
         # define offset once to apply to all the PRMs
         offsets = self.prm_offsets(debug=debug)
-        def prepare_prms(pair, offsets):
-            date1, date2 = pair
-            prm1 = self.PRM_merged(date1, offsets=offsets)
-            prm2 = self.PRM_merged(date2, offsets=offsets)
+        prm1 = self.PRM_merged(self.reference, offsets=offsets)
+        def prepare_prm(date, offsets):
+            prm2 = self.PRM_merged(date, offsets=offsets)
             prm2.set(prm1.SAT_baseline(prm2, tail=9)).fix_aligned()
-            prm1.set(prm1.SAT_baseline(prm1).sel('SC_height','SC_height_start','SC_height_end')).fix_aligned()
-            return (prm1, prm2)
+            return prm2
 
-        prms = joblib.Parallel(n_jobs=-1)(joblib.delayed(prepare_prms)(pair, offsets) for pair in pairs)
+        # the geometry cache: a single SAT_baseline call and the baseline model for every date
+        prm2s = joblib.Parallel(n_jobs=-1)(joblib.delayed(prepare_prm)(date, offsets) for date in dates)
+        coeffs = {date: baseline_coeffs(prm2) for (date, prm2) in zip(dates, prm2s)}
+        prm1.set(prm1.SAT_baseline(prm1).sel('SC_height','SC_height_start','SC_height_end')).fix_aligned()
 
         # fill NaNs by 0 and expand to 3d
         topo2d = da.where(da.isnan(topo.data), 0, topo.data)
 
-        # for 3d processing
-        # topo3d = da.repeat(da.expand_dims(topo2d, 0), len(pairs), axis=0).rechunk((1, 'auto', 'auto'))
-        # out = da.blockwise(
-        #     block_phase_dask,
-        #     'kyx',
-        #     topo3d, 'kyx',
-        #     topo.y,    'y',
-        #     topo.x,    'x',
-        #     [prm[0] for prm in prms], 'k',
-        #     [prm[1] for prm in prms], 'k',
-        #     dtype=np.complex64,
-        # )
+        # the reference range geometry is shared by all the dates
+        geometry = da.blockwise(
+            block_geometry_dask,
+            'kyx',
+            topo2d, 'yx',
+            topo.y, 'y',
+            topo.x, 'x',
+            new_axes={'k': 3},
+            prm1=prm1,
+            dtype=np.float64
+        )
+
+        ydim = prm1.get('num_patches') * prm1.get('num_valid_az')
+        # float64 precision is required for the slant ranges difference
+        ranges = {date: da.blockwise(
+            block_range_dask,
+            'yx',
+            geometry, 'kyx',
+            topo.y, 'y',
+            concatenate=True,
+            ydim=ydim,
+            coeffs=coeffs[date],
+            dtype=np.float64
+        ) for date in dates}
+        wavelengths = {date: prm2.get('radar_wavelength') for (date, prm2) in zip(dates, prm2s)}
 
         out = da.stack([da.blockwise(
             block_phase_dask,
             'yx',
-            topo2d, 'yx',
+            ranges[ref], 'yx',
+            ranges[rep], 'yx',
             topo.y, 'y',
-            topo.x, 'x',
-            prm1=prm[0],
-            prm2=prm[1],
+            ydim=ydim,
+            coeffs=coeffs[rep][2] - coeffs[ref][2],
+            # a constant that converts drho into a phase shift
+            cnst=-4 * np.pi / wavelengths[rep],
             dtype=np.complex64
-        ) for prm in prms], axis=0)
+        ) for (ref, rep) in pairs], axis=0)
 
         coord_pair = [' '.join(pair) for pair in pairs]
         coord_ref = xr.DataArray(pd.to_datetime(pairs[:,0]), coords={'pair': coord_pair})
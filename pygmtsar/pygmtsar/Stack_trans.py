@@ -100,11 +100,12 @@ class Stack_trans(Stack_align):
         coarsen = self.get_coarsen(coarsen)
 
         prm = self.PRM_merged()
+        engine = self.llt2rat_engine
         def SAT_llt2rat(lats, lons, zs):
             # for binary=True values outside of the scene missed and the array is not complete
             # 4th and 5th coordinates are the same as input lat, lon
             return prm.SAT_llt2rat(np.column_stack([lons, lats, zs]),
-                                        precise=1, binary=False)\
+                                        precise=1, binary=False, engine=engine)\
                            .astype(np.float32).reshape(zs.size, 5)[...,:3]
 
         # exclude latitude and longitude columns as redundant
@@ -166,7 +167,8 @@ class Stack_trans(Stack_align):
             # transform to separate variables, round for better compression
             trans = xr.Dataset({val: xr.DataArray(rae[key],
                             coords={'lat': lats,'lon': lons}) for (key, val) in llt2rat_map.items()})
-            encoding = {vn: self._compression(trans[vn].shape, chunksize=self.netcdf_chunksize) for vn in trans.data_vars}
+            trans = self.netcdf_quantize(trans, 'trans')
+            encoding = {vn: self._compression(trans[vn].shape, chunksize=self.netcdf_chunksize, profile='trans') for vn in trans.data_vars}
             if os.path.exists(filename):
                 os.remove(filename)
             trans.to_netcdf(filename, encoding=encoding, engine=self.netcdf_engine)
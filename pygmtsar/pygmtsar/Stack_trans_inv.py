@@ -33,7 +33,7 @@ class Stack_trans_inv(Stack_trans):
         """
         return self.open_cube('trans_inv')
 
-    def compute_trans_inv(self, coarsen, trans='auto', interactive=False):
+    def compute_trans_inv(self, coarsen, trans='auto', tile=4, workers=1, interactive=False):
         """
         Retrieve or calculate the transform data. This transform data is then saved as
             a NetCDF file for future use.
@@ -45,6 +45,11 @@ class Stack_trans_inv(Stack_trans):
         ----------
         coarsen(jdec, idec) : (int, int) , optional
             The decimation factor in the azimuth and range direction. Default is 2.
+        tile : int, optional
+            The number of output blocks per tile side. The spatial index is built once per tile and shared
+            read-only by all the tile blocks queries. Use tile=1 to build the index for every block. Default is 4.
+        workers : int, optional
+            The number of threads for every block index query, -1 means all the available CPU cores. Default is 1.
         interactive : bool, optional
             If True, the computation will be performed interactively and the result will be returned as a delayed object.
             Default is False.
@@ -61,12 +66,13 @@ class Stack_trans_inv(Stack_trans):
         import warnings
         warnings.filterwarnings('ignore')
 
+        assert tile >= 1, 'ERROR: tile should be positive integer'
         # convert meters or pixels to radar pixels
         coarsen = self.get_coarsen(coarsen)
         # define maximum search radius, radar pixels
         tolerance = 2 * max(coarsen)
 
-        def trans_inv_block(azis, rngs, tolerance, chunksize):
+        def trans_inv_tree(azis, rngs, chunksize):
             from scipy.spatial import cKDTree
             # disable "distributed.utils_perf - WARNING - full garbage collections ..."
             try:
@@ -79,8 +85,8 @@ class Stack_trans_inv(Stack_trans):
             warnings.filterwarnings('ignore')
 
             # required one delta around for nearest interpolation and two for linear
-            dazi = np.diff(azis)[0]
-            drng = np.diff(rngs)[0]
+            dazi = np.diff(azis)[0] if azis.size > 1 else 1
+            drng = np.diff(rngs)[0] if rngs.size > 1 else 1
             azis_min = azis.min() - dazi
             azis_max = azis.max() + dazi
             rngs_min = rngs.min() - drng
@@ -90,14 +96,13 @@ class Stack_trans_inv(Stack_trans):
 
             # define valid coordinate blocks 
             block_mask = ((trans_amin<=azis_max)&(trans_amax>=azis_min)&(trans_rmin<=rngs_max)&(trans_rmax>=rngs_min)).values
-            block_azi, block_rng = trans_amin.shape
-            blocks_ys, blocks_xs = np.meshgrid(range(block_azi), range(block_rng), indexing='ij')
-            #assert 0, f'blocks_ys, blocks_xs: {blocks_ys[block_mask]}, {blocks_xs[block_mask]}'
+            blocks_ys, blocks_xs = np.nonzero(block_mask)
+            #assert 0, f'blocks_ys, blocks_xs: {blocks_ys}, {blocks_xs}'
             # extract valid coordinates from the defined blocks
             blocks_trans = []
             blocks_lt = []
             blocks_ll = []
-            for block_y, block_x in zip(blocks_ys[block_mask], blocks_xs[block_mask]):
+            for block_y, block_x in zip(blocks_ys, blocks_xs):
                 # coordinates
                 block_lt, block_ll = [block.ravel() for block in np.meshgrid(lt_blocks[block_y], ll_blocks[block_x], indexing='ij')]
                 # variables
@@ -114,14 +119,11 @@ class Stack_trans_inv(Stack_trans):
                     blocks_ll.append(block_ll[mask])
                     blocks_trans.append(block_trans[:,mask])
                 del block_lt, block_ll, block_trans, mask
-            del block_mask, block_azi, block_rng, blocks_ys, blocks_xs
+            del block_mask, blocks_ys, blocks_xs
 
             if len(blocks_lt) == 0:
                 # this case is possible when DEM is incomplete, and it is not an error
-                return np.nan * np.zeros((3, azis.size, rngs.size), np.float32)
-
-            # TEST
-            #return np.nan * np.zeros((3, azis.size, rngs.size), np.float32)
+                return None
 
             # valid coordinates
             block_lt = np.concatenate(blocks_lt)
@@ -129,28 +131,36 @@ class Stack_trans_inv(Stack_trans):
             block_trans = np.concatenate(blocks_trans, axis=1)
             del blocks_lt, blocks_ll, blocks_trans
 
+            # build the index on radar coordinates for the nearest geographic coordinates grid pixel search
+            tree = cKDTree(np.column_stack([block_trans[0], block_trans[1]]), compact_nodes=False, balanced_tree=False)
+            # the tree and the variables are shared read-only by all the tile blocks
+            return (tree, np.asarray([block_lt, block_ll, block_trans[2]]))
+
+        def trans_inv_block(tile_tree, azis, rngs, tolerance):
+            import warnings
+            warnings.filterwarnings('ignore')
+
+            if tile_tree is None:
+                # this case is possible when DEM is incomplete, and it is not an error
+                return np.nan * np.zeros((3, azis.size, rngs.size), np.float32)
+            tree, block_vars = tile_tree
+
             # perform index search on radar coordinate grid for the nearest geographic coordinates grid pixel
             grid_azi, grid_rng = np.meshgrid(azis, rngs, indexing='ij')
-            tree = cKDTree(np.column_stack([block_trans[0], block_trans[1]]), compact_nodes=False, balanced_tree=False)
-            distances, indices = tree.query(np.column_stack([grid_azi.ravel(), grid_rng.ravel()]), k=1, workers=1)
-            del grid_azi, grid_rng, tree, cKDTree
+            distances, indices = tree.query(np.column_stack([grid_azi.ravel(), grid_rng.ravel()]), k=1,
+                                            distance_upper_bound=np.nextafter(tolerance, np.inf), workers=workers)
+            del grid_azi, grid_rng, tree
+            #print ('distance range', distances.min().round(2), distances.max().round(2))
 
             # take the nearest pixels coordinates and elevation
             # the only one index search is required to define all the output variables
-            grid_lt = block_lt[indices]
-            grid_lt[distances>tolerance] = np.nan
-            del block_lt
-            grid_ll = block_ll[indices]
-            grid_ll[distances>tolerance] = np.nan
-            del block_ll
-            grid_ele = block_trans[2][indices]
-            grid_ele[distances>tolerance] = np.nan
-            #print ('distance range', distances.min().round(2), distances.max().round(2))
-            #assert distances.max() < 2, f'Unexpectedly large distance between radar and geographic coordinate grid pixels (>=2): {distances.max()}'
-            del block_trans, indices, distances
+            mask = distances<=tolerance
+            grid = np.full((3, indices.size), np.nan, dtype=block_vars.dtype)
+            grid[:, mask] = block_vars[:, indices[mask]]
+            del block_vars, indices, distances, mask
 
             # pack all the outputs into one 3D array
-            return np.asarray([grid_lt, grid_ll, grid_ele]).reshape((3, azis.size, rngs.size))
+            return grid.reshape((3, azis.size, rngs.size))
 
         if isinstance(trans, str) and trans == 'auto':
             # trans.dat - file generated by llt_grid2rat (r a topo lon lat)"
@@ -184,16 +194,25 @@ class Stack_trans_inv(Stack_trans):
         #print ('azis_blocks.size', len(azis_blocks), 'rngs_blocks.size', len(rngs_blocks))
 
         blocks_total = []
-        for azis_block in azis_blocks:
-            blocks = []
-            for rngs_block in rngs_blocks:
-                block = dask.array.from_delayed(dask.delayed(trans_inv_block, traverse=False)
-                                               (azis_block, rngs_block, tolerance, self.netcdf_chunksize),
-                                               shape=(3, azis_block.size, rngs_block.size), dtype=np.float32)
-                blocks.append(block)
-                del block
-            blocks_total.append(blocks)
-            del blocks
+        for tile_y in range(0, len(azis_blocks), tile):
+            tile_azis_blocks = azis_blocks[tile_y:tile_y+tile]
+            tile_blocks_total = [[] for _ in tile_azis_blocks]
+            for tile_x in range(0, len(rngs_blocks), tile):
+                tile_rngs_blocks = rngs_blocks[tile_x:tile_x+tile]
+                # build the tile index once for all the tile blocks
+                tile_tree = dask.delayed(trans_inv_tree, traverse=False)(np.concatenate(tile_azis_blocks),
+                                                                         np.concatenate(tile_rngs_blocks),
+                                                                         self.netcdf_chunksize)
+                for blocks, azis_block in zip(tile_blocks_total, tile_azis_blocks):
+                    for rngs_block in tile_rngs_blocks:
+                        block = dask.array.from_delayed(dask.delayed(trans_inv_block, traverse=False)
+                                                       (tile_tree, azis_block, rngs_block, tolerance),
+                                                       shape=(3, azis_block.size, rngs_block.size), dtype=np.float32)
+                        blocks.append(block)
+                        del block
+                del tile_tree, tile_rngs_blocks
+            blocks_total.extend(tile_blocks_total)
+            del tile_blocks_total, tile_azis_blocks
 
         trans_inv_dask = dask.array.block(blocks_total)
         del blocks_total
@@ -9,7 +9,7 @@
 # ----------------------------------------------------------------------------
 from .Stack_unwrap_snaphu import Stack_unwrap_snaphu
 # required for function decorators
-from numba import jit
+from numba import jit, prange
 # import directive is not compatible to numba
 import numpy as np
 
@@ -387,6 +387,140 @@ class Stack_unwrap(Stack_unwrap_snaphu):
         #out[~nanmask] = np.where(mask[~nanmask], buffer[~nanmask], np.nan)
         return out
 
+    @staticmethod
+    def unwrap_pairs_incidence(matrix):
+        """
+        Precompute the pairs incidence structure for unwrap_pairs_kernel().
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray
+            The pairs to dates matrix as returned by unwrap_matrix().
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The single pairs incidence matrix (one row and one column for every pair), the number of dates
+            for every pair and the sorted unique numbers of dates.
+        """
+        import numpy as np
+
+        matrix = np.asarray(matrix)
+        columns = (matrix == 1)
+        # the pair dates covered by the other pairs
+        covered = (matrix >= 1).astype(np.int64) @ columns.T.astype(np.int64)
+        # the other pairs dates outside of the pair
+        outside = (matrix == 1).astype(np.int64) @ (~columns).T.astype(np.int64)
+        # row index is the single pair and column index is the compound pair
+        singles = ((covered == 1) & (outside == 0)).T.copy()
+        pair_sum = matrix.sum(axis=1).astype(np.int64)
+        return singles, pair_sum, np.unique(pair_sum)
+
+    @staticmethod
+    @jit(nopython=True, nogil=True, parallel=True)
+    def unwrap_pairs_kernel(data      : np.ndarray,
+                            weight    : np.ndarray,
+                            singles   : np.ndarray,
+                            pair_sum  : np.ndarray,
+                            groups    : np.ndarray,
+                            tolerance : np.float32 = np.pi/2) -> np.ndarray:
+        """
+        Unwrap all the pixels of 2D block (one row for every pixel and one column for every pair) at once
+        the same way as unwrap_pairs() using the precomputed pairs incidence (see unwrap_pairs_incidence()).
+        """
+        npixels, npairs = data.shape
+        out = np.full((npixels, npairs), np.nan, dtype=np.float32)
+        for idx in prange(npixels):
+            # the buffer variable will be modified
+            # buffer datatype is the same as input data datatype
+            buffer = data[idx].copy()
+            valid = ~np.isnan(buffer)
+            if weight.size != 0:
+                pixel_weight = weight[idx].copy()
+                valid = valid & ~np.isnan(pixel_weight)
+            else:
+                pixel_weight = np.empty(0, dtype=np.float32)
+            if not np.any(valid):
+                # no valid input data
+                continue
+
+            # processed pairs
+            pairs_ok = np.zeros(npairs, dtype=np.bool_)
+            jump = 0
+            for step in range(3):
+                # the lowest number of dates for the valid pairs is skipped
+                first = True
+                for ndate in groups:
+                    pair_idxs = np.where((pair_sum==ndate)&valid)[0]
+                    if pair_idxs.size == 0:
+                        continue
+                    if first:
+                        first = False
+                        continue
+                    if pixel_weight.size != 0:
+                        # get the sorted order for the specific weights corresponding to pair_idxs
+                        pair_idxs_order = np.argsort(pixel_weight[pair_idxs])[::-1]
+                        pair_idxs = pair_idxs[pair_idxs_order]
+                    for pair_idx in pair_idxs:
+                        if step > 0 and pairs_ok[pair_idx]:
+                            continue
+                        matching_rows = singles[pair_idx] & valid
+                        if step == 1 and np.any(matching_rows & ~pairs_ok):
+                            # some of single-pairs requires unwrapping, miss the compound segment processing
+                            continue
+                        value = buffer[pair_idx]
+                        values_sum = 0.0
+                        for row in range(npairs):
+                            if matching_rows[row]:
+                                values_sum += buffer[row]
+                        if step == 0:
+                            # check all compound pairs vs single pairs: only detect all not wrapped
+                            jump = int(np.round((values_sum - value) / (2*np.pi)))
+                            if jump == 0 and abs(value - values_sum) < tolerance:
+                                pairs_ok[pair_idx] = True
+                                pairs_ok |= matching_rows
+                        elif step == 1:
+                            # check all compound pairs vs single pairs: fix wrapped compound using not wrapped singles only
+                            jump = int(np.round((values_sum - value) / (2*np.pi)))
+                            buffer[pair_idx] += 2*np.pi*jump
+                            if abs(buffer[pair_idx] - values_sum) < tolerance:
+                                pairs_ok[pair_idx] = True
+                        else:
+                            # check all compound pairs vs single pairs: complete pairs_ok always when possible
+                            # the latest defined jump is applied like to unwrap_pairs()
+                            buffer[pair_idx] += 2*np.pi*jump
+                            if abs(buffer[pair_idx] - values_sum) < tolerance:
+                                pairs_ok[pair_idx] = True
+                                pairs_ok |= matching_rows
+
+            if not np.any(pairs_ok):
+                # return original values when unwrapping is not possible at all
+                for pair_idx in range(npairs):
+                    if valid[pair_idx]:
+                        out[idx, pair_idx] = buffer[pair_idx]
+                continue
+            # return unwrapped values
+            for pair_idx in range(npairs):
+                if valid[pair_idx] and pairs_ok[pair_idx]:
+                    out[idx, pair_idx] = buffer[pair_idx]
+        return out
+
+    @staticmethod
+    def unwrap_pairs_block(data, weight=None, singles=None, pair_sum=None, groups=None, tolerance=np.pi/2):
+        """
+        Unwrap N-dimensional block with the last pairs dimension using unwrap_pairs_kernel().
+        """
+        import numpy as np
+
+        shape = data.shape
+        data = np.ascontiguousarray(data.reshape(-1, shape[-1]))
+        if weight is None:
+            weight = np.empty((0, 0), dtype=np.float32)
+        else:
+            weight = np.ascontiguousarray(weight.reshape(-1, shape[-1]))
+        out = Stack_unwrap.unwrap_pairs_kernel(data, weight, singles, pair_sum, groups, tolerance)
+        return out.reshape(shape)
+
     def unwrap_matrix(self, pairs):
         """
         Create a matrix for use in the least squares computation based on interferogram date pairs.
@@ -414,6 +548,8 @@ class Stack_unwrap(Stack_unwrap_snaphu):
 
         pairs = self.get_pairs(data)
         matrix = self.unwrap_matrix(pairs)
+        # the pairs incidence structure is the same for all the pixels
+        singles, pair_sum, groups = self.unwrap_pairs_incidence(matrix)
     
         if not 'stack' in data.dims:
             chunks_z, chunks_y, chunks_x = data.chunks if data.chunks is not None else np.inf, np.inf, np.inf
@@ -448,21 +584,26 @@ class Stack_unwrap(Stack_unwrap_snaphu):
             # add weight to the arguments
             args.append(weight.chunk(chunks))
         model = xr.apply_ufunc(
-            self.unwrap_pairs,
+            self.unwrap_pairs_block,
             *args,
             dask='parallelized',
-            vectorize=True,
             input_core_dims=input_core_dims,
             output_core_dims=[['pair']],
             output_dtypes=[np.float32],
-            kwargs={'matrix': matrix, 'tolerance': tolerance}
+            kwargs={'singles': singles, 'pair_sum': pair_sum, 'groups': groups, 'tolerance': tolerance}
         ).transpose('pair',...)
         del args
     
         return model.rename('unwrap')
 
-    def unwrap_snaphu(self, phase, weight=None, conf=None, conncomp=False):
+    def unwrap_snaphu(self, phase, weight=None, conf=None, conncomp=False, timeout=None, n_jobs='auto'):
         """
+        Unwrap phase grid or stack of grids using SNAPHU.
+
+        The stack pairs are unwrapped by the bounded pool of SNAPHU processes in every worker process.
+        The pool size is defined by the worker process threads and memory (see snaphu_workers method)
+        when n_jobs='auto'. The phase and weight inputs are computed as the regular task dependencies.
+
         Limit number of processes for tiled multicore SNAPHU configuration:
         with dask.config.set(scheduler='single-threaded'):
             stack.unwrap2d_snaphu()...).phase.compute()
@@ -486,29 +627,44 @@ class Stack_unwrap(Stack_unwrap_snaphu):
         if weight is not None:
             assert phase.shape == weight.shape, 'ERROR: phase and weight variables have different shape'
 
-        def _snaphu(ind):
-            ds = self.snaphu(self.wrap(phase.isel({stackvar: ind}) if stackvar is not None else phase),
-                             weight.isel({stackvar: ind})  if stackvar is not None and weight is not None else weight,
-                             conf=conf, conncomp=conncomp)
+        if conf is None:
+            conf = self.snaphu_config()
+        shape = phase.shape[1:] if stackvar is not None else phase.shape
+
+        def _snaphu(phase_block, weight_block):
+            # wait for the free SNAPHU process slot in the pool defined once on the worker process
+            with self.snaphu_semaphore(n_jobs, shape, conf):
+                unwrap, conn, _ = self.snaphu_block(phase_block, weight_block, conf,
+                                                    conncomp=conncomp, timeout=timeout)
+            if unwrap is None:
+                # return the same data structure as expected but NaN-filled
+                unwrap = np.full(phase_block.shape, np.nan, dtype=np.float32)
+                conn = np.full(phase_block.shape, np.nan, dtype=np.float32)
             if conncomp:
                 # # select the largest connected component
-#                 hist = np.unique(ds.conncomp.values, return_counts=True)
+#                 hist = np.unique(conn, return_counts=True)
 #                 idxmax = np.argmax(hist[1])
 #                 valmax = hist[0][idxmax]
 #                 # select unwrap phase for the largest connected area
-#                 return np.stack([ds.phase.where(ds.conncomp==valmax).values, ds.conncomp.values])
-                return np.stack([ds.phase.values, ds.conncomp.values])
-            return ds.phase.values[None,]
+#                 return np.stack([np.where(conn==valmax, unwrap, np.nan), conn])
+                return np.stack([unwrap, conn.astype(np.float32)])
+            return unwrap[None,]
+
+        # the inputs are computed as the task dependencies without nested computations
+        phase_wrap = self.wrap(phase).data
+        weight_data = weight.data if weight is not None else None
 
         stack =[]
         for ind in range(len(phase) if stackvar is not None else 1):
-            block = dask.array.from_delayed(dask.delayed(_snaphu)(ind),
-                        shape=(2 if conncomp else 1, *(phase.shape[1:] if stackvar is not None else phase.shape)),
+            phase_block = phase_wrap[ind] if stackvar is not None else phase_wrap
+            weight_block = weight_data[ind] if stackvar is not None and weight is not None else weight_data
+            block = dask.array.from_delayed(dask.delayed(_snaphu)(phase_block, weight_block),
+                        shape=(2 if conncomp else 1, *shape),
                         dtype=np.float32)
             stack.append(block)
-            del block
+            del block, phase_block, weight_block
         dask_block = dask.array.concatenate(stack)
-        del stack
+        del stack, phase_wrap, weight_data
         if stackvar is not None:
             ds = xr.merge([xr.DataArray(dask_block[idx::2 if conncomp else 1], coords=phase.coords).rename(keys[idx])
                                for idx in range(2 if conncomp else 1)])
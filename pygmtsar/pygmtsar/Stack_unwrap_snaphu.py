@@ -8,19 +8,221 @@
 # Licensed under the BSD 3-Clause License (see LICENSE for details)
 # ----------------------------------------------------------------------------
 from .Stack_landmask import Stack_landmask
+# required for the class attribute
+import threading
 
 class Stack_unwrap_snaphu(Stack_landmask):
 
+    # bounded SNAPHU processes pool per worker process as process id: (pool size, semaphore)
+    snaphu_semaphores = {}
+    snaphu_lock = threading.Lock()
+    # estimated SNAPHU memory usage per pixel, bytes
+    snaphu_pixel_memory = 64
+
+    @staticmethod
+    def snaphu_tmpdir():
+        """
+        Return RAM-backed directory for SNAPHU temporary files when available, or system temporary directory otherwise.
+        """
+        import os
+        import tempfile
+
+        if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+            return '/dev/shm'
+        return tempfile.gettempdir()
+
+    def snaphu_workers(self, shape, conf=None):
+        """
+        Define the number of simultaneously running SNAPHU processes.
+
+        The number is limited by the CPU cores divided by SNAPHU NPROC (tiled processing threads)
+        and by the memory divided by the estimated memory usage for the grid shape.
+        Inside a Dask worker process the worker threads and the worker memory limit are used
+        because the limit is enforced per process (see snaphu_semaphore method), otherwise
+        the machine-wide CPU cores and available memory are used.
+
+        Parameters
+        ----------
+        shape : tuple
+            2D grid shape.
+        conf : str, optional
+            The SNAPHU configuration string, default is None (use snaphu_config method).
+
+        Returns
+        -------
+        int
+            The number of SNAPHU processes.
+        """
+        import numpy as np
+        import joblib
+        import psutil
+        from dask.distributed import get_worker
+
+        if conf is None:
+            conf = self.snaphu_config()
+        nprocs = [int(line.split()[1]) for line in conf.split('\n')
+                  if len(line.split()) >= 2 and line.split()[0] == 'NPROC']
+        nproc = max(nprocs[-1] if len(nprocs) else 1, 1)
+
+        n_threads = joblib.cpu_count()
+        memory = psutil.virtual_memory().available
+        try:
+            # the worker process resources on Dask distributed cluster
+            worker = get_worker()
+            n_threads = worker.state.nthreads
+            if worker.memory_manager.memory_limit:
+                memory = min(memory, worker.memory_manager.memory_limit)
+        except ValueError:
+            # not in a Dask worker, use the machine resources
+            pass
+        n_cpu = max(n_threads // nproc, 1)
+        n_mem = int(memory // (self.snaphu_pixel_memory * np.prod(shape)))
+        return max(min(n_cpu, n_mem), 1)
+
+    def snaphu_semaphore(self, n_jobs='auto', shape=None, conf=None):
+        """
+        Return the SNAPHU processes pool semaphore shared by all the tasks of the worker process.
+
+        The single semaphore is defined per process on the first use and the pool size for n_jobs='auto'
+        is calculated once (see snaphu_workers method), so the running SNAPHU processes do not change it.
+        The explicit n_jobs value different from the current pool size defines the new pool.
+
+        Parameters
+        ----------
+        n_jobs : int or str, optional
+            The pool size or 'auto'. Default is 'auto'.
+        shape : tuple, optional
+            2D grid shape for n_jobs='auto'.
+        conf : str, optional
+            The SNAPHU configuration string for n_jobs='auto'.
+
+        Returns
+        -------
+        threading.BoundedSemaphore
+            The worker process semaphore.
+        """
+        import os
+        import threading
+
+        with Stack_unwrap_snaphu.snaphu_lock:
+            pool = Stack_unwrap_snaphu.snaphu_semaphores.get(os.getpid())
+            if pool is None or (not isinstance(n_jobs, str) and pool[0] != n_jobs):
+                if isinstance(n_jobs, str) and n_jobs == 'auto':
+                    n_jobs = self.snaphu_workers(shape, conf)
+                pool = (n_jobs, threading.BoundedSemaphore(n_jobs))
+                Stack_unwrap_snaphu.snaphu_semaphores[os.getpid()] = pool
+            return pool[1]
+
+    @staticmethod
+    def snaphu_block(phase, corr, conf, conncomp=False, timeout=None, tmpdir=None, debug=False):
+        """
+        Unwrap 2D phase array using SNAPHU with temporary files in the RAM-backed directory.
+
+        Parameters
+        ----------
+        phase : numpy.ndarray
+            The wrapped phase, NaN values are masked.
+        corr : numpy.ndarray or None
+            The correlation.
+        conf : str
+            The SNAPHU configuration string.
+        conncomp : bool, optional
+            If True, return connection components map, default is False.
+        timeout : float, optional
+            SNAPHU process timeout in seconds, default is None (no timeout).
+        tmpdir : str, optional
+            The directory for temporary files, default is None (use snaphu_tmpdir method).
+        debug : bool, optional
+            If True, print debugging information during the unwrapping process, default is False.
+
+        Returns
+        -------
+        tuple
+            The unwrapped phase or None, the connected components or None, and the processing log.
+        """
+        import numpy as np
+        import os
+        import shutil
+        import subprocess
+        import tempfile
+
+        if tmpdir is None:
+            tmpdir = Stack_unwrap_snaphu.snaphu_tmpdir()
+        # all the temporary files and SNAPHU tiles are placed into unique processing directory
+        basedir = tempfile.mkdtemp(prefix='snaphu_', dir=tmpdir)
+        try:
+            # set unique processing subdirectory
+            conf += f'    TILEDIR {os.path.join(basedir, "tiledir")}'
+            # SNAPHU input files
+            phase_in = os.path.join(basedir, 'phase')
+            corr_in = os.path.join(basedir, 'corr')
+            mask_in = os.path.join(basedir, 'bytemask')
+            # SNAPHU output files
+            unwrap_out = os.path.join(basedir, 'unwrap.out')
+            conncomp_out = os.path.join(basedir, 'conncomp.out')
+
+            # prepare SNAPHU input files
+            # NaN values are not allowed for SNAPHU phase input file
+            nanmask = np.isnan(phase)
+            np.where(nanmask, 0, phase).astype(np.float32).tofile(phase_in)
+            # SNAPHU masks out 0 and uses only valid pixels with mask 1
+            (~nanmask).astype(np.ubyte).tofile(mask_in)
+            if corr is not None:
+                # NaN values are not allowed for SNAPHU correlation input file
+                # just fill NaNs by zeroes because the main trick is phase filling
+                np.nan_to_num(corr, nan=0).astype(np.float32).tofile(corr_in)
+
+            # launch SNAPHU binary (NaNs are not allowed for input but returned in output)
+            argv = ['snaphu', phase_in, str(phase.shape[1]), '-M', mask_in, '-f', '/dev/stdin', '-o', unwrap_out, '-d']
+            # output connection componetets map
+            if conncomp:
+                argv.append('-g')
+                argv.append(conncomp_out)
+            # add optional correlation grid
+            if corr is not None:
+                argv.append('-c')
+                argv.append(corr_in)
+            if debug:
+                argv.append('-v')
+                print ('DEBUG: argv', argv)
+            p = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE,
+                                 encoding='utf8', bufsize=10*1000*1000)
+            try:
+                stdout_data, stderr_data = p.communicate(input=conf, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                p.kill()
+                stdout_data, stderr_data = p.communicate()
+                stderr_data += f'\nERROR: SNAPHU process terminated by timeout {timeout} seconds'
+                # the partial outputs are not valid
+                for tmp_file in [unwrap_out, conncomp_out]:
+                    if os.path.exists(tmp_file):
+                        os.remove(tmp_file)
+
+            unwrap = conn = None
+            # check for expected SNAPHU output files
+            if os.path.exists(unwrap_out) and (not conncomp or os.path.exists(conncomp_out)):
+                # revert NaNs in output because SNAPNU does not support them
+                unwrap = np.fromfile(unwrap_out, dtype=np.float32).reshape(phase.shape)
+                unwrap[nanmask] = np.nan
+                if conncomp:
+                    # the connected components from SNAPHU output as is (UCHAR)
+                    conn = np.fromfile(conncomp_out, dtype=np.ubyte).reshape(phase.shape)
+        finally:
+            shutil.rmtree(basedir, ignore_errors=True)
+
+        return (unwrap, conn, stdout_data + '\n' + stderr_data)
+
     # -s for SMOOTH mode and -d for DEFO mode when DEFOMAX_CYCLE should be defined in the configuration
     # DEFO mode (-d) and DEFOMAX_CYCLE=0 is equal to SMOOTH mode (-s)
     # https://web.stanford.edu/group/radar/softwareandlinks/sw/snaphu/snaphu_man1.html
-    def snaphu(self, phase, corr=None, conf=None, conncomp=False, debug=False):
+    def snaphu(self, phase, corr=None, conf=None, conncomp=False, timeout=None, debug=False):
         """
         Unwraps phase using SNAPHU with the given phase and correlation data.
 
         This function unwraps the phase of an interferogram using the Statistical-cost, Network-flow Algorithm
-        for Phase Unwrapping (SNAPHU) with user-defined parameters. The unwrapped phase is saved as a grid file
-        in the working directory.
+        for Phase Unwrapping (SNAPHU) with user-defined parameters. The SNAPHU temporary files are placed
+        into RAM-backed directory when available (see snaphu_tmpdir method).
 
         Parameters
         ----------
@@ -36,6 +238,9 @@ class Stack_unwrap_snaphu(Stack_landmask):
         conncomp : bool, optional
             If True, return connection components map, default is False.
 
+        timeout : float, optional
+            SNAPHU process timeout in seconds, default is None (no timeout).
+
         debug : bool, optional
             If True, print debugging information during the unwrapping process, default is False.
 
@@ -47,11 +252,6 @@ class Stack_unwrap_snaphu(Stack_landmask):
         """
         import xarray as xr
         import numpy as np
-        import pandas as pd
-        import os
-        import subprocess
-        from datetime import datetime
-        import uuid
         import warnings
         # suppress Dask warning "RuntimeWarning: invalid value encountered in divide"
         warnings.filterwarnings('ignore')
@@ -69,87 +269,26 @@ class Stack_unwrap_snaphu(Stack_landmask):
 
         if conf is None:
             conf = self.snaphu_config()
-        # set unique processing subdirectory
-        conf += f'    TILEDIR snaphu_tiledir_{str(uuid.uuid4())}'
-
-        # define basename for SNAPHU temp files
-        # crop .grd from filename
-        basename = self.get_filename(f'snaphu_{str(uuid.uuid4())}', '')[:-4]
-        #print ('basename', basename)
-
-        # SNAPHU input files
-        phase_in = basename + '.phase'
-        corr_in = basename + '.corr'
-        mask_in = basename + '.bytemask'
-        # SNAPHU output files
-        unwrap_out = basename + 'unwrap.out'
-        conncomp_out = basename + 'conncomp.out'
-
-        # prepare SNAPHU input files
-        # NaN values are not allowed for SNAPHU phase input file
-        # interpolate when exist valid values around and fill zero pixels far away from valid ones
-        # convert to lazy array setting the chunk size
-        phase.fillna(0).compute(n_workers=1).values.astype(np.float32).tofile(phase_in)
-        # SNAPHU masks out 0 and uses only valid pixels with mask 1
-        xr.where(np.isnan(phase), 0, 1).values.astype(np.ubyte).tofile(mask_in)
-    
-        if corr is not None:
-            # NaN values are not allowed for SNAPHU correlation input file
-            # just fill NaNs by zeroes because the main trick is phase filling
-            corr.fillna(0).compute(n_workers=1).values.astype(np.float32).tofile(corr_in)
-
-        # launch SNAPHU binary (NaNs are not allowed for input but returned in output)
-        argv = ['snaphu', phase_in, str(phase.shape[1]), '-M', mask_in, '-f', '/dev/stdin', '-o', unwrap_out, '-d']
-        # output connection componetets map
-        if conncomp:
-            argv.append('-g')
-            argv.append(conncomp_out)
-        # add optional correlation grid
-        if corr is not None:
-            argv.append('-c')
-            argv.append(corr_in)
-        if debug:
-            argv.append('-v')
-            print ('DEBUG: argv', argv)
-        p = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             encoding='utf8', bufsize=10*1000*1000)
-        stdout_data, stderr_data = p.communicate(input=conf)
 
-        outs = []
-        # check for expected SNAPHU output files
-        if os.path.exists(unwrap_out) and (not conncomp or os.path.exists(conncomp_out)):
-            # convert to grid unwrapped phase from SNAPHU output applying postprocessing
-            values = np.fromfile(unwrap_out, dtype=np.float32).reshape(phase.shape)
-            #values = np.frombuffer(stdout_data, dtype=np.float32).reshape(phase.shape)
-            # revert NaNs in output because SNAPNU does not support them
-            unwrap = xr.DataArray(values, phase.coords, name='phase').chunk(self.chunksize).where(~np.isnan(phase))
-            outs.append(unwrap)
-            del values, unwrap
+        unwrap, conn, log = self.snaphu_block(phase.compute(n_workers=1).values,
+                                              corr.compute(n_workers=1).values if corr is not None else None,
+                                              conf, conncomp=conncomp, timeout=timeout, debug=debug)
 
+        outs = []
+        if unwrap is not None:
+            outs.append(xr.DataArray(unwrap, phase.coords, name='phase').chunk(self.chunksize))
             if conncomp:
-                # convert to grid the connected components from SNAPHU output as is (UCHAR)
-                values = np.fromfile(conncomp_out, dtype=np.ubyte).reshape(phase.shape)
-                conn = xr.DataArray(values, phase.coords, name='conncomp').chunk(self.chunksize)
-                outs.append(conn)
-                del values, conn
+                outs.append(xr.DataArray(conn, phase.coords, name='conncomp').chunk(self.chunksize))
         else:
             # return the same data structure as expected but NaN-filled
             outs.append(xr.full_like(phase, np.nan).rename('phase'))
             if conncomp:
                 outs.append(xr.full_like(phase, np.nan).rename('conncomp'))
         out = xr.merge(outs)
-        del outs
+        del outs, unwrap, conn
 
         # add processing log
-        out.attrs['snaphu'] = stdout_data + '\n' + stderr_data
-
-        # the output files deleted immediately
-        # but these are accessible while open descriptors persist
-        for tmp_file in [phase_in, corr_in, mask_in, unwrap_out, conncomp_out]:
-            if os.path.exists(tmp_file):
-                os.remove(tmp_file)
-
+        out.attrs['snaphu'] = log
         return out
 
     def snaphu_config(self, defomax=0, **kwargs):
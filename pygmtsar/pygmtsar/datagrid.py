@@ -48,9 +48,165 @@ class datagrid:
     netcdf_complevel = -1
     netcdf_shuffle = True
     netcdf_queue = 16
+    # maximum size of the stack items written in parallel per Dask worker, see save_stack()
+    netcdf_inflight_bytes = 2**30
+    # the last save_stack() call writing metrics
+    save_stack_metrics = None
+    # stack storage backend for save_stack() and open_stack():
+    # 'netcdf' for a NetCDF file per date or pair and 'zarr' for a single chunked Zarr store
+    stack_backend = 'netcdf'
+    # Zarr store chunk size along the stack (date or pair) dimension
+    zarr_chunksize_stack = 8
+    # radar coordinates transform engine for SAT_llt2rat(): 'gmtsar' for GMTSAR SAT_llt2rat tool
+    # or 'numba' for the in-process solver, the Stack methods pass it to PRM objects
+    llt2rat_engine = 'gmtsar'
+    # baselines engine: 'numpy' for PRM.get_baselines() in-process computation from LED orbits
+    # or 'gmtsar' for GMTSAR SAT_baseline tool used as the fallback
+    baseline_engine = 'numpy'
+    # named NetCDF storage presets, see _compression() for the options
+    netcdf_presets = {
+        'none':         {'algorithm': None},
+        'zlib':         {'algorithm': 'zlib', 'complevel': 3, 'shuffle': False},
+        'shuffle_zlib': {'algorithm': 'zlib', 'complevel': 3, 'shuffle': True},
+        'lzf':          {'algorithm': 'lzf', 'shuffle': True},
+        'lossy':        {'algorithm': 'zlib', 'complevel': 3, 'shuffle': True, 'least_significant_digit': 3}
+    }
+    # per-product storage profiles as preset names or dictionaries for NetCDF files and Zarr stores
+    # (the Zarr store uses the profile compression and quantization only), like to
+    # {'corr': 'lossy', 'trans': 'shuffle_zlib', 'disp': {'preset': 'shuffle_zlib', 'layout': 'timeseries', 'chunksize': 64}}
+    netcdf_profiles = {}
+
+    def netcdf_profile(self, profile=None):
+        """
+        Return the storage options for a product.
+
+        Parameters
+        ----------
+        profile : str or dict, optional
+            The product name defined in netcdf_profiles, the preset name defined in netcdf_presets
+            or the options dictionary. Default is None to use the class attributes.
+
+        Returns
+        -------
+        dict
+            The options 'algorithm', 'complevel', 'shuffle' and optionally 'least_significant_digit',
+            'chunksize' and 'layout' ('map' or 'timeseries').
+        """
+        opts = {'algorithm': self.netcdf_compression_algorithm,
+                'complevel': self.netcdf_complevel,
+                'shuffle': self.netcdf_shuffle}
+        if isinstance(profile, str):
+            # product name or preset name, the products are not defined by default
+            profile = self.netcdf_profiles.get(profile, self.netcdf_presets.get(profile))
+        if isinstance(profile, str):
+            profile = self.netcdf_presets[profile]
+        if profile is None:
+            return opts
+        assert isinstance(profile, dict), f'ERROR: storage profile should be a preset name or dictionary: {profile}'
+        if 'preset' in profile:
+            opts.update(self.netcdf_presets[profile['preset']])
+        opts.update({key: value for (key, value) in profile.items() if key != 'preset'})
+        return opts
+
+    def netcdf_quantize(self, data, profile=None):
+        """
+        Apply the lossy quantization defined by 'least_significant_digit' profile option.
+
+        The values are rounded to binary fractions like to NetCDF4 least_significant_digit option
+        to improve the compression for any NetCDF engine.
+
+        Parameters
+        ----------
+        data : xarray.Dataset or xarray.DataArray
+            The data to quantize.
+        profile : str or dict, optional
+            The storage profile, see netcdf_profile(). Dataset variable names are used as the product names
+            when the profile is not defined.
+
+        Returns
+        -------
+        xarray.Dataset or xarray.DataArray
+            The quantized data.
+        """
+        import xarray as xr
+        import numpy as np
+
+        if isinstance(data, xr.Dataset):
+            return data.assign({varname: self.netcdf_quantize(data[varname], profile if profile is not None else varname)
+                                for varname in data.data_vars})
+        digits = self.netcdf_profile(profile if profile is not None else data.name).get('least_significant_digit')
+        if digits is None or not np.issubdtype(data.dtype, np.floating):
+            return data
+        scale = 2.0**np.ceil(np.log2(10.0**digits))
+        return (np.round(data * scale) / scale).astype(data.dtype)
+
+    def netcdf_benchmark(self, data, profiles='auto', bandwidth=None, tmpdir=None):
+        """
+        Measure NetCDF write and read throughput and on-disk size for the storage profiles.
+
+        Parameters
+        ----------
+        data : xarray.DataArray
+            The product sample to save, like to a single interferogram or a small 3D stack.
+        profiles : list or dict, optional
+            The preset names or the dictionary of named profiles. Default is 'auto' for all the presets.
+        bandwidth : float, optional
+            The target storage bandwidth in MB/s, like to NFS network speed, to estimate the transfer time.
+            Default is None to use the measured local times only.
+        tmpdir : str, optional
+            The directory for the test files. Default is None for the system temporary directory.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The benchmark results sorted by the estimated total time, the first row is the recommended profile.
+
+        Examples
+        --------
+        stack.netcdf_benchmark(stack.open_stack('corr').isel(pair=0), bandwidth=100)
+        """
+        import xarray as xr
+        import pandas as pd
+        import numpy as np
+        import tempfile
+        import time
+        import os
+
+        if isinstance(profiles, str) and profiles == 'auto':
+            profiles = list(self.netcdf_presets.keys())
+        if not isinstance(profiles, dict):
+            profiles = {name: name for name in profiles}
+
+        name = data.name if data.name is not None else 'data'
+        data = data.rename(name).load()
+        nbytes = data.nbytes / 2**20
+        records = []
+        with tempfile.TemporaryDirectory(dir=tmpdir) as workdir:
+            for (label, profile) in profiles.items():
+                filename = os.path.join(workdir, f'{label}.nc')
+                sample = self.netcdf_quantize(data, profile)
+                encoding = {name: self._compression(data.shape, profile=profile)}
+                start = time.perf_counter()
+                sample.to_netcdf(filename, encoding=encoding, engine=self.netcdf_engine)
+                write_time = time.perf_counter() - start
+                start = time.perf_counter()
+                with xr.open_dataarray(filename, engine=self.netcdf_engine) as ds:
+                    ds.load()
+                read_time = time.perf_counter() - start
+                size = os.path.getsize(filename) / 2**20
+                error = float(np.nanmax(np.abs(sample.values - data.values))) \
+                        if np.issubdtype(data.dtype, np.floating) else 0.0
+                total = write_time + read_time + (2 * size / bandwidth if bandwidth else 0)
+                records.append({'profile': label, 'size_mb': size, 'ratio': nbytes / size,
+                                'write_mbps': nbytes / write_time, 'read_mbps': nbytes / read_time,
+                                'max_error': error, 'total_time': total})
+                del sample
+        df = pd.DataFrame(records).set_index('profile').sort_values('total_time')
+        print (f'NOTE: recommended storage profile for {name} is {df.index[0]}')
+        return df
 
     # define lost class variables due to joblib via arguments
-    def _compression(self, shape=None, chunksize=None):
+    def _compression(self, shape=None, chunksize=None, profile=None):
         """
         Return the compression options for a data grid.
 
@@ -60,6 +216,8 @@ class datagrid:
             The shape of the data grid. Required if chunksize is less than grid dimension sizes. Default is None.
         chunksize : int or tuple, optional
             The chunk size for data compression. If not specified, the class attribute chunksize is used.
+        profile : str or dict, optional
+            The product storage profile, see netcdf_profile(). Default is None.
 
         Returns
         -------
@@ -80,6 +238,9 @@ class datagrid:
         """
         import numpy as np
 
+        opts = self.netcdf_profile(profile)
+        chunksize = opts.get('chunksize', chunksize)
+
         if chunksize is None and len(shape) == 1:
             # (stacked) single-dimensional grid 
             chunksize = self.netcdf_chunksize1d
@@ -102,17 +263,22 @@ class datagrid:
                 for idim in range(len(shape)):
                     chunksizes.append(chunksize if chunksize<shape[idim] else shape[idim])
                 # set first dimension chunksize to 1 for 3D array
+                # or use the full stack dimension for the time series access
                 if len(chunksizes) == 3:
-                    chunksizes[0] = 1
+                    chunksizes[0] = shape[0] if opts.get('layout') == 'timeseries' else 1
                 chunksizes = tuple(chunksizes)
             else:
                 chunksizes=(chunksize, chunksize)
-        opts = dict(chunksizes=chunksizes)
-        if self.netcdf_compression_algorithm is not None and self.netcdf_complevel >= 0:
-            opts[self.netcdf_compression_algorithm] = True
-            opts['complevel'] = self.netcdf_complevel
-            opts['shuffle'] = self.netcdf_shuffle
-        return opts
+        encoding = dict(chunksizes=chunksizes)
+        if opts['algorithm'] == 'lzf':
+            # HDF5 filter available for h5netcdf engine
+            encoding['compression'] = 'lzf'
+            encoding['shuffle'] = opts['shuffle']
+        elif opts['algorithm'] is not None and opts['complevel'] >= 0:
+            encoding[opts['algorithm']] = True
+            encoding['complevel'] = opts['complevel']
+            encoding['shuffle'] = opts['shuffle']
+        return encoding
 
     @staticmethod
     def is_ra(grid):
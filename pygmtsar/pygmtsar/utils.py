@@ -33,12 +33,63 @@ class utils():
 #                     .predict(np.column_stack([topo_values])).reshape(phase.shape)
 #         return xr.DataArray(phase_topo, coords=phase.coords)
 
+    # the source windows and remap coordinates for the recently interpolated grid pairs
+    interp2d_cache = {}
+    interp2d_cache_size = 16
+
+    @staticmethod
+    def interp2d_plan(data_coords, grid_coords, chunk_sizes):
+        """
+        Define the source windows and remap coordinates for all the output chunks.
+
+        The remap coordinates are separable and stored as 1D arrays for every output chunk. The plans are cached
+        for the recently used grid pairs because the same grids are interpolated repeatedly.
+
+        Args:
+            data_coords (tuple): The input data 1D coordinates.
+            grid_coords (tuple): The output grid 1D coordinates.
+            chunk_sizes (tuple): The output grid chunk sizes.
+
+        Returns:
+            tuple: The lists of (start, stop, remap coordinates) for every output chunk for both dimensions.
+        """
+        import numpy as np
+        import hashlib
+
+        key = hashlib.md5(b''.join([np.ascontiguousarray(coords).tobytes() for coords in (*data_coords, *grid_coords)])
+                          + repr(chunk_sizes).encode('utf8')).hexdigest()
+        if key in utils.interp2d_cache:
+            return utils.interp2d_cache[key]
+
+        plan = []
+        for (coords, out_coords, chunks) in zip(data_coords, grid_coords, chunk_sizes):
+            delta = float(coords[1] - coords[0])
+            blocks = []
+            for out_chunk in np.split(out_coords, np.cumsum(chunks)[:-1]):
+                # select the chunk from data with some padding
+                start = int(np.searchsorted(coords, out_chunk[0] - 3 * delta, side='left'))
+                stop = int(np.searchsorted(coords, out_chunk[-1] + 3 * delta, side='right'))
+                # map destination grid coordinates to source pixel indices
+                remap = np.interp(out_chunk, coords[start:stop], np.arange(stop - start)).astype(np.float32) \
+                        if stop > start else None
+                blocks.append((start, stop, remap))
+            plan.append(blocks)
+
+        if len(utils.interp2d_cache) >= utils.interp2d_cache_size:
+            # drop the oldest plan
+            del utils.interp2d_cache[next(iter(utils.interp2d_cache))]
+        utils.interp2d_cache[key] = plan
+        return plan
+
     # Xarray's interpolation can be inefficient for large grids;
     # this custom function handles the task more effectively.
     @staticmethod
     def interp2d_like(data, grid, method='cubic', **kwargs):
         """
         Efficiently interpolate a 2D array using OpenCV interpolation methods.
+
+        The source windows for all the output chunks are planned up front (see interp2d_plan()) and the data windows
+        are used as the regular task dependencies, without nested computations inside the tasks.
         
         Args:
             data (xarray.DataArray): The input data array.
@@ -52,6 +103,7 @@ class utils():
         import cv2
         import numpy as np
         import xarray as xr
+        import dask
         import dask.array as da
         dims = grid.dims[-2:]
         dim1, dim2 = dims
@@ -73,39 +125,16 @@ class utils():
         # TBD: can be added to the function parameters
         borderMode = cv2.BORDER_REFLECT
     
-        # define interpolation function using outer variable data
-        def interpolate_chunk(out_chunk1, out_chunk2, dim1, dim2, interpolation, borderMode, **kwargs):
-            d1 = float(data[dim1].diff(dim1)[0])
-            d2 = float(data[dim2].diff(dim2)[0])
-    
-            # select the chunk from data with some padding
-            chunk = data.sel({
-                dim1: slice(out_chunk1[0] - 3 * d1, out_chunk1[-1] + 3 * d1),
-                dim2: slice(out_chunk2[0] - 3 * d2, out_chunk2[-1] + 3 * d2)
-            }).compute(n_workers=1)
-    
-            # Create grid for interpolation
-            dst_grid_x, dst_grid_y = np.meshgrid(out_chunk2, out_chunk1)
-    
-            # map destination grid coordinates to source pixel indices
-            src_x_coords = np.interp(
-                dst_grid_x.ravel(),
-                chunk[dim2].values,
-                np.arange(len(chunk[dim2]))
-            )
-            src_y_coords = np.interp(
-                dst_grid_y.ravel(),
-                chunk[dim1].values,
-                np.arange(len(chunk[dim1]))
-            )
-    
+        # interpolate the source window to the output chunk
+        def interpolate_chunk(chunk, src_y_coords, src_x_coords, interpolation, borderMode):
+            # the output chunk is outside of the data
+            if chunk is None:
+                return np.full((src_y_coords.size, src_x_coords.size), np.nan, dtype=np.float32)
             # reshape the coordinates for remap
-            src_x_coords = src_x_coords.reshape(dst_grid_x.shape).astype(np.float32)
-            src_y_coords = src_y_coords.reshape(dst_grid_y.shape).astype(np.float32)
-    
+            src_x_coords, src_y_coords = np.meshgrid(src_x_coords, src_y_coords)
             # interpolate using OpenCV
             dst_grid = cv2.remap(
-                chunk.values.astype(np.float32),
+                np.asarray(chunk).astype(np.float32),
                 src_x_coords,
                 src_y_coords,
                 interpolation=interpolation,
@@ -114,25 +143,36 @@ class utils():
             return dst_grid
     
         # define chunk sizes
-        chunk_sizes = grid.chunks[-2:] if hasattr(grid, 'chunks') else (data.sizes[dim1], data.sizes[dim2])
-    
-        # create dask array for parallel processing
-        grid_y = da.from_array(grid[dim1].values, chunks=chunk_sizes[0])
-        grid_x = da.from_array(grid[dim2].values, chunks=chunk_sizes[1])
-    
-        # Perform interpolation
-        dask_out = da.blockwise(
-            interpolate_chunk,
-            'yx',
-            grid_y, 'y',
-            grid_x, 'x',
-            dtype=data.dtype,
-            dim1=dim1,
-            dim2=dim2,
-            interpolation=interpolation,
-            borderMode=borderMode,
-            **kwargs
-        )
+        chunk_sizes = grid.chunks[-2:] if grid.chunks is not None else ((grid.sizes[dim1],), (grid.sizes[dim2],))
+        # plan the source windows for all the output chunks
+        plan1, plan2 = utils.interp2d_plan((data[dim1].values, data[dim2].values),
+                                           (grid[dim1].values, grid[dim2].values),
+                                           tuple(tuple(sizes) for sizes in chunk_sizes))
+        # use lazy data to define the source windows as the task dependencies
+        values = data.data if isinstance(data.data, da.Array) else da.from_array(data.data, chunks=-1)
+
+        blocks_total = []
+        for (size1, (start1, stop1, remap1)) in zip(chunk_sizes[0], plan1):
+            blocks = []
+            for (size2, (start2, stop2, remap2)) in zip(chunk_sizes[1], plan2):
+                if remap1 is None or remap2 is None:
+                    # the output block coordinates only, the plan is shared by all the blocks
+                    chunk = None
+                    block_remap1 = np.zeros(size1, dtype=np.float32)
+                    block_remap2 = np.zeros(size2, dtype=np.float32)
+                else:
+                    chunk = values[start1:stop1, start2:stop2]
+                    block_remap1 = remap1
+                    block_remap2 = remap2
+                block = da.from_delayed(dask.delayed(interpolate_chunk)(chunk, block_remap1, block_remap2,
+                                                                        interpolation, borderMode),
+                                        shape=(size1, size2), dtype=data.dtype)
+                blocks.append(block)
+                del block, chunk
+            blocks_total.append(blocks)
+            del blocks
+        dask_out = da.block(blocks_total)
+        del blocks_total, values
     
         da_out = xr.DataArray(dask_out, coords=coords, dims=dims).rename(data.name)
     
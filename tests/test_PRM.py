@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+PRM parser and serializer regression test on todo/baseline PRM files.
+
+pytest tests/test_PRM.py
+"""
+import os
+import sys
+import pytest
+# use the package source tree when PyGMTSAR is not installed
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pygmtsar'))
+from pygmtsar import PRM
+
+BASEDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'todo', 'baseline')
+FILENAMES = ['S1_20201222_ALL_F2.PRM', 'S1_20210103_ALL_F2.PRM']
+# SAT_baseline output appends the baseline parameters to the PRM even when they are defined already
+BASELINE = '''lon_tie_point = 49.873465
+lat_tie_point = 40.286379
+SC_height = 693450.0
+SC_height_start = 693450.5
+SC_height_end = 693449.5
+B_parallel = 0.153127
+B_perpendicular = 9.126230
+baseline_start = 9.127514
+alpha_start = 149.038071
+'''
+
+def to_str_pandas(prm):
+    # the previous DataFrame-based PRM writer
+    return prm.df.reset_index().astype(str).apply(lambda row: (' = ').join(row), axis=1)\
+        .to_csv(None, header=None, index=None)
+
+@pytest.mark.parametrize('filename', FILENAMES)
+def test_PRM_roundtrip(filename):
+    prm = PRM.from_file(os.path.join(BASEDIR, filename))
+    prm_string = prm.to_str()
+    assert prm_string == to_str_pandas(prm)
+    assert PRM.from_str(prm_string).to_str() == prm_string
+    assert PRM.from_str(prm_string) == prm
+
+def test_PRM_duplicates():
+    prm = PRM.from_file(os.path.join(BASEDIR, FILENAMES[1]))
+    stale = BASELINE.replace('0.153127', '1.0').replace('9.126230', '2.0')
+    prm = PRM.from_str(prm.to_str() + stale + BASELINE)
+    # the last value is used for the duplicated names
+    assert prm.get('B_parallel', 'B_perpendicular') == [0.153127, 9.12623]
+    # the duplicated names are placed at the last position like to the appended lines
+    tail = PRM(dict(list(prm.params.items())[-9:]))
+    assert tail == PRM.from_str(BASELINE)
+    assert len([line for line in prm.to_str().splitlines() if line.startswith('B_parallel ')]) == 1
+
+def test_PRM_df_readonly():
+    prm = PRM.from_file(os.path.join(BASEDIR, FILENAMES[0]))
+    with pytest.raises(AttributeError):
+        prm.df = prm.df
+    # the DataFrame is a copy, use set() method to change the parameters
+    df = prm.df
+    df.loc['ashift', 'value'] = 0
+    assert prm.get('ashift') == 3
+    assert prm.set(ashift=0).get('ashift') == 0
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+In-process baselines regression test on the reference values recorded by GMTSAR SAT_baseline
+for todo/baseline PRM and LED files.
+
+pytest tests/test_SAT_baseline.py
+"""
+import os
+import sys
+import shutil
+import numpy as np
+import pytest
+# use the package source tree when PyGMTSAR is not installed
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pygmtsar'))
+from pygmtsar import PRM
+
+BASEDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'todo', 'baseline')
+REFERENCE = 'S1_20201222_ALL_F2.PRM'
+REPEAT = 'S1_20210103_ALL_F2.PRM'
+# GMTSAR SAT_baseline B_parallel and B_perpendicular
+BASELINE = [0.153127, 9.126230]
+# GMTSAR SAT_baseline reference orbit start point
+ORBIT_START = [30811049.791369, 3934597.486830, 3828232.879869, 4455902.914510]
+
+def test_PRM_get_orbit():
+    prm = PRM.from_file(os.path.join(BASEDIR, REFERENCE))
+    np.testing.assert_allclose(prm.get_orbit(ORBIT_START[0])[0], ORBIT_START[1:], atol=1e-2)
+
+def test_PRM_get_baselines():
+    prm_ref = PRM.from_file(os.path.join(BASEDIR, REFERENCE))
+    prm_rep = PRM.from_file(os.path.join(BASEDIR, REPEAT))
+    np.testing.assert_allclose(prm_ref.get_baselines(prm_rep), BASELINE, atol=1e-6)
+    # all the dates at once including the reference one
+    baselines = prm_ref.get_baselines([prm_ref, prm_rep, prm_rep])
+    assert baselines.shape == (3, 2)
+    np.testing.assert_allclose(baselines[0], [0, 0], atol=1e-6)
+    np.testing.assert_allclose(baselines[1:], [BASELINE, BASELINE], atol=1e-6)
+
+def test_PRM_get_baselines_orbit_height():
+    # PRM files without calc_dop_orb() output use the spacecraft height from the orbit
+    prm_ref = PRM.from_file(os.path.join(BASEDIR, REFERENCE))
+    del prm_ref.params['SC_height'], prm_ref.params['earth_radius']
+    prm_rep = PRM.from_file(os.path.join(BASEDIR, REPEAT))
+    np.testing.assert_allclose(prm_ref.get_baselines(prm_rep), BASELINE, atol=1e-4)
+
+@pytest.mark.skipif(shutil.which('SAT_baseline') is None, reason='GMTSAR SAT_baseline is not installed')
+def test_SAT_baseline_engines():
+    prm_ref = PRM.from_file(os.path.join(BASEDIR, REFERENCE))
+    prm_rep = PRM.from_file(os.path.join(BASEDIR, REPEAT))
+    baselines = prm_ref.SAT_baseline(prm_rep).get('B_parallel', 'B_perpendicular')
+    np.testing.assert_allclose(prm_ref.get_baselines(prm_rep), baselines, atol=1e-6)
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+SAT_llt2rat regression test on the reference values recorded by GMTSAR llt2rat_sub()
+for the tie point in todo/baseline/baseline.v7.ipynb notebook.
+
+pytest tests/test_SAT_llt2rat.py
+"""
+import os
+import sys
+import shutil
+import numpy as np
+import pytest
+# use the package source tree when PyGMTSAR is not installed
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pygmtsar'))
+from pygmtsar import PRM
+
+BASEDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'todo', 'baseline')
+# the tie point as [longitude, latitude, elevation]
+TIE_POINT = [49.8734654788201, 40.28637916813154, 340.309432]
+# GMTSAR target_rat [range, azimuth, elevation]
+TARGETS = {
+    'S1_20201222_ALL_F2.PRM': [12794.831537, 1038.380102, -5.071846],
+    'S1_20210103_ALL_F2.PRM': [12794.614100, 1041.773079, -5.071846]
+}
+# precise=1 target_rat [range, azimuth, elevation] as the minimum range point on the Hermite orbit
+# found by the dense search, GMTSAR SAT_llt2rat precise=1 output is compared when the tool is available
+PRECISE_TARGETS = {
+    'S1_20201222_ALL_F2.PRM': [12794.831178, 1040.146912, -5.071846],
+    'S1_20210103_ALL_F2.PRM': [12794.613773, 1040.182277, -5.071846]
+}
+
+@pytest.mark.parametrize('filename', TARGETS.keys())
+def test_SAT_llt2rat_numba(filename):
+    prm = PRM.from_file(os.path.join(BASEDIR, filename))
+    rat = prm.SAT_llt2rat(TIE_POINT, precise=0, engine='numba')
+    assert rat.shape == (5,)
+    np.testing.assert_allclose(rat[:3], TARGETS[filename], atol=1e-3)
+    np.testing.assert_allclose(rat[3:], TIE_POINT[:2])
+
+@pytest.mark.parametrize('filename', PRECISE_TARGETS.keys())
+def test_SAT_llt2rat_numba_precise(filename):
+    prm = PRM.from_file(os.path.join(BASEDIR, filename))
+    rat = prm.SAT_llt2rat(TIE_POINT, precise=1, engine='numba')
+    # the zero-Doppler solution is refined between the orbit samples taken every 2nd line
+    np.testing.assert_allclose(rat[:3], PRECISE_TARGETS[filename], atol=1e-3)
+    np.testing.assert_allclose(rat[3:], TIE_POINT[:2])
+
+def test_SAT_llt2rat_engine_attribute():
+    prm = PRM.from_file(os.path.join(BASEDIR, 'S1_20201222_ALL_F2.PRM'))
+    # the Stack methods pass llt2rat_engine attribute and the default engine reads it
+    prm.llt2rat_engine = 'numba'
+    np.testing.assert_allclose(prm.SAT_llt2rat(TIE_POINT, precise=0), TARGETS['S1_20201222_ALL_F2.PRM'] + TIE_POINT[:2],
+                               atol=1e-3)
+
+def test_SAT_llt2rat_numba_points():
+    prm = PRM.from_file(os.path.join(BASEDIR, 'S1_20201222_ALL_F2.PRM'))
+    # the points far away from the scene and the missed points do not invalidate the other points
+    coords = [TIE_POINT, [TIE_POINT[0], TIE_POINT[1] + 10, 0], [np.nan, np.nan, np.nan]]
+    rat = prm.SAT_llt2rat(coords, precise=1, engine='numba')
+    assert rat.shape == (3, 5)
+    np.testing.assert_allclose(rat[0], prm.SAT_llt2rat(TIE_POINT, precise=1, engine='numba'))
+    assert np.all(np.isfinite(rat[1]))
+    assert np.all(np.isnan(rat[2]))
+
+@pytest.mark.skipif(shutil.which('SAT_llt2rat') is None, reason='GMTSAR SAT_llt2rat is not installed')
+@pytest.mark.parametrize('filename', TARGETS.keys())
+@pytest.mark.parametrize('precise', [0, 1])
+def test_SAT_llt2rat_engines(filename, precise):
+    prm = PRM.from_file(os.path.join(BASEDIR, filename))
+    # the GMTSAR tool reads the LED file defined in PRM relative to the PRM file directory
+    rat_gmtsar = prm.SAT_llt2rat(TIE_POINT, precise=precise, engine='gmtsar')
+    rat_numba = prm.SAT_llt2rat(TIE_POINT, precise=precise, engine='numba')
+    np.testing.assert_allclose(rat_numba, rat_gmtsar, atol=1e-3)
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__]))